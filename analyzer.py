@@ -1,54 +1,127 @@
+import re
 import torch
 import logging
-from natasha import Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger, Doc
+import threading
+from collections import OrderedDict
+import numpy as np
+from natasha import Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger
 from transformers import pipeline
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
+from vacancy_features import load_vacancy_features
+from lemma_cache import LemmaCache
+import model_registry
 
 logging.basicConfig(filename='analyzer.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Инициализация Natasha
-segmenter = Segmenter()
-morph_vocab = MorphVocab()
-emb = NewsEmbedding()
-morph_tagger = NewsMorphTagger(emb)
-
-# Модель для sentiment (русский)
-try:
-    sentiment_analyzer = pipeline(
-        "sentiment-analysis",
-        model="blanchefort/rubert-base-cased-sentiment"
-    )
-    logging.info("Модель sentiment-анализа загружена")
-except Exception as e:
-    logging.error(f"Ошибка загрузки модели sentiment: {e}")
-    sentiment_analyzer = None
-
-# Модель для семантического поиска (русский SBERT)
-try:
-    semantic_model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-    logging.info("Модель SBERT загружена")
-except Exception as e:
-    logging.error(f"Ошибка загрузки модели SBERT: {e}")
-    semantic_model = None
+SBERT_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+SENTIMENT_MODEL_NAME = "blanchefort/rubert-base-cased-sentiment"
+
+def _load_natasha():
+    emb = NewsEmbedding()
+    return {"segmenter": Segmenter(), "morph_vocab": MorphVocab(), "morph_tagger": NewsMorphTagger(emb)}
+
+def _load_sentiment():
+    # Модель для sentiment (русский). Число потоков torch — настройка всего процесса (SBERT тоже),
+    # поэтому задаётся один раз при загрузке, а не при каждом вызове
+    if SENTIMENT_NUM_THREADS:
+        torch.set_num_threads(SENTIMENT_NUM_THREADS)
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL_NAME)
+
+def _load_sbert():
+    # Модель для семантического поиска (русский SBERT)
+    return SentenceTransformer(SBERT_MODEL_NAME)
+
+# Модели загружаются лениво при первом обращении или в фоне через model_registry.warm_up()
+# Ключ (модель, устройство, тип вычислений) позволяет другим модулям переиспользовать тот же экземпляр
+natasha_model = model_registry.register("natasha", _load_natasha, key=("natasha-news", "cpu", "float32"), pinned=True)
+sentiment_model = model_registry.register("sentiment", _load_sentiment, key=(SENTIMENT_MODEL_NAME, "cpu", "float32"))
+sbert_model = model_registry.register("sbert", _load_sbert, key=(SBERT_MODEL_NAME, "cpu", "float32"))
+
+# Параметры пакетного sentiment-анализа
+SENTIMENT_BATCH_SIZE = 16
+SENTIMENT_NUM_THREADS = None  # None — значение torch по умолчанию; применяется при загрузке модели
+SENTIMENT_WINDOW_TOKENS = 500
+SENTIMENT_WINDOW_STRIDE = 400
+
+# Леммы не из букв, которые всё равно сохраняются
+LEMMA_WHITELIST = {'sql', 'python', 'it', 'osi', 'mikrotik', 'cisco', 'ssh', 'ubuntu'}
+# Версия лемматизации входит в ключ кэша лемм: увеличивать при изменении правила отбора лемм
+LEMMATIZER_VERSION = "2:" + ",".join(sorted(LEMMA_WHITELIST))
+
+def _keep_lemma(lemma: str) -> bool:
+    return bool(lemma) and (lemma.isalpha() or lemma in LEMMA_WHITELIST)
+
+def _lemmatize_batch(texts: list) -> list:
+    """
+    Лемматизация Natasha для промахов кэша (None для текстов, которые не удалось обработать).
+    Тексты сегментируются по отдельности, а предложения всех текстов размечаются морф-теггером одним пакетом.
+    """
+    natasha = natasha_model.get()
+    if natasha is None:
+        logging.error("Natasha не загружена, лемматизация невозможна")
+        return [None] * len(texts)
+    segmenter, tagger, vocab = natasha["segmenter"], natasha["morph_tagger"], natasha["morph_vocab"]
+    results = [[] for _ in texts]
+    sentences, owners = [], []
+    for i, text in enumerate(texts):
+        try:
+            for sent in segmenter.sentenize(text):
+                words = [token.text for token in segmenter.tokenize(sent.text)]
+                if words:
+                    sentences.append(words)
+                    owners.append(i)
+        except Exception as e:
+            logging.error(f"Ошибка нормализации текста: {e}")
+            results[i] = None
+
+    try:
+        markups = list(tagger.map(sentences))
+    except Exception as e:
+        # Сбой пакета не должен лишать лемм все тексты: размечаем предложения по одному
+        logging.error(f"Ошибка пакетной морфологической разметки: {e}")
+        markups = []
+        for words in sentences:
+            try:
+                markups.extend(tagger.map([words]))
+            except Exception as e:
+                logging.error(f"Ошибка нормализации текста: {e}")
+                markups.append(None)
+
+    for i, markup in zip(owners, markups):
+        if results[i] is None:
+            continue
+        if markup is None:
+            results[i] = None
+            continue
+        for token in markup.tokens:
+            lemma = vocab.lemmatize(token.text, token.pos, token.feats)
+            if _keep_lemma(lemma):
+                results[i].append(lemma)
+    return results
+
+lemma_cache = LemmaCache(_lemmatize_batch, version=LEMMATIZER_VERSION)
 
 def normalize_text(text: str):
     """Лемматизация текста"""
     try:
-        text = text.lower().strip()
-        doc = Doc(text)
-        doc.segment(segmenter)
-        doc.tag_morph(morph_tagger)
-        lemmas = []
-        for token in doc.tokens:
-            token.lemmatize(morph_vocab)
-            if token.lemma and (token.lemma.isalpha() or token.lemma in {'sql', 'python', 'it', 'osi', 'mikrotik', 'cisco', 'ssh', 'ubuntu'}):
-                lemmas.append(token.lemma)
-        return lemmas
+        return lemma_cache.normalize(text)
     except Exception as e:
         logging.error(f"Ошибка нормализации текста: {e}")
         return []
 
+def normalize_texts(texts: list) -> list:
+    """Пакетная лемматизация списка текстов через кэш"""
+    try:
+        return lemma_cache.normalize_many(texts)
+    except Exception as e:
+        logging.error(f"Ошибка пакетной нормализации текста: {e}")
+        return [[] for _ in texts]
+
+def lemma_cache_stats() -> dict:
+    """Счётчики попаданий кэша лемматизации"""
+    return lemma_cache.hit_rate()
+
 def partial_match(req: str, resume_text: str) -> bool:
     """Проверка частичного совпадения текста"""
     try:
@@ -59,70 +132,281 @@ def partial_match(req: str, resume_text: str) -> bool:
         logging.error(f"Ошибка в partial_match: {e}")
         return False
 
-def semantic_match(req: str, text: str, threshold: float = 0.45) -> bool:
-    """Семантическое сравнение текста"""
-    try:
+# Недавние эмбеддинги фрагментов: индекс кандидатов переиспользует векторы, посчитанные при анализе резюме
+EMBEDDING_CACHE_SIZE = 20000
+_embedding_cache = OrderedDict()
+_embedding_lock = threading.Lock()
+
+def encode_texts(texts: list):
+    """Пакетное кодирование текстов в нормализованные эмбеддинги (None, если SBERT недоступен)"""
+    with sbert_model.use() as semantic_model:
         if not semantic_model:
+            return None
+        texts = list(texts)
+        cached = {}
+        with _embedding_lock:
+            for text in texts:
+                if text in _embedding_cache:
+                    _embedding_cache.move_to_end(text)
+                    cached[text] = _embedding_cache[text]
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            encoded = semantic_model.encode(missing, convert_to_numpy=True, normalize_embeddings=True)
+            with _embedding_lock:
+                for text, vector in zip(missing, encoded):
+                    cached[text] = vector
+                    _embedding_cache[text] = vector
+                while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    _embedding_cache.popitem(last=False)
+        if not texts:
+            return np.zeros((0, semantic_model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack([cached[text] for text in texts])
+
+def get_vacancy_features(vacancy: dict) -> dict:
+    """Предвычисленные признаки вакансии: леммы требований, эмбеддинги требований и вопросов"""
+    try:
+        sbert_ready = sbert_model.get() is not None
+        return load_vacancy_features(
+            vacancy, normalize_text,
+            encode_texts if sbert_ready else None,
+            SBERT_MODEL_NAME if sbert_ready else "",
+            LEMMATIZER_VERSION
+        )
+    except Exception as e:
+        logging.error(f"Ошибка загрузки артефакта вакансии: {e}")
+        requirements = vacancy.get("requirements", [])
+        questions = vacancy.get("questions", [])
+        return {
+            "requirements": requirements,
+            "req_lemmas": [set(normalize_text(req)) for req in requirements],
+            "questions": questions,
+            "req_emb": encode_texts(requirements) if requirements else None,
+            "q_emb": encode_texts(questions) if questions else None,
+        }
+
+def _has_embeddings(matrix) -> bool:
+    return matrix is not None and matrix.ndim == 2 and matrix.shape[1] > 0
+
+def split_into_chunks(text: str, max_chars: int = 400) -> list:
+    """Разбиение текста на фрагменты по абзацам и предложениям"""
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            chunks.append(paragraph)
+            continue
+        current = ""
+        for sentence in re.split(r"(?<=[.!?;…])\s+", paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+            while len(current) > max_chars:
+                chunks.append(current[:max_chars])
+                current = current[max_chars:].strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+def match_requirements_many(requirements: list, texts: list, threshold: float = 0.45, req_embeddings=None) -> list:
+    """
+    Пакетное семантическое сопоставление требований с фрагментами нескольких текстов.
+    Требования и фрагменты всех текстов кодируются одним вызовом SBERT, лучшая похожесть
+    берётся из одной матрицы косинусных расстояний.
+    req_embeddings — готовые эмбеддинги требований (из артефакта вакансии), тогда кодируются только тексты.
+    Возвращает для каждого текста список {"requirement", "matched", "similarity", "chunk"} в порядке требований.
+    """
+    results = [
+        [{"requirement": req, "matched": False, "similarity": 0.0, "chunk": ""} for req in requirements]
+        for _ in texts
+    ]
+    try:
+        if not sbert_model.get():
             logging.warning("Модель SBERT не загружена, семантический анализ невозможен")
-            return False
-        embeddings = semantic_model.encode([req, text], convert_to_tensor=True)
-        similarity = util.cos_sim(embeddings[0], embeddings[1]).item()
-        logging.info(f"Семантическая похожесть: {similarity:.2f} (порог: {threshold})")
-        return similarity >= threshold
+            return results
+        chunks_per_text = [split_into_chunks(text) for text in texts]
+        all_chunks = [chunk for chunks in chunks_per_text for chunk in chunks]
+        if not requirements or not all_chunks:
+            return results
+        if _has_embeddings(req_embeddings) and len(req_embeddings) == len(requirements):
+            req_emb, chunk_emb = np.asarray(req_embeddings), encode_texts(all_chunks)
+        else:
+            embeddings = encode_texts(list(requirements) + all_chunks)
+            req_emb, chunk_emb = embeddings[:len(requirements)], embeddings[len(requirements):]
+        similarity = req_emb @ chunk_emb.T
+
+        offset = 0
+        for text_results, chunks in zip(results, chunks_per_text):
+            if not chunks:
+                continue
+            text_sim = similarity[:, offset:offset + len(chunks)]
+            offset += len(chunks)
+            best_idx = text_sim.argmax(axis=1)
+            best_scores = text_sim[np.arange(len(requirements)), best_idx]
+            for res, score, idx in zip(text_results, best_scores.tolist(), best_idx.tolist()):
+                res["similarity"] = round(float(score), 3)
+                res["chunk"] = chunks[idx]
+                res["matched"] = score >= threshold
+        logging.info(f"Пакетное сопоставление: {len(requirements)} требований x {len(all_chunks)} фрагментов, текстов: {len(texts)}")
+        return results
     except Exception as e:
-        logging.error(f"Ошибка в semantic_match: {e}")
-        return False
+        logging.error(f"Ошибка в match_requirements_many: {e}")
+        return results
+
+def match_requirements(requirements: list, text: str, threshold: float = 0.45, req_embeddings=None) -> list:
+    """Пакетное семантическое сопоставление требований с фрагментами одного текста"""
+    return match_requirements_many(requirements, [text], threshold, req_embeddings)[0]
+
+def _resume_report(resume_text: str, vacancy: dict, features: dict, resume_lemmas: set, semantic: list) -> dict:
+    matched, missing = [], []
+    evidence = {}
+    for req, req_lemmas, sem in zip(features["requirements"], features["req_lemmas"], semantic):
+        if resume_lemmas.intersection(req_lemmas) or partial_match(req, resume_text) or sem["matched"]:
+            matched.append(req)
+            if sem["matched"] and sem["chunk"]:
+                evidence[req] = {"chunk": sem["chunk"], "similarity": sem["similarity"]}
+        else:
+            missing.append(req)
+
+    score = round(len(matched) / len(vacancy["requirements"]) * 100, 1) if vacancy.get("requirements") else 0.0
+    logging.info(f"Извлеченный текст резюме: {resume_text[:500]}")
+    logging.info(f"Требования вакансии: {vacancy.get('requirements', [])}")
+    logging.info(f"Анализ резюме: score={score}, matched={matched}, missing={missing}")
+    return {
+        "vacancy": vacancy.get("title", ""),
+        "score": score,
+        "matched": matched,
+        "missing": missing,
+        "evidence": evidence
+    }
+
+def _empty_resume_report(vacancy: dict, error: str = None) -> dict:
+    """Нулевой отчёт; error — причина, если анализ завершился ошибкой (пакетный скрининг его повторит)"""
+    report = {
+        "vacancy": vacancy.get("title", ""),
+        "score": 0.0,
+        "matched": [],
+        "missing": vacancy.get("requirements", []),
+        "evidence": {}
+    }
+    if error is not None:
+        report["error"] = error
+    return report
 
 def analyze_resume_vs_vacancy(resume_text: str, vacancy: dict) -> dict:
     """Анализ соответствия резюме вакансии"""
     try:
-        resume_lemmas = set(normalize_text(resume_text))
-        matched, missing = [], []
-
-        for req in vacancy.get("requirements", []):
-            req_lemmas = set(normalize_text(req))
-            if resume_lemmas.intersection(req_lemmas) or partial_match(req, resume_text) or semantic_match(req, resume_text):
-                matched.append(req)
-            else:
-                missing.append(req)
-
-        score = round(len(matched) / len(vacancy["requirements"]) * 100, 1) if vacancy.get("requirements") else 0.0
-        logging.info(f"Извлеченный текст резюме: {resume_text[:500]}")
-        logging.info(f"Требования вакансии: {vacancy.get('requirements', [])}")
-        logging.info(f"Анализ резюме: score={score}, matched={matched}, missing={missing}")
-        return {
-            "vacancy": vacancy.get("title", ""),
-            "score": score,
-            "matched": matched,
-            "missing": missing
-        }
+        features = get_vacancy_features(vacancy)
+        semantic = match_requirements(features["requirements"], resume_text, req_embeddings=features["req_emb"])
+        return _resume_report(resume_text, vacancy, features, set(normalize_text(resume_text)), semantic)
     except Exception as e:
         logging.error(f"Ошибка в analyze_resume_vs_vacancy: {e}")
-        return {
-            "vacancy": vacancy.get("title", ""),
-            "score": 0.0,
-            "matched": [],
-            "missing": vacancy.get("requirements", [])
-        }
+        return _empty_resume_report(vacancy, str(e))
+
+def analyze_resumes_vs_vacancy(resume_texts: list, vacancy: dict) -> list:
+    """Пакетный анализ нескольких резюме: лемматизация и кодирование SBERT выполняются одним проходом"""
+    try:
+        features = get_vacancy_features(vacancy)
+        semantic = match_requirements_many(features["requirements"], resume_texts, req_embeddings=features["req_emb"])
+        lemmas = normalize_texts(resume_texts)
+        return [
+            _resume_report(text, vacancy, features, set(text_lemmas), text_semantic)
+            for text, text_lemmas, text_semantic in zip(resume_texts, lemmas, semantic)
+        ]
+    except Exception as e:
+        logging.error(f"Ошибка в analyze_resumes_vs_vacancy: {e}")
+        return [_empty_resume_report(vacancy, str(e)) for _ in resume_texts]
 
-def analyze_interview(answers: list, vacancy: dict) -> dict:
-    """Анализ ответов на интервью"""
+def _sentiment_windows(texts: list) -> list:
+    """Разбиение длинных текстов на окна по токенам: [(индекс текста, окно, число токенов)]"""
+    tokenizer = sentiment_model.get().tokenizer
+    encoded = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+    windows = []
+    for idx, (text, ids) in enumerate(zip(texts, encoded)):
+        if len(ids) <= SENTIMENT_WINDOW_TOKENS:
+            windows.append((idx, text, max(len(ids), 1)))
+            continue
+        for start in range(0, len(ids), SENTIMENT_WINDOW_STRIDE):
+            part = ids[start:start + SENTIMENT_WINDOW_TOKENS]
+            windows.append((idx, tokenizer.decode(part), len(part)))
+            if start + SENTIMENT_WINDOW_TOKENS >= len(ids):
+                break
+    return windows
+
+def score_sentiments(texts: list, batch_size: int = None) -> list:
+    """
+    Пакетный sentiment-анализ: все тексты (и окна длинных текстов) проходят через rubert
+    паддингованными батчами. Оценки окон усредняются с весом по числу токенов.
+    Возвращает [{"label", "score"}] в порядке текстов или None для каждого, если модель недоступна.
+    """
+    if not texts:
+        return []
+    with sentiment_model.use() as sentiment_analyzer:
+        if not sentiment_analyzer:
+            return [None] * len(texts)
+        try:
+            windows = _sentiment_windows(texts)
+            outputs = sentiment_analyzer(
+                [window for _, window, _ in windows],
+                batch_size=batch_size or SENTIMENT_BATCH_SIZE,
+                truncation=True,
+                top_k=None
+            )
+            totals = [{} for _ in texts]
+            weights = [0] * len(texts)
+            for (idx, _, n_tokens), label_scores in zip(windows, outputs):
+                weights[idx] += n_tokens
+                for item in label_scores:
+                    totals[idx][item["label"]] = totals[idx].get(item["label"], 0.0) + item["score"] * n_tokens
+            results = []
+            for total, weight in zip(totals, weights):
+                label = max(total, key=total.get)
+                results.append({"label": label, "score": total[label] / weight})
+            logging.info(f"Sentiment-анализ: {len(texts)} текстов, {len(windows)} окон")
+            return results
+        except Exception as e:
+            logging.error(f"Ошибка пакетного sentiment-анализа: {e}")
+            return [None] * len(texts)
+
+def _question_embeddings(questions: list, features: dict):
+    """Эмбеддинги вопросов: вопросы из вакансии берутся из артефакта, остальные кодируются пакетом"""
+    if not questions or not sbert_model.get():
+        return None
+    known = {text: idx for idx, text in enumerate(features["questions"])} if _has_embeddings(features["q_emb"]) else {}
+    unknown = sorted({q for q in questions if q not in known})
+    unknown_emb = dict(zip(unknown, encode_texts(unknown))) if unknown else {}
+    return np.stack([features["q_emb"][known[q]] if q in known else unknown_emb[q] for q in questions])
+
+def analyze_interview(answers: list, vacancy: dict, sentiments: list = None) -> dict:
+    """Анализ ответов на интервью (sentiments — готовые оценки из score_sentiments для пакетного режима)"""
     try:
         matched, strong_points, gaps = [], [], []
         score = 0
         total_questions = len(answers)
-        vacancy_reqs = vacancy.get("requirements", [])
+        features = get_vacancy_features(vacancy)
+        vacancy_reqs = features["requirements"]
 
-        for ans in answers:
-            ans_text = ans.get("answer", "").strip()
+        # Эмбеддинги всех ответов считаются одним пакетом, требования и вопросы вакансии — из артефакта
+        answer_texts = [ans.get("answer", "").strip() for ans in answers]
+        ans_emb = encode_texts(answer_texts) if answers else None
+        q_emb = _question_embeddings([ans.get("question", "") for ans in answers], features)
+        answer_lemmas = normalize_texts(answer_texts)
+        if sentiments is None:
+            sentiments = score_sentiments(answer_texts)
+        req_sims = ans_emb @ np.asarray(features["req_emb"]).T if _has_embeddings(ans_emb) and _has_embeddings(features["req_emb"]) else None
+
+        for i, ans in enumerate(answers):
+            ans_text = answer_texts[i]
             q = ans.get("question", "")
-            ans_lemmas = set(normalize_text(ans_text))
+            ans_lemmas = set(answer_lemmas[i])
             low = ans_text.lower()
 
             # Sentiment-анализ
             try:
-                if sentiment_analyzer:
-                    sentiment = sentiment_analyzer(ans_text)[0]
+                sentiment = sentiments[i]
+                if sentiment:
                     label = sentiment["label"]
                     sent_score = sentiment["score"]
                     logging.info(f"Sentiment: {label}, score={sent_score:.2f}")
@@ -138,16 +422,15 @@ def analyze_interview(answers: list, vacancy: dict) -> dict:
                 logging.error(f"Ошибка sentiment-анализа: {e}")
 
             # Совпадение с требованиями (вес 0.6)
-            for req in vacancy_reqs:
-                req_lemmas = set(normalize_text(req))
-                if ans_lemmas.intersection(req_lemmas) or semantic_match(req, ans_text, 0.5):
+            for j, (req, req_lemmas) in enumerate(zip(vacancy_reqs, features["req_lemmas"])):
+                if ans_lemmas.intersection(req_lemmas) or (req_sims is not None and req_sims[i, j] >= 0.5):
                     if req not in matched:
                         matched.append(req)
                         score += 0.6
                         logging.info(f"Совпадение с требованием: {req}")
 
             # Релевантность к вопросу (вес 0.2)
-            if semantic_match(q, ans_text, 0.5):
+            if q_emb is not None and float(ans_emb[i] @ q_emb[i]) >= 0.5:
                 strong_points.append("Ответ релевантен вопросу")
                 score += 0.2
                 logging.info("Ответ релевантен вопросу")
@@ -185,6 +468,7 @@ def analyze_interview(answers: list, vacancy: dict) -> dict:
             "gaps": list(set(gaps))
         }
         logging.info(f"Анализ интервью: {result}")
+        logging.info(f"Кэш лемматизации: {lemma_cache_stats()}")
         return result
     except Exception as e:
         logging.error(f"Критическая ошибка в analyze_interview: {e}")
@@ -194,4 +478,17 @@ def analyze_interview(answers: list, vacancy: dict) -> dict:
             "missing": vacancy.get("requirements", []),
             "strong_points": [],
             "gaps": ["Ошибка анализа ответов"]
-        }
\ No newline at end of file
+        }
+
+def analyze_interviews(interviews: list) -> list:
+    """
+    Пакетный анализ нескольких интервью: interviews — список пар (answers, vacancy).
+    Sentiment всех ответов всех интервью считается одним пакетом.
+    """
+    texts = [ans.get("answer", "").strip() for answers, _ in interviews for ans in answers]
+    sentiments = score_sentiments(texts)
+    results, offset = [], 0
+    for answers, vacancy in interviews:
+        results.append(analyze_interview(answers, vacancy, sentiments[offset:offset + len(answers)]))
+        offset += len(answers)
+    return results
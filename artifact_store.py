@@ -0,0 +1,103 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+
+# Идентификаторы, которые можно использовать как имя файла без изменений (без точек и разделителей пути)
+_SAFE_NAME = re.compile(r"^[\w\-]{1,64}$")
+_RESERVED = {"con", "prn", "aux", "nul"} | {f"{p}{i}" for p in ("com", "lpt") for i in range(1, 10)}
+REPLACE_ATTEMPTS = 5
+
+
+def artifact_name(item_id: str) -> str:
+    """Имя файлов артефакта: id как есть, если он безопасен, иначе хэш id"""
+    item_id = str(item_id)
+    if _SAFE_NAME.match(item_id) and item_id.lower() not in _RESERVED:
+        return item_id
+    return "id-" + hashlib.sha256(item_id.encode("utf-8")).hexdigest()[:32]
+
+
+def _replace(src: Path, dst: Path):
+    """os.replace с повторами: в Windows цель может быть ненадолго открыта читателем"""
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def read_meta(directory: Path, item_id: str):
+    """Метаданные артефакта или None, если артефакта нет или он не читается"""
+    meta_path = Path(directory) / f"{artifact_name(item_id)}.json"
+    if not meta_path.exists():
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Ошибка чтения артефакта {meta_path}: {e}")
+        return None
+
+
+def write_artifact(directory: Path, item_id: str, meta: dict, arrays: dict) -> dict:
+    """
+    Атомарная запись артефакта: массивы — в файлы с хэшем метаданных в имени (уже отображённые
+    в память файлы прежней версии не перезаписываются), затем метаданные через временный файл
+    и os.replace. Читатель видит либо старый, либо новый артефакт целиком. meta["hash"] обязателен.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = artifact_name(item_id)
+    version = meta["hash"][:16]
+    files = {}
+    for key, array in arrays.items():
+        file_name = f"{name}.{version}.{key}.npy"
+        path = directory / file_name
+        files[key] = file_name
+        if path.exists():
+            continue  # то же содержимое уже записано (параллельной сборкой)
+        tmp = _tmp_path(path)
+        with open(tmp, 'wb') as f:
+            np.save(f, np.asarray(array))
+        try:
+            _replace(tmp, path)
+        except PermissionError:
+            if not path.exists():
+                raise
+            tmp.unlink(missing_ok=True)  # цель уже создана и отображена другим процессом
+    meta = dict(meta, files=files)
+    meta_path = directory / f"{name}.json"
+    tmp = _tmp_path(meta_path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    _replace(tmp, meta_path)
+    _remove_stale(directory, name, set(files.values()))
+    return meta
+
+
+def _remove_stale(directory: Path, name: str, keep: set):
+    """Удалить массивы прежних версий; отображённые в память (Windows) остаются до следующей сборки"""
+    for path in directory.glob(f"{name}.*.npy"):
+        if path.name in keep:
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def load_array(directory: Path, meta: dict, key: str) -> np.ndarray:
+    """Массив артефакта, отображённый в память"""
+    return np.load(Path(directory) / meta["files"][key], mmap_mode='r')
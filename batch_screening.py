@@ -0,0 +1,209 @@
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from vacancy_parser import extract_vacancy
+from db_helper import save_candidates
+
+logging.basicConfig(filename='batch_screening.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = Path(__file__).parent
+FILES_DIR = BASE_DIR / "files"
+SUPPORTED_SUFFIXES = {".docx", ".rtf", ".pdf"}
+
+
+def _init_worker(threads: int):
+    """
+    Инициализация процесса-обработчика: модели загружаются один раз на процесс.
+    Потоки torch делятся между обработчиками, иначе каждый занимает все ядра.
+    """
+    import torch
+    import analyzer  # регистрирует модели в реестре
+    import model_registry
+    torch.set_num_threads(threads)
+    analyzer.SENTIMENT_NUM_THREADS = threads
+    model_registry.warm_up(["natasha", "sbert"])
+    model_registry.wait_all()
+
+
+def _screen_batch(paths: list, vacancy: dict) -> list:
+    """Извлечение текста и пакетный анализ группы резюме (выполняется в процессе-обработчике)"""
+    import model_registry
+    from analyzer import analyze_resumes_vs_vacancy, normalize_texts
+    from resume_parser import extract_text
+    from candidate_index import encode_resume
+    from text_cache import file_digest
+
+    # Без моделей анализатор молча занижает скоринг: такие резюме не считаются обработанными
+    missing_models = [name for name in ("natasha", "sbert") if model_registry.get(name) is None]
+    if missing_models:
+        error = f"Модели не загружены: {', '.join(missing_models)}"
+        logging.error(f"{error}, пакет из {len(paths)} резюме будет обработан при повторном запуске")
+        return [{"file": path, "error": error} for path in paths]
+
+    texts, ok_paths, results = [], [], []
+    for path in paths:
+        try:
+            texts.append(extract_text(Path(path)))
+            ok_paths.append(path)
+        except Exception as e:
+            logging.error(f"Ошибка извлечения текста {path}: {e}")
+            results.append({"file": path, "error": str(e)})
+
+    reports = analyze_resumes_vs_vacancy(texts, vacancy)
+    # Леммы для полнотекстового индекса считаются здесь же (попадание в кэш лемм), а не в главном процессе
+    lemmas = normalize_texts(texts)
+    for path, text, report, text_lemmas in zip(ok_paths, texts, reports, lemmas):
+        if report.get("error"):
+            # Не сохраняется с нулевым скорингом: повторный запуск обработает файл заново
+            logging.error(f"Ошибка анализа {path}: {report['error']}")
+            results.append({"file": path, "error": report["error"]})
+            continue
+        results.append({
+            "file": path,
+            "source_digest": file_digest(Path(path)),
+            "fio": Path(path).stem,
+            "score": report["score"],
+            "matched": report["matched"],
+            "missing": report["missing"],
+            "evidence": report["evidence"],
+            "resume_text": text,
+            "resume_lemmas": " ".join(text_lemmas),
+            # Векторы фрагментов уже посчитаны при анализе и берутся из кэша эмбеддингов
+            "chunk_embeddings": encode_resume(text),
+        })
+    return results
+
+
+def _prepare_vacancy(vacancy: dict):
+    """
+    Артефакт вакансии собирается один раз до запуска обработчиков: иначе все они одновременно
+    строят его на холодную. Модели главному процессу дальше не нужны и выгружаются.
+    """
+    import analyzer
+    import model_registry
+    analyzer.get_vacancy_features(vacancy)
+    for name in ("sbert", "natasha"):
+        model_registry.get_handle(name).unload()
+
+
+def _load_done(jsonl_path: Path) -> dict:
+    """Уже обработанные файлы из предыдущего (возможно, прерванного) запуска"""
+    done = {}
+    if not jsonl_path.exists():
+        return done
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # недописанная строка после сбоя
+            if "error" not in record:
+                done[record["file"]] = record
+    return done
+
+
+def _write_ranked_csv(csv_path: Path, records: list):
+    ranked = sorted(records, key=lambda r: r["score"], reverse=True)
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "fio", "score", "matched", "missing", "file"])
+        for rank, r in enumerate(ranked, 1):
+            writer.writerow([rank, r["fio"], r["score"], "; ".join(r["matched"]), "; ".join(r["missing"]), r["file"]])
+
+
+def screen_directory(directory: Path, vac_id: str, output: Path, workers: int = None,
+                     batch_size: int = 8, save_to_db: bool = True) -> dict:
+    """
+    Пакетный скрининг всех резюме каталога для вакансии.
+    Результаты дописываются в JSONL по мере готовности; повторный запуск продолжает с места сбоя.
+    В конце формируется CSV, отсортированный по скорингу.
+    """
+    vacancy = extract_vacancy(vac_id)
+    files = sorted(str(p) for p in Path(directory).iterdir() if p.suffix.lower() in SUPPORTED_SUFFIXES)
+    done = _load_done(output)
+    pending = [p for p in files if p not in done]
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    logging.info(f"Скрининг {directory} для {vac_id}: всего {len(files)}, уже обработано {len(done)}")
+    if pending:
+        _prepare_vacancy(vacancy)
+
+    start = time.perf_counter()
+    processed, errors = 0, 0
+    with open(output, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = [pool.submit(_screen_batch, batch, vacancy) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                logging.error(f"Ошибка обработки пакета: {e}")
+                continue
+            records = [r for r in batch_results if "error" not in r]
+            if save_to_db and records:
+                # Сначала БД, затем JSONL: после сбоя файл будет переобработан, а не потерян для БД.
+                # Повторная запись того же файла для вакансии пропускается по source_digest
+                save_candidates([{
+                    'fio': r["fio"],
+                    'source_digest': r["source_digest"],
+                    'resume_text': r["resume_text"],
+                    'vacancy_id': vac_id,
+                    'interview_json': json.dumps([], ensure_ascii=False),
+                    'score': r["score"],
+                    'report_json': json.dumps({k: r[k] for k in ("matched", "missing", "evidence")}, ensure_ascii=False),
+                    'resume_lemmas': r["resume_lemmas"],
+                    'answers_lemmas': "",
+                    'chunk_embeddings': r["chunk_embeddings"]
+                } for r in records])
+            for record in batch_results:
+                if "error" in record:
+                    errors += 1
+                else:
+                    record = {k: v for k, v in record.items() if k not in ("resume_text", "resume_lemmas", "chunk_embeddings")}
+                    done[record["file"]] = record
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                processed += 1
+            out.flush()
+            elapsed = time.perf_counter() - start
+            print(f"\r{len(done)}/{len(files)} резюме, ошибок: {errors}, "
+                  f"{processed / elapsed:.2f} резюме/с", end="", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    csv_path = output.with_suffix(".csv")
+    _write_ranked_csv(csv_path, list(done.values()))
+    stats = {
+        "total": len(files),
+        "processed": processed,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "resumes_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "csv": str(csv_path),
+    }
+    print(file=sys.stderr)
+    logging.info(f"Скрининг завершён: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетный скрининг резюме для вакансии")
+    parser.add_argument("vacancy_id")
+    parser.add_argument("directory", nargs="?", default=str(FILES_DIR))
+    parser.add_argument("--output", default=None, help="JSONL с результатами (по умолчанию screening_<vacancy>.jsonl)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=8, help="Резюме на один пакет SBERT")
+    parser.add_argument("--no-db", action="store_true", help="Не сохранять результаты в БД")
+    args = parser.parse_args()
+
+    output = Path(args.output) if args.output else Path(f"screening_{args.vacancy_id}.jsonl")
+    stats = screen_directory(Path(args.directory), args.vacancy_id, output, args.workers,
+                             args.batch_size, not args.no_db)
+    print(f"Обработано: {stats['processed']} из {stats['total']}, ошибок: {stats['errors']}, "
+          f"{stats['resumes_per_second']} резюме/с, рейтинг: {stats['csv']}")
@@ -0,0 +1,4 @@
+"""
+Офлайн-бенчмарки конвейера: синтетический корпус (corpus), детерминированные заглушки моделей (stubs)
+и запуск с p50/p95, пропускной способностью и сравнением с JSON-базовой линией: python -m benchmarks
+"""
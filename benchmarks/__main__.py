@@ -0,0 +1,262 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+import numpy as np
+
+logging.basicConfig(filename='benchmarks.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+BENCH_DIR = Path(__file__).parent
+BASELINES_DIR = BENCH_DIR / "baselines"
+BENCHMARKS = ("extract_text", "normalize_text", "analyze_resume_vs_vacancy", "analyze_interview",
+              "ai_generate_question", "transcribe")
+DEFAULT_TOLERANCE = 0.25  # допустимый рост p50 относительно базовой линии
+
+
+def _summary(latencies: list, items: int = None) -> dict:
+    """p50/p95/среднее (мс) и пропускная способность (элементов/с) по замерам отдельных вызовов"""
+    values = np.asarray(latencies, dtype=np.float64)
+    total = float(values.sum())
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(values, 95)) * 1000, 3),
+        "mean_ms": round(float(values.mean()) * 1000, 3),
+        "per_second": round((items or len(values)) / total, 2) if total else 0.0,
+    }
+
+
+def _measure(fn, inputs: list, warmup: int) -> list:
+    """Время каждого вызова fn(*args); первые warmup входов прогоняются без замера"""
+    for args in inputs[:warmup]:
+        fn(*args)
+    latencies = []
+    for args in inputs[warmup:]:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _isolate(workdir: Path):
+    """Кэши и артефакты — во временный каталог, чтобы замеры не зависели от состояния рабочей копии"""
+    import interview_helper
+    import resume_parser
+    import vacancy_features
+    from text_cache import TextCache
+
+    vacancy_features.ARTIFACTS_DIR = workdir / "artifacts" / "vacancies"
+    interview_helper.PREFIX_CACHE_DIR = workdir / "cache" / "llama_prefix"
+    resume_parser._text_cache = TextCache(workdir / "cache" / "extracted_text.db")
+    _fresh_caches(workdir, "init")
+
+
+def _fresh_caches(workdir: Path, name: str):
+    """Пустые кэши лемм и эмбеддингов перед каждым замером: каждый бенчмарк измеряет холодный путь"""
+    import analyzer
+    from lemma_cache import LemmaCache
+    analyzer.lemma_cache = LemmaCache(analyzer._lemmatize_batch, db_path=workdir / "cache" / f"lemmas_{name}.db",
+                                     version=analyzer.LEMMATIZER_VERSION)
+    with analyzer._embedding_lock:
+        analyzer._embedding_cache.clear()
+
+
+def _synthetic_audio(seed: int, seconds: float, rate: int = 16000) -> np.ndarray:
+    """Речеподобный сигнал: тональные всплески с паузами и шумом"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    envelope = (np.sin(2 * np.pi * 0.7 * t) > -0.3).astype(np.float32)
+    tone = np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t)
+    return (0.3 * envelope * tone + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def run(resumes: int = 30, seed: int = 0, warmup: int = 3, real=(), only=None, workdir: Path = None) -> dict:
+    """Сгенерировать корпус, подменить модели и выполнить бенчмарки. Возвращает отчёт для JSON."""
+    import analyzer
+    import interview_helper
+    import model_registry
+    from resume_parser import extract_text
+    from benchmarks import corpus, stubs
+
+    only = set(only or BENCHMARKS)
+    backends = stubs.install(real)
+    _isolate(workdir)
+    data = corpus.generate_corpus(workdir / "corpus", resumes + warmup, seed=seed)
+    results = {}
+
+    # Загрузка моделей и артефактов вакансий — до замеров
+    models = {}
+    for name, registry_name in (("natasha", "natasha"), ("sbert", "sbert"), ("sentiment", "sentiment"),
+                                ("llama", "llama"), ("whisper", stubs.WHISPER_NAME)):
+        handle = model_registry.get_handle(registry_name)
+        handle.get()
+        models[name] = {"backend": backends.get(name, "real"), "status": handle.status(),
+                        "load_seconds": round(handle.load_seconds or 0.0, 3)}
+    for vacancy in data["vacancies"]:
+        analyzer.get_vacancy_features(vacancy)
+
+    resume_items = data["resumes"]
+    texts = [extract_text(item["path"], use_cache=False) for item in resume_items]
+
+    if "extract_text" in only:
+        inputs = [(item["path"], False) for item in resume_items]
+        latencies = _measure(extract_text, inputs, warmup)
+        results["extract_text"] = _summary(latencies)
+        timed = resume_items[warmup:]
+        for fmt in sorted({item["format"] for item in timed}):
+            results[f"extract_text[{fmt}]"] = _summary(
+                [lat for lat, item in zip(latencies, timed) if item["format"] == fmt])
+
+    if "normalize_text" in only:
+        _fresh_caches(workdir, "normalize_text")
+        inputs = [(text,) for text in texts]
+        results["normalize_text"] = _summary(_measure(analyzer.normalize_text, inputs, warmup))
+        # Второй проход по тем же текстам — попадания в кэш лемм
+        results["normalize_text[cached]"] = _summary(_measure(analyzer.normalize_text, inputs[warmup:], 0))
+
+    if "analyze_resume_vs_vacancy" in only:
+        _fresh_caches(workdir, "analyze_resume_vs_vacancy")
+        inputs = [(text, item["vacancy"]) for text, item in zip(texts, resume_items)]
+        results["analyze_resume_vs_vacancy"] = _summary(_measure(analyzer.analyze_resume_vs_vacancy, inputs, warmup))
+
+    if "analyze_interview" in only:
+        _fresh_caches(workdir, "analyze_interview")
+        inputs = [(answers, vacancy) for answers, vacancy in data["interviews"]]
+        results["analyze_interview"] = _summary(_measure(analyzer.analyze_interview, inputs, warmup))
+
+    if "ai_generate_question" in only:
+        interview_helper._prefix_states.clear()
+        for values in interview_helper.ttft_metrics.values():
+            values.clear()
+        inputs = []
+        for answers, vacancy in data["interviews"]:
+            history = [line for ans in answers for line in (f"HR: {ans['question']}", f"Кандидат: {ans['answer']}")]
+            asked = [ans["question"] for ans in answers]
+            inputs.append((vacancy, history, asked, answers[-1]["answer"]))
+        results["ai_generate_question"] = _summary(_measure(interview_helper.ai_generate_question, inputs, warmup))
+        results["ai_generate_question"]["ttft"] = interview_helper.ttft_report()
+
+    if "transcribe" in only:
+        try:
+            from stt_helper import AudioRingBuffer, IncrementalTranscriber, MAX_RECORD_SECONDS
+        except ImportError as e:
+            logging.warning(f"Бенчмарк transcribe пропущен: {e}")
+        else:
+            whisper = model_registry.get(stubs.WHISPER_NAME)
+
+            def transcribe(audio):
+                # Запись порциями по секунде с шагом распознавания, как во время интервью, и финальное окно
+                buffer = AudioRingBuffer(MAX_RECORD_SECONDS)
+                transcriber = IncrementalTranscriber(lambda: whisper)
+                pcm = (audio * 32767).astype(np.int16)
+                for start in range(0, len(pcm), 16000):
+                    buffer.write(pcm[start:start + 16000].tobytes())
+                    transcriber.step(buffer)
+                transcriber.step(buffer, final=True)
+
+            inputs = [(_synthetic_audio(seed + i, 8 + i % 12),) for i in range(len(data["interviews"]))]
+            latencies = _measure(transcribe, inputs, warmup)
+            results["transcribe"] = _summary(latencies)
+            timed_seconds = sum(len(a) / 16000 for (a,) in inputs[warmup:])
+            results["transcribe"]["rtf"] = round(sum(latencies) / timed_seconds, 4) if timed_seconds else None
+
+    return {
+        "backend": backend_name(real),
+        "models": models,
+        "corpus": {"resumes": resumes, "warmup": warmup, "seed": seed},
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def backend_name(real) -> str:
+    return "stub" if not real else "real-" + "+".join(sorted(real))
+
+
+def compare(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Регрессии относительно базовой линии: [(бенчмарк, p50 базовой линии, p50 сейчас, рост)]"""
+    regressions = []
+    for name, current in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("p50_ms"):
+            continue
+        ratio = current["p50_ms"] / base["p50_ms"] - 1.0
+        if ratio > tolerance:
+            regressions.append((name, base["p50_ms"], current["p50_ms"], ratio))
+    return regressions
+
+
+def _print_report(report: dict, baseline: dict = None):
+    base = (baseline or {}).get("results", {})
+    backends = ", ".join(f"{name}={info['backend']}" for name, info in report["models"].items())
+    print(f"Модели: {backends}")
+    print(f"{'бенчмарк':<32}{'n':>6}{'p50, мс':>12}{'p95, мс':>12}{'среднее':>12}{'в секунду':>12}{'Δp50':>9}")
+    for name, r in report["results"].items():
+        delta = ""
+        if name in base and base[name].get("p50_ms"):
+            delta = f"{(r['p50_ms'] / base[name]['p50_ms'] - 1.0) * 100:+.0f}%"
+        print(f"{name:<32}{r['count']:>6}{r['p50_ms']:>12.2f}{r['p95_ms']:>12.2f}{r['mean_ms']:>12.2f}"
+              f"{r['per_second']:>12.2f}{delta:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Офлайн-бенчмарки разбора резюме, анализа и генерации вопросов")
+    parser.add_argument("--resumes", type=int, default=30, help="Резюме и интервью в корпусе (без прогрева)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=3, help="Вызовов без замера перед каждым бенчмарком")
+    parser.add_argument("--real", default="", help="Настоящие локальные модели вместо заглушек через запятую: "
+                                                   "sbert,sentiment,llama,whisper или all")
+    parser.add_argument("--only", default="", help=f"Только эти бенчмарки через запятую: {','.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=None, help="Сохранить отчёт в JSON")
+    parser.add_argument("--save-baseline", nargs="?", const="", default=None,
+                        help="Сохранить отчёт как базовую линию (по умолчанию benchmarks/baselines/<backend>.json)")
+    parser.add_argument("--compare", nargs="?", const="", default=None,
+                        help="Сравнить с базовой линией; при регрессии код возврата 1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Допустимый рост p50 (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    from benchmarks.stubs import STUB_MODELS
+    real = set(STUB_MODELS) if args.real.strip() == "all" else {n.strip() for n in args.real.split(",") if n.strip()}
+    unknown = real - set(STUB_MODELS)
+    if unknown:
+        parser.error(f"неизвестные модели: {', '.join(sorted(unknown))}")
+    only = [n.strip() for n in args.only.split(",") if n.strip()] or None
+    if only and set(only) - set(BENCHMARKS):
+        parser.error(f"неизвестные бенчмарки: {', '.join(sorted(set(only) - set(BENCHMARKS)))}")
+
+    default_baseline = BASELINES_DIR / f"{backend_name(real)}.json"
+    baseline = None
+    if args.compare is not None:
+        baseline_path = Path(args.compare) if args.compare else default_baseline
+        if not baseline_path.exists():
+            parser.error(f"базовая линия {baseline_path} не найдена (создайте её с --save-baseline)")
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="ai_hr_bench_") as tmp:
+        report = run(args.resumes, args.seed, args.warmup, real, only, Path(tmp))
+    _print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline is not None:
+        path = Path(args.save_baseline) if args.save_baseline else default_baseline
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия сохранена: {path}")
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"РЕГРЕССИЯ {name}: p50 {before:.2f} → {after:.2f} мс ({ratio * 100:+.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"Регрессий нет (допуск {args.tolerance * 100:.0f}%)")
@@ -0,0 +1,230 @@
+import json
+import random
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+# Словарь синтетического корпуса: навыки, шаблоны предложений резюме и ответов
+SKILLS = [
+    "Python", "SQL", "PostgreSQL", "администрирование Linux", "настройка Cisco", "MikroTik", "Docker",
+    "Kubernetes", "мониторинг Zabbix", "сетевые протоколы TCP/IP", "модель OSI", "Git", "CI/CD", "Ansible",
+    "Bash", "виртуализация VMware", "Active Directory", "резервное копирование", "информационная безопасность",
+    "настройка VPN", "Ubuntu", "SSH", "Nginx", "Grafana", "аналитика данных", "Excel", "1С", "техническая поддержка",
+    "работа с заявками", "документирование", "английский язык", "управление проектами",
+]
+TITLES = ["Системный администратор", "Сетевой инженер", "DevOps-инженер", "Python-разработчик",
+          "Инженер техподдержки", "Аналитик данных"]
+DUTIES = ["сопровождение инфраструктуры", "обработка инцидентов", "автоматизация рутинных задач",
+          "настройка оборудования", "взаимодействие с подрядчиками", "ведение документации"]
+FIRST_NAMES = ["Алексей", "Мария", "Иван", "Екатерина", "Дмитрий", "Ольга", "Сергей", "Анна"]
+LAST_NAMES = ["Иванов", "Смирнова", "Кузнецов", "Попова", "Васильев", "Петрова", "Соколов", "Морозова"]
+COMPANIES = ["ООО «Альфа-Сервис»", "АО «ТехноСеть»", "ПАО «Региональный банк»", "ООО «ДатаЛайн»"]
+RESUME_SENTENCES = [
+    "Имею опыт работы с {skill} более {years} лет.",
+    "В компании {company} отвечал за {skill} и {duty}.",
+    "Успешно внедрил {skill}, что сократило время {duty} на {percent}%.",
+    "Регулярно использую {skill} в ежедневной работе.",
+    "Прошёл курсы повышения квалификации по направлению {skill}.",
+    "Участвовал в проекте миграции, где применял {skill} и {skill2}.",
+]
+ANSWER_SENTENCES = [
+    "Да, я работал с {skill}, в основном занимался {duty}.",
+    "На прошлом месте мы использовали {skill}, я настраивал его с нуля.",
+    "Честно говоря, с {skill} знаком только теоретически.",
+    "Самая сложная задача была связана с {skill}: пришлось разбираться ночью.",
+    "Мне нравится {duty}, особенно когда можно применить {skill}.",
+]
+QUESTIONS = [
+    "Расскажите о своём опыте работы по этой специальности?",
+    "Какие задачи на прошлом месте работы вы считаете самыми сложными?",
+    "Почему вас заинтересовала наша вакансия?",
+]
+FORMATS = (".docx", ".rtf", ".pdf")
+
+
+def make_vacancies(rng: random.Random, count: int) -> list:
+    vacancies = []
+    for i in range(count):
+        vacancies.append({
+            "id": f"bench_{i}",
+            "title": rng.choice(TITLES),
+            "requirements": rng.sample(SKILLS, rng.randint(5, 8)),
+            "duties": rng.sample(DUTIES, 3),
+            "questions": list(QUESTIONS),
+        })
+    return vacancies
+
+
+def _fill(rng: random.Random, template: str, skills: list) -> str:
+    return template.format(skill=rng.choice(skills), skill2=rng.choice(SKILLS), duty=rng.choice(DUTIES),
+                           company=rng.choice(COMPANIES), years=rng.randint(1, 12), percent=rng.randint(10, 60))
+
+
+def make_resume(rng: random.Random, vacancy: dict, paragraphs: int = 12) -> list:
+    """Абзацы резюме: примерно половина навыков из требований вакансии, остальное — случайные"""
+    known = rng.sample(vacancy["requirements"], max(1, len(vacancy["requirements"]) // 2))
+    skills = known + rng.sample(SKILLS, 4)
+    result = [f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}", f"Желаемая должность: {vacancy['title']}"]
+    for _ in range(paragraphs):
+        result.append(" ".join(_fill(rng, rng.choice(RESUME_SENTENCES), skills) for _ in range(rng.randint(2, 5))))
+    result.append("Навыки: " + ", ".join(skills))
+    return result
+
+
+def make_answers(rng: random.Random, vacancy: dict, count: int = 3) -> list:
+    """Набор ответов интервью в формате conduct_interview"""
+    answers = []
+    for i in range(count):
+        text = " ".join(_fill(rng, rng.choice(ANSWER_SENTENCES), vacancy["requirements"])
+                        for _ in range(rng.randint(1, 4)))
+        answers.append({"question": vacancy["questions"][i % len(vacancy["questions"])],
+                        "answer": text, "duration": round(rng.uniform(5, 40), 1)})
+    return answers
+
+
+def write_docx(path: Path, paragraphs: list):
+    """Минимальный DOCX (только document.xml и обязательные части пакета)"""
+    body = "".join(f'<w:p><w:r><w:t xml:space="preserve">{escape(p)}</w:t></w:r></w:p>' for p in paragraphs)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}<w:sectPr/></w:body></w:document>')
+    content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="xml" ContentType="application/xml"/>'
+                     '<Override PartName="/word/document.xml" '
+                     'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+                     '</Types>')
+    rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr("word/document.xml", document)
+
+
+def _rtf_escape(text: str) -> str:
+    out = []
+    for ch in text:
+        if ch in "\\{}":
+            out.append("\\" + ch)
+        elif ord(ch) < 128:
+            out.append(ch)
+        else:
+            code = ord(ch)
+            out.append(f"\\u{code - 65536 if code > 32767 else code}?")
+    return "".join(out)
+
+
+def write_rtf(path: Path, paragraphs: list):
+    body = "\\par\n".join(_rtf_escape(p) for p in paragraphs)
+    path.write_text("{\\rtf1\\ansi\\ansicpg1251\\deff0{\\fonttbl{\\f0 Arial;}}\\f0\\fs24\n" + body + "\\par\n}",
+                    encoding="ascii")
+
+
+def _wrap(text: str, width: int = 90) -> list:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+
+def write_pdf(path: Path, paragraphs: list, lines_per_page: int = 50):
+    """
+    PDF с однобайтовым шрифтом: символы вне ASCII получают коды 128-255 (/Differences),
+    таблица ToUnicode позволяет извлечь исходный текст.
+    """
+    lines = [line for p in paragraphs for line in (_wrap(p) or [""])]
+    extra = sorted({ch for line in lines for ch in line if ord(ch) > 126})
+    if len(extra) > 128:
+        raise ValueError("Слишком много различных символов для однобайтового шрифта")
+    codes = {ch: 128 + i for i, ch in enumerate(extra)}
+
+    def encode(line: str) -> str:
+        out = []
+        for ch in line:
+            code = codes.get(ch, ord(ch))
+            if ch in "()\\":
+                out.append("\\" + ch)
+            elif code > 126 or code < 32:
+                out.append(f"\\{code:03o}")
+            else:
+                out.append(ch)
+        return "".join(out)
+
+    mapping = [(ord(ch), ord(ch)) for ch in map(chr, range(32, 127))] + [(code, ord(ch)) for ch, code in codes.items()]
+    cmap_blocks = []
+    for i in range(0, len(mapping), 100):
+        block = mapping[i:i + 100]
+        cmap_blocks.append(f"{len(block)} beginbfchar\n" +
+                           "\n".join(f"<{c:02X}> <{u:04X}>" for c, u in block) + "\nendbfchar")
+    cmap = ("/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+            "/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+            "1 begincodespacerange <00> <FF> endcodespacerange\n" + "\n".join(cmap_blocks) +
+            "\nendcmap CMapName currentdict /CMap defineresource pop end end")
+    differences = " ".join(f"/uni{ord(ch):04X}" for ch in extra)
+
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = {}  # номер объекта -> содержимое
+    page_ids = [5 + 2 * i for i in range(len(pages))]
+    objects[1] = "<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>"
+    objects[3] = ("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /FirstChar 32 /LastChar 255 "
+                  f"/Encoding << /Type /Encoding /Differences [128 {differences}] >> /ToUnicode 4 0 R >>")
+    objects[4] = f"<< /Length {len(cmap.encode('latin-1'))} >>\nstream\n{cmap}\nendstream"
+    for pid, page_lines in zip(page_ids, pages):
+        text = "BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(f"({encode(line)}) Tj T*" for line in page_lines) + " ET"
+        objects[pid] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>")
+        objects[pid + 1] = f"<< /Length {len(text)} >>\nstream\n{text}\nendstream"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode("latin-1")
+    for number in range(1, size):
+        out += f"{offsets[number]:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(bytes(out))
+
+
+_WRITERS = {".docx": write_docx, ".rtf": write_rtf, ".pdf": write_pdf}
+
+
+def generate_corpus(out_dir: Path, resumes: int = 30, vacancies: int = 3, interviews: int = None, seed: int = 0) -> dict:
+    """
+    Детерминированный корпус: вакансии (vacancies.json), резюме в DOCX/RTF/PDF поровну, наборы ответов интервью.
+    Возвращает {"vacancies", "resumes": [{"path", "format", "vacancy"}], "interviews": [(answers, vacancy)]}.
+    """
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    (out_dir / "resumes").mkdir(parents=True, exist_ok=True)
+    vacancy_list = make_vacancies(rng, vacancies)
+    with open(out_dir / "vacancies.json", "w", encoding="utf-8") as f:
+        json.dump(vacancy_list, f, ensure_ascii=False, indent=2)
+
+    resume_items = []
+    for i in range(resumes):
+        vacancy = vacancy_list[i % len(vacancy_list)]
+        suffix = FORMATS[i % len(FORMATS)]
+        path = out_dir / "resumes" / f"resume_{i:04d}{suffix}"
+        _WRITERS[suffix](path, make_resume(rng, vacancy))
+        resume_items.append({"path": path, "format": suffix.lstrip("."), "vacancy": vacancy})
+
+    interview_items = [(make_answers(rng, vacancy_list[i % len(vacancy_list)]), vacancy_list[i % len(vacancy_list)])
+                       for i in range(interviews if interviews is not None else resumes)]
+    return {"vacancies": vacancy_list, "resumes": resume_items, "interviews": interview_items}
@@ -0,0 +1,224 @@
+import re
+import zlib
+from collections import namedtuple
+import numpy as np
+import model_registry
+
+# Модели, которые можно заменить заглушкой (имя в model_registry -> загрузчик заглушки)
+STUB_MODELS = ("sbert", "sentiment", "llama", "whisper")
+WHISPER_NAME = "whisper_small"
+WHISPER_KEY = ("whisper-small", "cpu", "int8")  # тот же ключ, что у SpeechRecognizer(model_size="small")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _hash(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class StubSentenceTransformer:
+    """
+    Детерминированный «SBERT»: сумма хэшированных признаков слов и их префиксов, нормализованная.
+    Тексты с общими корнями слов получают близкие векторы, поэтому пороги похожести ведут себя правдоподобно.
+    """
+
+    def __init__(self, dim: int = 384, prefix: int = 5):
+        self.dim = dim
+        self.prefix = prefix
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            # Префикс — грубая замена лемматизации, целое слово различает однокоренные формы
+            for feature, weight in ((word[:self.prefix], 1.0), (word, 0.5)):
+                h = _hash(feature)
+                vector[h % self.dim] += weight if (h >> 16) & 1 else -weight
+        return vector
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               convert_to_tensor: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        matrix = np.stack([self._vector(s) for s in ([sentences] if single else sentences)]) if sentences else \
+            np.zeros((0, self.dim), dtype=np.float32)
+        if normalize_embeddings and len(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1.0, norms)
+        if convert_to_tensor:
+            import torch
+            matrix = torch.from_numpy(matrix)
+        return matrix[0] if single else matrix
+
+
+class StubTokenizer:
+    """Пословный токенизатор с растущим словарём (достаточно для нарезки окон sentiment)"""
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = []
+
+    def _id(self, word: str) -> int:
+        if word not in self.vocab:
+            self.vocab[word] = len(self.words)
+            self.words.append(word)
+        return self.vocab[word]
+
+    def __call__(self, texts, add_special_tokens: bool = True, **kwargs):
+        single = isinstance(texts, str)
+        ids = [[self._id(w) for w in text.split()] for text in ([texts] if single else texts)]
+        return {"input_ids": ids[0] if single else ids}
+
+    def decode(self, ids) -> str:
+        return " ".join(self.words[i] for i in ids)
+
+
+class StubSentiment:
+    """«rubert» sentiment: оценки меток выводятся из хэша текста, формат как у pipeline(top_k=None)"""
+
+    LABELS = ("POSITIVE", "NEGATIVE", "NEUTRAL")
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def _scores(self, text: str) -> list:
+        h = _hash(text)
+        raw = np.array([(h >> shift) & 0xFF for shift in (0, 8, 16)], dtype=np.float64) + 1.0
+        raw = raw ** 2 / (raw ** 2).sum()
+        return sorted(({"label": label, "score": float(score)} for label, score in zip(self.LABELS, raw)),
+                      key=lambda item: item["score"], reverse=True)
+
+    def __call__(self, texts, top_k=1, **kwargs):
+        single = isinstance(texts, str)
+        results = [self._scores(text) for text in ([texts] if single else texts)]
+        if top_k is not None:
+            results = [scores[:top_k] if top_k > 1 else scores[0] for scores in results]
+        return results[0] if single else results
+
+
+class StubLlama:
+    """
+    Заглушка llama_cpp.Llama: tokenize/eval/save_state/load_state для кэша префикса и генерация
+    вопроса по шаблону. Выбор шаблона и требования зависит от хэша промпта, поэтому повторная
+    попытка с дополненным промптом даёт другой вопрос, а одинаковый промпт — одинаковый.
+    """
+
+    TEMPLATES = [
+        "Расскажите, как вы применяли {req} на практике?",
+        "С какими трудностями вы сталкивались, работая с {req}?",
+        "Какой самый сложный проект у вас был связан с {req}?",
+        "Как вы оцениваете свой уровень владения {req}?",
+        "Приведите пример задачи, которую вы решили с помощью {req}?",
+    ]
+
+    def __init__(self):
+        self.input_ids = []
+
+    def tokenize(self, data: bytes, *args, **kwargs) -> list:
+        return [_hash(word) % 32000 for word in data.decode("utf-8", errors="ignore").split()]
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.input_ids)
+
+    def reset(self):
+        self.input_ids = []
+
+    def eval(self, tokens):
+        self.input_ids = list(self.input_ids) + list(tokens)
+
+    def save_state(self):
+        return list(self.input_ids)
+
+    def load_state(self, state):
+        self.input_ids = list(state)
+
+    def _answer(self, prompt: str) -> str:
+        h = _hash(prompt)
+        match = re.search(r"^Требование: (.+)$", prompt, re.MULTILINE) or \
+            re.search(r"^Требования: (.+)$", prompt, re.MULTILINE)
+        requirements = [r.strip() for r in match.group(1).split(",") if r.strip()] if match else []
+        requirement = requirements[(h >> 8) % len(requirements)] if requirements else "вашим основным стеком"
+        return self.TEMPLATES[h % len(self.TEMPLATES)].format(req=requirement)
+
+    def _generate(self, prompt: str, stopping_criteria=None):
+        self.input_ids = self.tokenize(prompt.encode("utf-8"))
+        for word in self._answer(prompt).split(" "):
+            token = self.tokenize(word.encode("utf-8"))
+            self.input_ids += token
+            if stopping_criteria is not None and stopping_criteria(self.input_ids, None):
+                return
+            yield word + " "
+
+    def __call__(self, prompt: str, stream: bool = False, stopping_criteria=None, **kwargs):
+        chunks = self._generate(prompt, stopping_criteria)
+        if stream:
+            return ({"choices": [{"text": chunk}]} for chunk in chunks)
+        return {"choices": [{"text": "".join(chunks)}]}
+
+
+Segment = namedtuple("Segment", "start end text")
+TranscriptionInfo = namedtuple("TranscriptionInfo", "language duration")
+
+
+class StubWhisper:
+    """faster_whisper.WhisperModel: сегмент на каждые segment_seconds аудио, слова выбираются по хэшу отсчётов"""
+
+    WORDS = ["я", "работал", "с", "сетями", "настраивал", "сервер", "в", "проекте", "мы", "использовали",
+             "python", "и", "docker", "для", "автоматизации", "задач"]
+
+    def __init__(self, rate: int = 16000, segment_seconds: float = 2.0):
+        self.rate = rate
+        self.segment_seconds = segment_seconds
+
+    def transcribe(self, audio, language: str = None, **kwargs):
+        audio = np.asarray(audio, dtype=np.float32)
+        duration = len(audio) / self.rate
+        step = int(self.segment_seconds * self.rate)
+        segments = []
+        for start in range(0, len(audio), step):
+            part = audio[start:start + step]
+            if len(part) < self.rate * 0.3:
+                break
+            h = _hash(np.round(part[::160], 3).tobytes().hex())
+            words = [self.WORDS[(h >> (4 * k)) % len(self.WORDS)] for k in range(4)]
+            segments.append(Segment(start / self.rate, (start + len(part)) / self.rate, " " + " ".join(words)))
+        return iter(segments), TranscriptionInfo(language or "ru", duration)
+
+
+def _load_real_whisper():
+    from faster_whisper import WhisperModel
+    return WhisperModel("small", device="cpu", compute_type="int8")
+
+
+_STUB_LOADERS = {
+    "sbert": StubSentenceTransformer,
+    "sentiment": StubSentiment,
+    "llama": StubLlama,
+    "whisper": StubWhisper,
+}
+
+
+def install(real=()) -> dict:
+    """
+    Подменить загрузчики моделей заглушками, кроме перечисленных в real (остаются настоящие локальные модели).
+    Модули analyzer и interview_helper должны быть импортированы заранее: они регистрируют модели.
+    Возвращает {модель: "stub" | "real"}.
+    """
+    backends = {}
+    for name in STUB_MODELS:
+        is_real = name in real
+        backends[name] = "real" if is_real else "stub"
+        if name == "whisper":
+            # Whisper регистрируется SpeechRecognizer, которому нужен микрофон: регистрируем сами под тем же ключом
+            loader = _load_real_whisper if is_real else _STUB_LOADERS[name]
+            handle = model_registry.register(WHISPER_NAME, loader, key=WHISPER_KEY)
+            model_registry.override(WHISPER_NAME, loader)
+        elif not is_real:
+            model_registry.override(name, _STUB_LOADERS[name])
+            handle = model_registry.get_handle(name)
+        else:
+            handle = model_registry.get_handle(name)
+        handle.pinned = True  # бюджет памяти не должен выгружать модели посреди замеров
+    return backends
@@ -0,0 +1,306 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+import numpy as np
+
+logging.basicConfig(filename='candidate_index.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = Path(__file__).parent
+INDEX_DIR = BASE_DIR / "artifacts" / "candidate_index"
+MATCH_THRESHOLD = 0.45  # тот же порог, что у семантического сопоставления резюме
+BLOCK_SIZE = 65536  # фрагментов на один матричный блок при поиске
+
+
+def encode_resume(resume_text: str) -> np.ndarray:
+    """Эмбеддинги фрагментов резюме той же моделью SBERT, что и анализатор (float16)"""
+    from analyzer import split_into_chunks, encode_texts
+    chunks = split_into_chunks(resume_text or "")
+    embeddings = encode_texts(chunks) if chunks else None
+    if embeddings is None:
+        return None
+    return np.asarray(embeddings, dtype=np.float16)
+
+
+@contextmanager
+def _process_lock(path: Path):
+    """Межпроцессная блокировка записи: GUI и пакетный скрининг дописывают один и тот же индекс"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # сам ждёт ~10 с, затем OSError
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class CandidateIndex:
+    """
+    Векторный индекс фрагментов резюме: непрерывная матрица float16 на диске (отображается через mmap)
+    и массив владельцев (id кандидата для каждой строки). Фрагменты одного кандидата лежат подряд.
+    Опционально — грубая кластеризация (сферический k-means) для больших пулов.
+    """
+
+    def __init__(self, index_dir: Path = INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        self._lock = threading.Lock()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.index_dir / "meta.json"
+
+    def _file(self, name: str) -> Path:
+        return self.index_dir / name
+
+    @contextmanager
+    def _write_lock(self):
+        """Блокировка записи в потоке и между процессами (файл блокировки лежит рядом с каталогом индекса)"""
+        with self._lock, _process_lock(self.index_dir.with_name(self.index_dir.name + ".lock")):
+            yield
+
+    def meta(self) -> dict:
+        if not self._meta_path.exists():
+            return {"dim": None, "count": 0, "clusters": 0}
+        with open(self._meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, meta: dict):
+        tmp = self._meta_path.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        tmp.replace(self._meta_path)
+
+    def _arrays(self, meta: dict):
+        """Матрица эмбеддингов, владельцы и кластеры фрагментов (только первые meta['count'] строк)"""
+        count, dim = meta["count"], meta["dim"]
+        matrix = np.memmap(self._file("embeddings.f16"), dtype=np.float16, mode='r', shape=(count, dim))
+        owners = np.memmap(self._file("owners.i64"), dtype=np.int64, mode='r', shape=(count,))
+        clusters = None
+        if meta.get("clusters"):
+            clusters = np.memmap(self._file("clusters.i32"), dtype=np.int32, mode='r', shape=(count,))
+        return matrix, owners, clusters
+
+    def add_many(self, items: list) -> int:
+        """Дописать фрагменты кандидатов: items — [(candidate_id, матрица эмбеддингов фрагментов)]"""
+        with self._write_lock():
+            return self._append(items)
+
+    def _append(self, items: list) -> int:
+        """Запись фрагментов в индекс; вызывается под _write_lock()"""
+        items = [(cid, np.asarray(emb, dtype=np.float16)) for cid, emb in items if emb is not None and len(emb)]
+        if not items:
+            return 0
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        meta = self.meta()
+        dim = meta["dim"] or items[0][1].shape[1]
+        matrix = np.concatenate([emb for _, emb in items])
+        if matrix.shape[1] != dim:
+            raise ValueError(f"Размерность эмбеддингов {matrix.shape[1]} не совпадает с индексом ({dim})")
+        owners = np.concatenate([np.full(len(emb), cid, dtype=np.int64) for cid, emb in items])
+
+        # Данные дописываются после meta['count'] строк; хвост от прерванной записи перезаписывается
+        for name, array, itemsize in (("embeddings.f16", matrix, 2 * dim), ("owners.i64", owners, 8)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(meta["count"] * itemsize)
+                f.seek(meta["count"] * itemsize)
+                f.write(np.ascontiguousarray(array).tobytes())
+        if meta.get("clusters"):
+            centroids = np.load(self._file("centroids.npy"))
+            assignment = (matrix.astype(np.float32) @ centroids.T).argmax(axis=1).astype(np.int32)
+            with open(self._file("clusters.i32"), "ab") as f:
+                f.truncate(meta["count"] * 4)
+                f.seek(meta["count"] * 4)
+                f.write(assignment.tobytes())
+
+        meta.update(dim=int(dim), count=meta["count"] + len(matrix))
+        self._write_meta(meta)
+        logging.info(f"В индекс добавлено кандидатов: {len(items)}, фрагментов: {len(matrix)}")
+        return len(matrix)
+
+    def build_clusters(self, n_clusters: int = None, iterations: int = 10, sample: int = 50000, seed: int = 0) -> int:
+        """Грубый индекс: сферический k-means по выборке фрагментов и назначение кластеров всем строкам"""
+        with self._write_lock():
+            meta = self.meta()
+            if not meta["count"]:
+                return 0
+            matrix, _, _ = self._arrays(dict(meta, clusters=0))
+            n_clusters = n_clusters or max(1, int(np.sqrt(meta["count"])))
+            n_clusters = min(n_clusters, meta["count"])
+            rng = np.random.default_rng(seed)
+            idx = rng.choice(meta["count"], size=min(sample, meta["count"]), replace=False)
+            data = np.asarray(matrix[np.sort(idx)], dtype=np.float32)
+            centroids = data[rng.choice(len(data), size=n_clusters, replace=False)]
+            for _ in range(iterations):
+                assignment = (data @ centroids.T).argmax(axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, data)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+            assignment = np.empty(meta["count"], dtype=np.int32)
+            for start in range(0, meta["count"], BLOCK_SIZE):
+                block = np.asarray(matrix[start:start + BLOCK_SIZE], dtype=np.float32)
+                assignment[start:start + len(block)] = (block @ centroids.T).argmax(axis=1)
+            np.save(self._file("centroids.npy"), centroids.astype(np.float32))
+            assignment.tofile(self._file("clusters.i32"))
+            meta["clusters"] = int(n_clusters)
+            self._write_meta(meta)
+        logging.info(f"Построено кластеров: {n_clusters} по {meta['count']} фрагментам")
+        return n_clusters
+
+    def best_similarities(self, req_emb: np.ndarray, nprobe: int = None):
+        """
+        Лучшая похожесть каждого требования на фрагменты каждого кандидата.
+        Возвращает (candidate_ids [C], best [R x C]); nprobe ограничивает поиск ближайшими кластерами.
+        """
+        meta = self.meta()
+        req_emb = np.asarray(req_emb, dtype=np.float32)
+        if not meta["count"] or not len(req_emb):
+            return np.zeros(0, dtype=np.int64), np.zeros((len(req_emb), 0), dtype=np.float32)
+        matrix, owners, clusters = self._arrays(meta)
+        candidate_ids, dense = np.unique(np.asarray(owners), return_inverse=True)
+        best = np.full((len(req_emb), len(candidate_ids)), -1.0, dtype=np.float32)
+
+        if nprobe and clusters is not None:
+            centroids = np.load(self._file("centroids.npy"))
+            probe = np.argsort(-(req_emb @ centroids.T), axis=1)[:, :nprobe]
+            rows = np.flatnonzero(np.isin(clusters, np.unique(probe)))
+        else:
+            rows = None
+
+        total = meta["count"] if rows is None else len(rows)
+        for start in range(0, total, BLOCK_SIZE):
+            if rows is None:
+                block_rows = slice(start, start + BLOCK_SIZE)
+                block_owner = dense[block_rows]
+            else:
+                block_rows = rows[start:start + BLOCK_SIZE]
+                block_owner = dense[block_rows]
+            sims = req_emb @ np.asarray(matrix[block_rows], dtype=np.float32).T
+            # Фрагменты одной записи кандидата идут подряд: максимум по сегментам через reduceat
+            starts = np.flatnonzero(np.r_[True, block_owner[1:] != block_owner[:-1]])
+            seg_max = np.maximum.reduceat(sims, starts, axis=1)
+            seg_owner = block_owner[starts]
+            # Кандидат, переиндексированный повторно, встречается в блоке несколькими сегментами
+            np.maximum.at(best.T, seg_owner, seg_max.T)
+        if rows is not None:
+            # Кандидаты без фрагментов в просмотренных кластерах не сравнивались и не выдаются
+            probed = np.unique(dense[rows])
+            return candidate_ids[probed], best[:, probed]
+        return candidate_ids, best
+
+    def rank(self, req_emb: np.ndarray, top_k: int = 20, threshold: float = MATCH_THRESHOLD, nprobe: int = None) -> list:
+        """Топ кандидатов по доле покрытых требований, при равенстве — по средней похожести"""
+        candidate_ids, best = self.best_similarities(req_emb, nprobe)
+        if not len(candidate_ids):
+            return []
+        coverage = (best >= threshold).mean(axis=0) * 100
+        mean_sim = best.mean(axis=0)
+        order = np.lexsort((-mean_sim, -coverage))[:top_k]
+        return [{
+            "candidate_id": int(candidate_ids[i]),
+            "score": round(float(coverage[i]), 1),
+            "mean_similarity": round(float(mean_sim[i]), 3),
+            "similarities": [round(float(s), 3) for s in best[:, i]],
+        } for i in order]
+
+    def top_k_per_requirement(self, req_emb: np.ndarray, k: int = 10, nprobe: int = None) -> list:
+        """Для каждого требования — k кандидатов с наибольшей похожестью: [[(candidate_id, similarity)]]"""
+        candidate_ids, best = self.best_similarities(req_emb, nprobe)
+        result = []
+        for row in best:
+            k_row = min(k, len(row))
+            if not k_row:
+                result.append([])
+                continue
+            top = np.argpartition(-row, k_row - 1)[:k_row]
+            top = top[np.argsort(-row[top])]
+            result.append([(int(candidate_ids[i]), round(float(row[i]), 3)) for i in top])
+        return result
+
+
+_index = CandidateIndex()
+
+
+def _prepare(items: list) -> list:
+    prepared = []
+    for candidate_id, resume_text, embeddings in items:
+        if embeddings is None:
+            embeddings = encode_resume(resume_text)
+        prepared.append((candidate_id, embeddings))
+    return prepared
+
+
+def add_candidates(items: list) -> int:
+    """Инкрементальное обновление индекса: items — [(candidate_id, resume_text, эмбеддинги фрагментов или None)]"""
+    return _index.add_many(_prepare(items))
+
+
+def rank_candidates_for_vacancy(vacancy: dict, top_k: int = 20, nprobe: int = None) -> list:
+    """Обратное сопоставление: лучшие кандидаты пула для вакансии без повторного анализа резюме"""
+    from analyzer import get_vacancy_features
+    features = get_vacancy_features(vacancy)
+    results = _index.rank(features["req_emb"], top_k=top_k, nprobe=nprobe)
+    for item in results:
+        item["matched"] = [req for req, sim in zip(features["requirements"], item["similarities"]) if sim >= MATCH_THRESHOLD]
+    return results
+
+
+def rebuild_from_db(batch_size: int = 256) -> int:
+    """Полная пересборка индекса по всем кандидатам в БД (фоновые дописывания ждут её окончания)"""
+    import shutil
+    from db_helper import get_connection, get_candidate_payload
+    conn = get_connection()
+    with _index._write_lock():
+        if _index.index_dir.exists():
+            shutil.rmtree(_index.index_dir)
+        ids = [row[0] for row in conn.execute("SELECT id FROM candidates ORDER BY id")]
+        for start in range(0, len(ids), batch_size):
+            _index._append(_prepare([(cid, get_candidate_payload(cid, "resume_text"), None)
+                                     for cid in ids[start:start + batch_size]]))
+    if ids:
+        with conn:
+            conn.execute("DELETE FROM vector_index_pending WHERE candidate_id <= ?", (ids[-1],))
+    logging.info(f"Индекс кандидатов пересобран: {len(ids)}")
+    return len(ids)
+
+
+if __name__ == "__main__":
+    import argparse
+    from vacancy_parser import extract_vacancy
+    from db_helper import get_candidate
+
+    parser = argparse.ArgumentParser(description="Лучшие кандидаты из базы для вакансии")
+    parser.add_argument("vacancy_id", nargs="?")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--nprobe", type=int, default=None, help="Число просматриваемых кластеров")
+    parser.add_argument("--rebuild", action="store_true", help="Пересобрать индекс по БД")
+    parser.add_argument("--clusters", type=int, default=None, help="Построить грубый индекс из N кластеров")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Проиндексировано кандидатов: {rebuild_from_db()}")
+    if args.clusters:
+        print(f"Кластеров: {_index.build_clusters(args.clusters)}")
+    if args.vacancy_id:
+        for rank, item in enumerate(rank_candidates_for_vacancy(extract_vacancy(args.vacancy_id), args.top_k, args.nprobe), 1):
+            candidate = get_candidate(item["candidate_id"])
+            print(f"{rank}. {candidate['fio']} (id {candidate['id']}): {item['score']}%, {', '.join(item['matched'])}")
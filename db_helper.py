@@ -1,13 +1,82 @@
+import os
+import re
+import json
+import lzma
+import zlib
+import hashlib
 import sqlite3
+import queue
+import logging
+import threading
 from pathlib import Path
 import datetime
+import numpy as np
 
 DB_PATH = Path(__file__).parent / "db" / "hr_assistant.db"
+DEFAULT_BATCH_SIZE = 500
+BLOB_CODEC = "zlib"  # "zlib" (быстрее) или "lzma" (компактнее)
+# Поля кандидата, которые хранятся в таблице blobs по хэшу содержимого
+PAYLOAD_FIELDS = {"resume_text": "resume_blob", "interview_json": "interview_blob", "report_json": "report_blob"}
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+AUDIO_CODEC = "pcm16-delta"
+
+
+def _delta_compress(raw: bytes) -> bytes:
+    """Аудио int16: разности соседних отсчётов (фиксированный предсказатель, как в FLAC) + zlib"""
+    pcm = np.frombuffer(raw, dtype=np.int16)
+    return zlib.compress(np.diff(pcm, prepend=np.int16(0)).tobytes(), 6)
+
+
+def _delta_decompress(data: bytes) -> bytes:
+    deltas = np.frombuffer(zlib.decompress(data), dtype=np.int16)
+    return np.cumsum(deltas, dtype=np.int16).tobytes()
+
+
+_CODECS = {
+    "zlib": (lambda raw: zlib.compress(raw, 6), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+    AUDIO_CODEC: (_delta_compress, _delta_decompress),
+}
+
+
+def _blob_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _put_bytes(conn: sqlite3.Connection, raw: bytes, codec: str) -> str:
+    """Сохранить содержимое в blobs (сжатым, без дублей); возвращает хэш содержимого"""
+    digest = _blob_hash(raw)
+    if conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+        compress, _ = _CODECS[codec]
+        conn.execute("INSERT OR IGNORE INTO blobs (hash, codec, raw_size, data) VALUES (?, ?, ?, ?)",
+                     (digest, codec, len(raw), compress(raw)))
+    return digest
+
+
+def _put_blob(conn: sqlite3.Connection, text: str):
+    """Сохранить текст в blobs; возвращает хэш содержимого"""
+    if text is None:
+        return None
+    return _put_bytes(conn, text.encode("utf-8"), BLOB_CODEC)
+
+
+def _move_payloads_to_blobs(conn: sqlite3.Connection):
+    """Миграция существующих строк: текстовые поля переносятся в blobs, в строке остаётся ссылка"""
+    rows = conn.execute("SELECT id, resume_text, interview_json, report_json FROM candidates").fetchall()
+    for row_id, *values in rows:
+        hashes = [_put_blob(conn, value) for value in values]
+        conn.execute("""
+        UPDATE candidates SET resume_blob = ?, interview_blob = ?, report_blob = ?,
+            resume_text = NULL, interview_json = NULL, report_json = NULL
+        WHERE id = ?
+        """, (*hashes, row_id))
+    if rows:
+        logging.info(f"Перенесено в blobs: {len(rows)} кандидатов")
+
+
+# Миграции схемы: (версия, [SQL или функция(conn)]). Текущая версия хранится в PRAGMA user_version
+MIGRATIONS = [
+    (1, ["""
     CREATE TABLE IF NOT EXISTS candidates (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         fio TEXT,
@@ -18,18 +87,505 @@ def init_db():
         report_json TEXT,
         timestamp TEXT
     )
-    """)
-    conn.commit()
-    conn.close()
-
-def save_candidate(data: dict):
-    init_db()  # На всякий случай
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    INSERT INTO candidates (fio, resume_text, vacancy_id, interview_json, score, report_json, timestamp)
-    VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (data['fio'], data['resume_text'], data['vacancy_id'], data['interview_json'],
-          data['score'], data['report_json'], datetime.datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    """]),
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_candidates_vacancy ON candidates (vacancy_id)",
+        "CREATE INDEX IF NOT EXISTS idx_candidates_score ON candidates (score)",
+        "CREATE INDEX IF NOT EXISTS idx_candidates_timestamp ON candidates (timestamp)",
+    ]),
+    (3, [
+        "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, codec TEXT, raw_size INTEGER, data BLOB)",
+        "ALTER TABLE candidates ADD COLUMN resume_blob TEXT",
+        "ALTER TABLE candidates ADD COLUMN interview_blob TEXT",
+        "ALTER TABLE candidates ADD COLUMN report_blob TEXT",
+        _move_payloads_to_blobs,
+    ]),
+    # Полнотекстовый индекс по леммам резюме и ответов интервью; rowid = candidates.id (заменён в версии 8)
+    (4, [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(resume, answers, content='')",
+    ]),
+    # Аудио ответов интервью (int16, сжатое в blobs): для повторной расшифровки новыми моделями
+    (5, ["""
+    CREATE TABLE IF NOT EXISTS answer_audio (
+        candidate_id INTEGER NOT NULL REFERENCES candidates (id),
+        question_index INTEGER NOT NULL,
+        sample_rate INTEGER NOT NULL,
+        samples INTEGER NOT NULL,
+        audio_blob TEXT NOT NULL,
+        PRIMARY KEY (candidate_id, question_index)
+    )
+    """]),
+    # Кандидаты, ещё не попавшие в векторный индекс (обновление фоновое и может не выполниться)
+    (6, ["CREATE TABLE IF NOT EXISTS vector_index_pending (candidate_id INTEGER PRIMARY KEY)"]),
+    # SHA-256 исходного файла резюме (пакетный скрининг): повторный запуск не дублирует кандидатов.
+    # NULL (кандидаты из GUI) в уникальном индексе не конфликтуют
+    (7, [
+        "ALTER TABLE candidates ADD COLUMN source_digest TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_candidates_source ON candidates (source_digest, vacancy_id)",
+    ]),
+    # Индекс поиска поверх хранимых лемм: удаление строки использует ровно проиндексированные значения,
+    # а не повторную лемматизацию. Прежний индекс без содержимого удаляется; кандидаты без строки
+    # в candidate_lemmas индексируются в фоне при запуске (backfill_search_index)
+    (8, [
+        "DROP TABLE IF EXISTS candidates_fts",
+        "CREATE TABLE IF NOT EXISTS candidate_lemmas (candidate_id INTEGER PRIMARY KEY, resume TEXT, answers TEXT)",
+        "CREATE VIRTUAL TABLE candidates_fts USING fts5(resume, answers, content='candidate_lemmas', "
+        "content_rowid='candidate_id')",
+    ]),
+]
+
+_local = threading.local()
+_migrate_lock = threading.Lock()
+_migrated = set()
+
+
+def _migrate(conn: sqlite3.Connection):
+    """
+    Каждая миграция — одна явная транзакция: sqlite3 не открывает транзакцию перед DDL сам,
+    и без неё сбой посреди миграции оставил бы часть изменений при старом user_version.
+    BEGIN IMMEDIATE сразу берёт блокировку записи: другой процесс ждёт и затем видит новую версию.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if target <= version:
+                conn.commit()  # уже мигрировано параллельным процессом
+                continue
+            for sql in statements:
+                if callable(sql):
+                    sql(conn)
+                else:
+                    conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        version = target
+        logging.info(f"БД мигрирована до версии {target}")
+
+
+def get_connection() -> sqlite3.Connection:
+    """Постоянное соединение текущего потока (WAL); миграции выполняются один раз на процесс"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _migrate_lock:
+        if str(DB_PATH) not in _migrated:
+            _migrate(conn)
+            _migrated.add(str(DB_PATH))
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def init_db():
+    get_connection()
+
+
+_INSERT_CANDIDATE = """
+INSERT INTO candidates (fio, vacancy_id, score, timestamp, source_digest, resume_blob, interview_blob, report_blob)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _lemmatize(text: str) -> str:
+    # Ленивый импорт: анализатор тянет torch/transformers, а db_helper нужен и лёгким процессам
+    from analyzer import normalize_text
+    return " ".join(normalize_text(text)) if text else ""
+
+
+def _answers_text(interview_json: str) -> str:
+    try:
+        answers = json.loads(interview_json) if interview_json else []
+        return "\n".join(ans.get("answer", "") for ans in answers if isinstance(ans, dict))
+    except (ValueError, TypeError):
+        return ""
+
+
+def _candidate_lemmas(data: dict) -> tuple:
+    """
+    Леммы резюме и ответов для индекса поиска (готовые можно передать в resume_lemmas/answers_lemmas).
+    Вызывается до открытия транзакции: лемматизация не должна держать блокировку записи БД.
+    """
+    resume = data.get('resume_lemmas')
+    if resume is None:
+        resume = _lemmatize(data.get('resume_text'))
+    answers = data.get('answers_lemmas')
+    if answers is None:
+        answers = _lemmatize(_answers_text(data.get('interview_json')))
+    return resume, answers
+
+
+def _index_candidate(conn: sqlite3.Connection, candidate_id: int, lemmas: tuple):
+    """Добавить кандидата в полнотекстовый индекс: lemmas — (резюме, ответы) из _candidate_lemmas"""
+    conn.execute("INSERT INTO candidate_lemmas (candidate_id, resume, answers) VALUES (?, ?, ?)",
+                 (candidate_id, *lemmas))
+    conn.execute("INSERT INTO candidates_fts (rowid, resume, answers) VALUES (?, ?, ?)", (candidate_id, *lemmas))
+
+
+def _unindex_candidate(conn: sqlite3.Connection, candidate_id: int):
+    """Удалить кандидата из индекса теми значениями, с которыми он был проиндексирован"""
+    row = conn.execute("SELECT resume, answers FROM candidate_lemmas WHERE candidate_id = ?",
+                       (candidate_id,)).fetchone()
+    if row is None:
+        return
+    conn.execute("INSERT INTO candidates_fts (candidates_fts, rowid, resume, answers) VALUES ('delete', ?, ?, ?)",
+                 (candidate_id, *row))
+    conn.execute("DELETE FROM candidate_lemmas WHERE candidate_id = ?", (candidate_id,))
+
+
+def _insert_answer_audio(conn: sqlite3.Connection, candidate_id: int, recordings: list):
+    """Аудио ответов: recordings[i] — (отсчёты int16, частота) для i-го ответа или None"""
+    for index, recording in enumerate(recordings or []):
+        if recording is None:
+            continue
+        pcm, rate = recording
+        pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+        if not len(pcm):
+            continue
+        conn.execute("""
+        INSERT OR REPLACE INTO answer_audio (candidate_id, question_index, sample_rate, samples, audio_blob)
+        VALUES (?, ?, ?, ?, ?)
+        """, (candidate_id, index, int(rate), len(pcm), _put_bytes(conn, pcm.tobytes(), AUDIO_CODEC)))
+
+
+def _insert_candidate(conn: sqlite3.Connection, data: dict, lemmas: tuple):
+    """(id, вставлен ли): кандидат с тем же source_digest для вакансии не вставляется повторно"""
+    if data.get('source_digest'):
+        row = conn.execute("SELECT id FROM candidates WHERE source_digest = ? AND vacancy_id = ?",
+                           (data['source_digest'], data['vacancy_id'])).fetchone()
+        if row is not None:
+            return row[0], False
+    hashes = [_put_blob(conn, data.get(field)) for field in PAYLOAD_FIELDS]
+    cur = conn.execute(_INSERT_CANDIDATE, (
+        data['fio'], data['vacancy_id'], data['score'],
+        data.get('timestamp') or datetime.datetime.now().isoformat(), data.get('source_digest'), *hashes
+    ))
+    _index_candidate(conn, cur.lastrowid, lemmas)
+    _insert_answer_audio(conn, cur.lastrowid, data.get('answer_audio'))
+    conn.execute("INSERT OR IGNORE INTO vector_index_pending (candidate_id) VALUES (?)", (cur.lastrowid,))
+    return cur.lastrowid, True
+
+
+def _update_vector_index(saved: list):
+    """
+    Дописать сохранённых кандидатов в векторный индекс (готовые эмбеддинги — в chunk_embeddings).
+    При ошибке кандидаты остаются в vector_index_pending и индексируются при следующем запуске.
+    """
+    ids = [candidate_id for candidate_id, _ in saved]
+    try:
+        import candidate_index
+        candidate_index.add_candidates([
+            (candidate_id, data.get('resume_text'), data.get('chunk_embeddings')) for candidate_id, data in saved
+        ])
+    except Exception as e:
+        logging.error(f"Ошибка обновления векторного индекса кандидатов {ids}: {e}. "
+                      f"Они будут переиндексированы при следующем запуске")
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany("DELETE FROM vector_index_pending WHERE candidate_id = ?", [(i,) for i in ids])
+
+
+_vector_queue = queue.Queue()
+_vector_thread = None
+_vector_thread_lock = threading.Lock()
+
+
+def _run_vector_index():
+    """Фоновый поток обновления векторного индекса: кодирование SBERT не блокирует GUI"""
+    while True:
+        saved = _vector_queue.get()
+        try:
+            _update_vector_index(saved)
+        finally:
+            _vector_queue.task_done()
+
+
+def _queue_vector_index(saved: list):
+    global _vector_thread
+    with _vector_thread_lock:
+        if _vector_thread is None:
+            _vector_thread = threading.Thread(target=_run_vector_index, name="vector-index", daemon=True)
+            _vector_thread.start()
+    _vector_queue.put(saved)
+
+
+def resume_vector_index(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """При запуске: поставить в фоновую очередь кандидатов, не попавших в векторный индекс ранее (читает БД)"""
+    ids = [row[0] for row in get_connection().execute(
+        "SELECT candidate_id FROM vector_index_pending ORDER BY candidate_id")]
+    for start in range(0, len(ids), batch_size):
+        _queue_vector_index([
+            (candidate_id, {'resume_text': get_candidate_payload(candidate_id, "resume_text")})
+            for candidate_id in ids[start:start + batch_size]
+        ])
+    if ids:
+        logging.info(f"Переиндексация кандидатов, не попавших в векторный индекс: {ids}")
+    return len(ids)
+
+
+def save_candidate(data: dict) -> int:
+    """Сохранить кандидата; векторный индекс обновляется в фоновом потоке"""
+    conn = get_connection()
+    lemmas = _candidate_lemmas(data)
+    with conn:
+        candidate_id, inserted = _insert_candidate(conn, data, lemmas)
+    if inserted:
+        _queue_vector_index([(candidate_id, data)])
+    return candidate_id
+
+
+def save_candidates(records: list, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Пакетное сохранение кандидатов: одна транзакция на batch_size записей. Возвращает число новых записей"""
+    conn = get_connection()
+    saved = 0
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        lemmas = [_candidate_lemmas(data) for data in batch]
+        with conn:
+            results = [_insert_candidate(conn, data, item) for data, item in zip(batch, lemmas)]
+        inserted = [(candidate_id, data) for (candidate_id, new), data in zip(results, batch) if new]
+        if inserted:
+            _update_vector_index(inserted)
+        saved += len(inserted)
+    return saved
+
+
+def _load_bytes(digest: str) -> bytes:
+    row = get_connection().execute("SELECT codec, data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+    if row is None:
+        raise KeyError(f"Blob {digest} не найден")
+    codec, data = row
+    return _CODECS[codec][1](data)
+
+
+def load_blob(digest: str):
+    """Распаковать содержимое по хэшу (None, если ссылки нет)"""
+    if digest is None:
+        return None
+    return _load_bytes(digest).decode("utf-8")
+
+
+def load_answer_audio(candidate_id: int) -> list:
+    """Архивное аудио ответов кандидата: [(номер вопроса, отсчёты int16, частота)]"""
+    rows = get_connection().execute("""
+    SELECT question_index, sample_rate, audio_blob FROM answer_audio WHERE candidate_id = ? ORDER BY question_index
+    """, (candidate_id,)).fetchall()
+    return [(index, np.frombuffer(_load_bytes(digest), dtype=np.int16), rate) for index, rate, digest in rows]
+
+
+def candidates_with_audio(vacancy_id: str = None) -> list:
+    """id кандидатов, у которых есть архив аудио ответов"""
+    sql = "SELECT DISTINCT a.candidate_id FROM answer_audio a JOIN candidates c ON c.id = a.candidate_id"
+    params = []
+    if vacancy_id is not None:
+        sql += " WHERE c.vacancy_id = ?"
+        params.append(vacancy_id)
+    return [row[0] for row in get_connection().execute(sql + " ORDER BY a.candidate_id", params)]
+
+
+def update_interview(candidate_id: int, interview_json: str):
+    """Заменить ответы интервью кандидата (например, после повторной расшифровки) вместе с индексом поиска"""
+    conn = get_connection()
+    stored = conn.execute("SELECT resume FROM candidate_lemmas WHERE candidate_id = ?", (candidate_id,)).fetchone()
+    lemmas = _candidate_lemmas({
+        'resume_lemmas': stored[0] if stored else None,
+        'resume_text': None if stored else get_candidate_payload(candidate_id, "resume_text"),
+        'interview_json': interview_json,
+    })
+    with conn:
+        _unindex_candidate(conn, candidate_id)
+        conn.execute("UPDATE candidates SET interview_blob = ? WHERE id = ?",
+                     (_put_blob(conn, interview_json), candidate_id))
+        _index_candidate(conn, candidate_id, lemmas)
+
+
+def get_candidate(candidate_id: int) -> dict:
+    """Метаданные кандидата; тексты не распаковываются (см. get_candidate_payload)"""
+    row = get_connection().execute("""
+    SELECT id, fio, vacancy_id, score, timestamp, resume_blob, interview_blob, report_blob
+    FROM candidates WHERE id = ?
+    """, (candidate_id,)).fetchone()
+    if row is None:
+        raise KeyError(f"Кандидат {candidate_id} не найден")
+    keys = ("id", "fio", "vacancy_id", "score", "timestamp", "resume_blob", "interview_blob", "report_blob")
+    return dict(zip(keys, row))
+
+
+def get_candidate_payload(candidate_id: int, field: str) -> str:
+    """Распаковать одно текстовое поле кандидата: resume_text, interview_json или report_json"""
+    column = PAYLOAD_FIELDS[field]
+    row = get_connection().execute(f"SELECT {column} FROM candidates WHERE id = ?", (candidate_id,)).fetchone()
+    if row is None:
+        raise KeyError(f"Кандидат {candidate_id} не найден")
+    return load_blob(row[0])
+
+
+def storage_report() -> dict:
+    """Экономия места: объём ссылок на тексты без сжатия и дедупликации против фактического размера blobs"""
+    conn = get_connection()
+    referenced = 0
+    for column in PAYLOAD_FIELDS.values():
+        referenced += conn.execute(f"""
+        SELECT IFNULL(SUM(b.raw_size), 0) FROM candidates c JOIN blobs b ON b.hash = c.{column}
+        """).fetchone()[0]
+    referenced += conn.execute("""
+    SELECT IFNULL(SUM(b.raw_size), 0) FROM answer_audio a JOIN blobs b ON b.hash = a.audio_blob
+    """).fetchone()[0]
+    unique_raw, stored, count = conn.execute(
+        "SELECT IFNULL(SUM(raw_size), 0), IFNULL(SUM(LENGTH(data)), 0), COUNT(*) FROM blobs"
+    ).fetchone()
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return {
+        "blobs": count,
+        "file_bytes": page_count * page_size,
+        "referenced_bytes": referenced,
+        "unique_bytes": unique_raw,
+        "stored_bytes": stored,
+        "saved_bytes": referenced - stored,
+        "ratio": round(stored / referenced, 3) if referenced else 0.0,
+    }
+
+
+def compact_database():
+    """VACUUM: вернуть ОС место, освободившееся после переноса текстов в blobs"""
+    conn = get_connection()
+    conn.execute("VACUUM")
+    logging.info(f"БД сжата: {storage_report()}")
+
+
+def _index_missing(conn: sqlite3.Connection, ids: list, batch_size: int):
+    """Проиндексировать кандидатов, которых ещё нет в индексе поиска (леммы — вне транзакции)"""
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        lemmas = [_candidate_lemmas({
+            field: get_candidate_payload(candidate_id, field) for field in ("resume_text", "interview_json")
+        }) for candidate_id in batch]
+        with conn:
+            for candidate_id, item in zip(batch, lemmas):
+                # Кандидата могли проиндексировать параллельно (update_interview)
+                if conn.execute("SELECT 1 FROM candidate_lemmas WHERE candidate_id = ?", (candidate_id,)).fetchone():
+                    continue
+                _index_candidate(conn, candidate_id, item)
+
+
+def rebuild_search_index(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Полная пересборка полнотекстового индекса по всем сохранённым кандидатам"""
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT INTO candidates_fts (candidates_fts) VALUES ('delete-all')")
+        conn.execute("DELETE FROM candidate_lemmas")
+    ids = [row[0] for row in conn.execute("SELECT id FROM candidates ORDER BY id")]
+    _index_missing(conn, ids, batch_size)
+    logging.info(f"Полнотекстовый индекс пересобран: {len(ids)} кандидатов")
+    return len(ids)
+
+
+def backfill_search_index(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """При запуске: проиндексировать кандидатов без строки в индексе поиска (после миграции 8 — всех прежних)"""
+    conn = get_connection()
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM candidates WHERE id NOT IN (SELECT candidate_id FROM candidate_lemmas) ORDER BY id")]
+    if ids:
+        _index_missing(conn, ids, batch_size)
+        logging.info(f"Полнотекстовый индекс дополнен: {len(ids)} кандидатов")
+    return len(ids)
+
+
+_QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+
+def _fts_query(query: str) -> str:
+    """
+    Перевод запроса рекрутера в синтаксис FTS5 по леммам: "Python AND Cisco", "(SQL OR Python) NOT 1С",
+    "фразы в кавычках". Слова лемматизируются тем же normalize_text, что и индекс. Слова без лемм
+    (например, "1С" или "2019") в индекс не попадают: они отбрасываются вместе со своим оператором.
+    """
+    tokens = _QUERY_TOKEN.findall(query)
+    pos = 0
+
+    def term():
+        nonlocal pos
+        token = tokens[pos]
+        pos += 1
+        if token == "(":
+            node = expr()
+            if pos < len(tokens) and tokens[pos] == ")":
+                pos += 1
+            return f"({node})" if node else None
+        if token.startswith('"'):
+            lemmas = _lemmatize(token.strip('"')).split()
+            return '"' + " ".join(lemmas) + '"' if lemmas else None
+        lemmas = [f'"{lemma}"' for lemma in _lemmatize(token).split()]
+        if len(lemmas) > 1:
+            return "(" + " AND ".join(lemmas) + ")"
+        return lemmas[0] if lemmas else None
+
+    def expr():
+        nonlocal pos
+        node = None
+        while pos < len(tokens) and tokens[pos] != ")":
+            op = "AND"
+            if tokens[pos] in ("AND", "OR", "NOT"):
+                op = tokens[pos]
+                pos += 1
+                if pos >= len(tokens) or tokens[pos] == ")":
+                    break  # оператор без правого операнда
+            right = term()
+            if right is None:
+                continue
+            if node is None:
+                # NOT без левого операнда в FTS5 недопустим: такой запрос ничего не уточняет
+                node = right if op != "NOT" else None
+            else:
+                node = f"{node} {op} {right}"
+        return node
+
+    parts = []
+    while pos < len(tokens):
+        node = expr()
+        if node:
+            parts.append(node)
+        pos += 1  # лишняя закрывающая скобка
+    return " AND ".join(parts)
+
+
+def search_candidates(query: str, vacancy_id: str = None, limit: int = 20, offset: int = 0) -> list:
+    """
+    Полнотекстовый поиск кандидатов с ранжированием BM25 (совпадения в резюме весят больше, чем в ответах),
+    фильтром по вакансии и постраничной выдачей.
+    """
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return []
+    sql = """
+    SELECT c.id, c.fio, c.vacancy_id, c.score, c.timestamp, bm25(candidates_fts, 1.0, 0.5) AS rank
+    FROM candidates_fts JOIN candidates c ON c.id = candidates_fts.rowid
+    WHERE candidates_fts MATCH ?
+    """
+    params = [fts_query]
+    if vacancy_id is not None:
+        sql += " AND c.vacancy_id = ?"
+        params.append(vacancy_id)
+    sql += " ORDER BY rank LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    keys = ("id", "fio", "vacancy_id", "score", "timestamp", "rank")
+    return [dict(zip(keys, row)) for row in get_connection().execute(sql, params)]
@@ -1,9 +1,17 @@
+import os
 import random
 import re
 import time
+import difflib
+import pickle
+import hashlib
 import logging
-from tts_helper import speak
-from llama_cpp import Llama
+import threading
+from pathlib import Path
+from collections import deque
+from tts_helper import speak_async
+from llama_cpp import Llama, StoppingCriteriaList
+import model_registry
 
 logging.basicConfig(filename='interview_helper.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,16 +24,25 @@ SYSTEM_PROMPT = (
     "Обязательно учти предыдущий ответ кандидата для создания нового вопроса."
 )
 
-# Инициализация модели
-try:
-    llm = Llama(
-        model_path="C:/Users/tttoli4/Desktop/Xakaton_1/models/llama-2-7b.Q4_K_M.gguf",
-        n_ctx=2048,
-        n_threads=6
-    )
-    logging.info("Модель LLaMA успешно загружена")
-except Exception as e:
-    logging.error(f"Ошибка загрузки модели LLaMA: {e}")
+LLAMA_MODEL_PATH = "C:/Users/tttoli4/Desktop/Xakaton_1/models/llama-2-7b.Q4_K_M.gguf"
+LLAMA_N_CTX = 2048
+
+# Кэш вычисленного префикса промпта (SYSTEM_PROMPT + блок вакансии): в памяти и, по желанию, на диске
+USE_PREFIX_CACHE = True
+PREFIX_CACHE_DIR = Path(__file__).parent / "cache" / "llama_prefix"
+# Состояние llama-cpp-python 0.2.x — KV-кэш и полный массив scores (n_ctx × n_vocab float32):
+# при n_ctx=2048 это сотни МБ на одно состояние, поэтому в памяти держится одно. Запись на диск
+# (сотни МБ на вакансию во время интервью) включается явно; тогда число и объём файлов ограничены
+PREFIX_CACHE_IN_MEMORY = 1
+PREFIX_CACHE_ON_DISK = os.environ.get("AI_HR_PREFIX_CACHE_ON_DISK", "0") == "1"
+PREFIX_CACHE_MAX_FILES = 8
+PREFIX_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+def _load_llama():
+    return Llama(model_path=LLAMA_MODEL_PATH, n_ctx=LLAMA_N_CTX, n_threads=6)
+
+# Инициализация модели (лениво, через реестр моделей)
+llm_model = model_registry.register("llama", _load_llama, key=(LLAMA_MODEL_PATH, "cpu", "q4_k_m"))
 
 def normalize_question_text(text: str) -> str:
     """Нормализация текста вопроса"""
@@ -36,60 +53,467 @@ def normalize_question_text(text: str) -> str:
         text = text.split("?")[0] + "?"
     return text.strip()
 
-def ai_generate_question(vacancy: dict, history: list, asked_questions: list, previous_answer: str = "") -> str:
-    """Генерация адаптивного вопроса с учетом вакансии, истории и предыдущего ответа"""
+# Llama не потокобезопасна: генерация и восстановление состояния — под одной блокировкой
+_llm_lock = threading.Lock()
+_prefix_states = {}
+# Время до первого токена по режимам кэша префикса: "hit" (восстановлен), "warm" (уже в контексте), "miss", "disabled".
+# Хранятся только последние METRICS_WINDOW замеров: процесс GUI живёт долго
+METRICS_WINDOW = 200
+ttft_metrics = {status: deque(maxlen=METRICS_WINDOW) for status in ("hit", "warm", "miss", "disabled")}
+
+def vacancy_prompt_prefix(vacancy: dict) -> str:
+    """Неизменная для вакансии часть промпта: системная инструкция и описание вакансии"""
     vacancy_info = (
         f"Вакансия: {vacancy.get('title', '')}\n"
         f"Требования: {', '.join(vacancy.get('requirements', []))}\n"
         f"Обязанности: {', '.join(vacancy.get('duties', []))}\n"
     )
+    return SYSTEM_PROMPT + "\n\n" + vacancy_info + "\n"
+
+def _evict_prefix_cache():
+    """Удалить давно не использовавшиеся состояния сверх PREFIX_CACHE_MAX_FILES / PREFIX_CACHE_MAX_BYTES"""
+    files = sorted(((p.stat().st_mtime, p.stat().st_size, p) for p in PREFIX_CACHE_DIR.glob("*.pkl")), reverse=True)
+    total = 0
+    for count, (_, size, path) in enumerate(files, 1):
+        total += size
+        if count > PREFIX_CACHE_MAX_FILES or total > PREFIX_CACHE_MAX_BYTES:
+            try:
+                path.unlink()
+            except OSError as e:
+                logging.error(f"Ошибка очистки кэша префикса {path}: {e}")
+
+def _save_prefix_state(path: Path, state):
+    """Запись состояния во временный файл и переименование: прерванная запись не оставляет битый кэш"""
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+    try:
+        PREFIX_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp, path)
+        _evict_prefix_cache()
+    except Exception as e:
+        logging.error(f"Ошибка записи кэша префикса {path}: {e}")
+        tmp.unlink(missing_ok=True)
+
+def _prefix_key(prefix: str) -> str:
+    return hashlib.sha256(f"{LLAMA_MODEL_PATH}|{LLAMA_N_CTX}|{prefix}".encode("utf-8")).hexdigest()
+
+def _prepare_prefix(llm, prefix: str) -> str:
+    """
+    Подготовить KV-кэш llama с вычисленным префиксом. Дальнейший вызов llm(prompt) найдёт
+    совпадающий префикс токенов и вычислит только суффикс с диалогом.
+    """
+    tokens = llm.tokenize(prefix.encode("utf-8"))
+    # input_ids — предвыделенный буфер: вычисленная часть контекста — только первые n_tokens
+    if llm.n_tokens >= len(tokens) and list(llm.input_ids[:llm.n_tokens][:len(tokens)]) == tokens:
+        return "warm"
+
+    key = _prefix_key(prefix)
+    state = _prefix_states.pop(key, None)
+    path = PREFIX_CACHE_DIR / f"{key}.pkl"
+    if state is None and PREFIX_CACHE_ON_DISK and path.exists():
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            os.utime(path)  # время доступа для вытеснения
+        except Exception as e:
+            logging.error(f"Ошибка чтения кэша префикса {path}: {e}")
+    if state is not None:
+        llm.load_state(state)
+        status = "hit"
+    else:
+        llm.reset()
+        llm.eval(tokens)
+        state = llm.save_state()
+        if PREFIX_CACHE_ON_DISK:
+            _save_prefix_state(path, state)
+        status = "miss"
+    _prefix_states[key] = state
+    while len(_prefix_states) > PREFIX_CACHE_IN_MEMORY:
+        _prefix_states.pop(next(iter(_prefix_states)))
+    return status
+
+def _stream(llm, prefix: str, prompt: str, **kwargs):
+    """Потоковая генерация с переиспользованием префикса: отдаёт текст токенов, замеряет время до первого"""
+    with _llm_lock:
+        start = time.perf_counter()
+        status = "disabled"
+        if USE_PREFIX_CACHE:
+            try:
+                status = _prepare_prefix(llm, prefix)
+            except Exception as e:
+                logging.error(f"Ошибка подготовки кэша префикса: {e}")
+        ttft = None
+        for chunk in llm(prompt, stream=True, **kwargs):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                ttft_metrics[status].append(ttft)
+                logging.info(f"Время до первого токена: {ttft:.2f} с (кэш префикса: {status})")
+            yield chunk["choices"][0]["text"]
+
+def _complete(llm, prefix: str, prompt: str, **kwargs) -> str:
+    """Генерация с переиспользованием префикса; замеряет время до первого токена"""
+    return "".join(_stream(llm, prefix, prompt, **kwargs))
+
+def ttft_report() -> dict:
+    """Медиана и число замеров времени до первого токена по режимам кэша префикса"""
+    report = {}
+    for status, values in ttft_metrics.items():
+        if values:
+            ordered = sorted(values)
+            report[status] = {"count": len(values), "median": round(ordered[len(ordered) // 2], 3)}
+    return report
+
+def _build_prompt(prefix: str, history: list, asked_questions: list, previous_answer: str) -> str:
     dialogue = "\n".join(history[-12:]) if history else "Диалог ещё не начат."
     prev_qs = "\n".join(asked_questions[-12:]) if asked_questions else "Нет"
-
-    prompt = (
-        SYSTEM_PROMPT + "\n\n" +
-        vacancy_info + "\n" +
+    return (
+        prefix +
         "История диалога:\n" + dialogue + "\n\n" +
         f"Ранее заданные вопросы (не повторяй их):\n{prev_qs}\n\n" +
         f"Предыдущий ответ кандидата (учти его для адаптации): {previous_answer}\n\n" +
         "Сформулируй ровно ОДИН новый вопрос на русском языке. Только вопрос, без лишнего текста."
     )
 
-    fallback_questions = vacancy.get('questions', [])  # Фоллбэк на вопросы из JSON
+class GenerationCancelled(Exception):
+    """Генерация прервана: черновик устарел или отменён"""
+
+def _generate_question(vacancy: dict, history: list, asked_questions: list, previous_answer: str = "",
+                       should_stop=None):
+    """
+    До трёх попыток генерации вопроса LLaMA. Возвращает вопрос или None (модель недоступна / ошибка).
+    should_stop() — признак отмены, проверяется на каждом токене; при отмене — GenerationCancelled.
+    """
+    prefix = vacancy_prompt_prefix(vacancy)
+    prompt = _build_prompt(prefix, history, asked_questions, previous_answer)
+    llm = llm_model.get()
+    kwargs = {}
+    if should_stop is not None:
+        kwargs["stopping_criteria"] = StoppingCriteriaList([lambda tokens, logits: should_stop()])
 
-    for attempt in range(3):
+    for attempt in range(3 if llm else 0):
+        if should_stop is not None and should_stop():
+            raise GenerationCancelled()
         try:
             logging.info(f"Промпт для LLaMA: {prompt[:500]}")
-            resp = llm(prompt, max_tokens=120, temperature=0.45,
-                       stop=["HR:", "Кандидат:", "Candidate:"])
-            raw = resp.get("choices", [{}])[0].get("text", "") if isinstance(resp, dict) else str(resp)
+            raw = _complete(llm, prefix, prompt, max_tokens=120, temperature=0.45,
+                            stop=["HR:", "Кандидат:", "Candidate:"], **kwargs)
+            if should_stop is not None and should_stop():
+                raise GenerationCancelled()
             logging.info(f"Сырой ответ LLaMA: {raw}")
             text = normalize_question_text(raw)
 
             if text and text not in asked_questions and len(text) > 5 and text.endswith("?"):
-                asked_questions.append(text)
-                logging.info(f"Сгенерирован вопрос: {text}")
                 return text
             else:
                 prompt += "\nТы уже задавал этот вопрос или он некорректен, придумай другой."
                 logging.warning(f"Повтор вопроса или некорректный: {text}, попытка {attempt + 1}")
                 continue
+        except GenerationCancelled:
+            raise
         except Exception as e:
             logging.error(f"Ошибка генерации вопроса: {e}")
             break
+    if not llm:
+        logging.error("Модель LLaMA недоступна, используется фоллбэк")
+    return None
 
-    # Фоллбэк
+def _fallback_question(vacancy: dict, asked_questions: list) -> str:
+    fallback_questions = vacancy.get('questions', [])  # Фоллбэк на вопросы из JSON
     fallback = random.choice([q for q in fallback_questions if q not in asked_questions] or fallback_questions)
     asked_questions.append(fallback)
     logging.info(f"Использован фоллбэк-вопрос: {fallback}")
     return fallback
 
-def conduct_interview(vacancy: dict, log_callback, recognizer, max_q=3):
+def ai_generate_question(vacancy: dict, history: list, asked_questions: list, previous_answer: str = "") -> str:
+    """Генерация адаптивного вопроса с учетом вакансии, истории и предыдущего ответа"""
+    text = _generate_question(vacancy, history, asked_questions, previous_answer)
+    if text:
+        asked_questions.append(text)
+        logging.info(f"Сгенерирован вопрос: {text}")
+        return text
+    return _fallback_question(vacancy, asked_questions)
+
+def bank_generator(vacancy: dict):
+    """Генератор вопросов для офлайн-банка (question_bank.py): тот же SYSTEM_PROMPT и префикс вакансии"""
+    prefix = vacancy_prompt_prefix(vacancy)
+
+    def generate(requirement: str, angle: str, asked: list):
+        llm = llm_model.get()
+        if not llm:
+            raise RuntimeError("модель LLaMA недоступна")
+        prev_qs = "\n".join(asked) if asked else "Нет"
+        prompt = (
+            prefix +
+            f"Требование: {requirement}\n"
+            f"Ранее заданные вопросы по этому требованию (не повторяй их):\n{prev_qs}\n\n"
+            f"Сформулируй ровно ОДИН уточняющий вопрос на русском языке {angle}, проверяющий это требование. "
+            "Только вопрос, без лишнего текста."
+        )
+        raw = _complete(llm, prefix, prompt, max_tokens=120, temperature=0.8,
+                        stop=["HR:", "Кандидат:", "Candidate:"])
+        text = normalize_question_text(raw)
+        return text if len(text) > 5 and text.endswith("?") else None
+
+    return generate
+
+def bank_question(vacancy: dict, asked_questions: list, previous_answer: str):
+    """
+    Быстрый режим: ближайший к ответу кандидата вопрос из офлайн-банка без вызова LLM.
+    None — банк не собран, нет эмбеддингов или ни один вопрос не прошёл порог похожести.
+    """
+    try:
+        import question_bank
+        from analyzer import encode_texts, SBERT_MODEL_NAME
+        bank = question_bank.load_bank(vacancy, SBERT_MODEL_NAME)
+        if bank is None or not previous_answer.strip():
+            return None
+        embeddings = encode_texts([previous_answer] + list(asked_questions))
+        if embeddings is None:
+            return None
+        found = question_bank.select_question(bank, embeddings[0], embeddings[1:])
+    except Exception as e:
+        logging.error(f"Ошибка выбора вопроса из банка: {e}")
+        return None
+    if found is None:
+        logging.info("Быстрый режим: в банке нет подходящего вопроса, используется LLaMA")
+        return None
+    question, similarity = found
+    asked_questions.append(question)
+    logging.info(f"Вопрос из банка (похожесть {similarity:.2f}): {question}")
+    return question
+
+# Фразы, которыми кандидат завершает ответ: распознаются в конце частичной расшифровки во время записи.
+# Только многословные и однозначные: "всё" или "закончил" встречаются в конце обычных предложений
+STOP_PHRASES = ["на этом всё", "у меня всё", "всё, больше ничего", "больше добавить нечего", "ответ закончен"]
+# Пауза на обдумывание в интервью длиннее, чем в обычной речи
+ANSWER_TRAILING_SILENCE = 3.0
+STOP_PHRASE_PAUSE = 1.0
+
+# Граница фрагмента для озвучивания: знак препинания после минимум CLAUSE_MIN_WORDS слов
+CLAUSE_BOUNDARY = re.compile(r"[,;:?!.—]\s*$")
+CLAUSE_MIN_WORDS = 3
+# Задержка от начала генерации до первого звука, с (последние METRICS_WINDOW замеров)
+first_audio_metrics = deque(maxlen=METRICS_WINDOW)
+# Произносится, если кандидат уже слышал начало вопроса, который затем был отклонён
+REPHRASE_PHRASE = "Извините, переформулирую вопрос."
+
+def _question_start_ok(raw: str) -> bool:
+    """Начало генерации без служебного заголовка и маркера списка — его можно озвучивать до конца генерации"""
+    return _strip_question_header(raw) == raw.lstrip()
+
+def _may_repeat(text: str, asked_questions: list) -> bool:
+    """Текст ещё может оказаться повтором заданного вопроса (является началом одного из них)"""
+    text = text.strip()
+    return any(question.startswith(text) for question in asked_questions)
+
+def stream_question(vacancy: dict, history: list, asked_questions: list, previous_answer: str = "",
+                    on_word=None, on_replace=None) -> str:
+    """
+    Генерация вопроса с одновременным озвучиванием: токены LLaMA режутся на фрагменты по границам
+    клауз и сразу уходят в очередь синтеза речи; on_word(word) получает слова для вывода в GUI.
+    Генерация, начавшаяся с заголовка или маркера списка, и текст, который ещё может совпасть
+    с заданным вопросом, озвучиваются только после проверки целиком.
+    Некорректный результат заменяется вопросом из ai_generate_question (озвучивается целиком,
+    неозвученные фрагменты снимаются с очереди; если кандидат уже слышал начало, перед заменой
+    звучит REPHRASE_PHRASE); on_replace(question) получает замену для GUI.
+    """
+    llm = llm_model.get()
+    if not llm:
+        question = ai_generate_question(vacancy, history, asked_questions, previous_answer)
+        if on_replace:
+            on_replace(question)
+        speak_async(question).wait()
+        return question
+
+    prefix = vacancy_prompt_prefix(vacancy)
+    prompt = _build_prompt(prefix, history, asked_questions, previous_answer)
+    start = time.perf_counter()
+    raw, spoken_upto, shown_upto, items = "", 0, 0, []
+
+    def flush(final=False):
+        nonlocal spoken_upto, shown_upto
+        text = normalize_question_text(raw) if final else _strip_question_header(raw)
+        words = text.split()
+        # Последнее слово может быть недописанным токеном — показываем его только в конце
+        ready = words if final else words[:-1]
+        for word in ready[shown_upto:]:
+            if on_word:
+                on_word(word)
+        shown_upto = max(shown_upto, len(ready))
+        if items and items[-1].cancelled:
+            return  # озвучивание прервано из GUI: текст дописывается, но не произносится
+        if not final and (not _question_start_ok(raw) or _may_repeat(text, asked_questions)):
+            return  # заголовок, список или возможный повтор: вопрос озвучивается только после проверки
+        pending = " ".join(words[spoken_upto:])
+        if pending and (final or (len(words) - spoken_upto >= CLAUSE_MIN_WORDS and CLAUSE_BOUNDARY.search(text))):
+            items.append(speak_async(pending))
+            spoken_upto = len(words)
+
+    logging.info(f"Промпт для LLaMA (потоковый): {prompt[:500]}")
+    tokens = _stream(llm, prefix, prompt, max_tokens=120, temperature=0.45,
+                     stop=["HR:", "Кандидат:", "Candidate:"])
+    try:
+        for token in tokens:
+            raw += token
+            if "?" in raw:
+                break  # вопрос закончен, дальше normalize_question_text всё равно отрежет
+            flush()
+    except Exception as e:
+        logging.error(f"Ошибка потоковой генерации вопроса: {e}")
+    finally:
+        tokens.close()  # освобождает _llm_lock сразу, не дожидаясь сборки генератора
+    logging.info(f"Сырой ответ LLaMA (потоковый): {raw}")
+    text = normalize_question_text(raw)
+    valid = text and text not in asked_questions and len(text) > 5 and text.endswith("?")
+    if valid:
+        flush(final=True)
+    else:
+        for item in items:
+            item.cancelled = True  # ещё не прозвучавшие фрагменты отклонённого текста не произносятся
+
+    if items and valid:
+        items[0].started.wait(30)
+        if items[0].started_at is not None:
+            latency = items[0].started_at - start
+            first_audio_metrics.append(latency)
+            logging.info(f"Задержка до первого звука: {latency:.2f} с")
+    for item in items:
+        item.wait()
+
+    if valid:
+        asked_questions.append(text)
+        logging.info(f"Сгенерирован вопрос (потоково): {text}")
+        return text
+    logging.warning(f"Потоковый вопрос некорректен: {text}, генерация заново")
+    question = ai_generate_question(vacancy, history, asked_questions, previous_answer)
+    if on_replace:
+        on_replace(question)
+    if any(item.started_at is not None for item in items):
+        # Кандидат слышал начало отклонённого вопроса: замена не должна звучать как его продолжение
+        speak_async(REPHRASE_PHRASE)
+    speak_async(question).wait()
+    return question
+
+def _strip_question_header(text: str) -> str:
+    """Снять служебные заголовки в начале генерации, как normalize_question_text, но без обрезки по '?'"""
+    text = text.lstrip()
+    text = re.sub(r"^(Примеры вопросов|Вопрос:|Example questions:)\s*", "", text, flags=re.IGNORECASE)
+    return re.sub(r"^[\-\*\d\.\)]\s*", "", text)
+
+def _text_change(a: str, b: str) -> float:
+    """Доля изменений между двумя расшифровками (0 — совпадают, 1 — совсем разные)"""
+    return 1.0 - difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+
+class QuestionDrafter:
+    """
+    Черновик следующего вопроса, который генерируется в фоне по частичной расшифровке,
+    пока кандидат ещё говорит. При заметном изменении расшифровки черновик отменяется и
+    генерируется заново; после остановки записи готовый черновик забирается через take().
+    """
+
+    def __init__(self, vacancy: dict, history: list, asked_questions: list, max_change: float = 0.3):
+        self.vacancy = vacancy
+        self.history = list(history)
+        self.asked_questions = list(asked_questions)
+        self.max_change = max_change
+        self._cond = threading.Condition()
+        self._pending = None       # расшифровка, по которой нужно (пере)генерировать черновик
+        self._generation = 0       # номер актуального запроса, устаревшие генерации прерываются
+        self._basis = None         # расшифровка, по которой построен готовый/текущий черновик
+        self._draft = None
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="question-drafter", daemon=True)
+        self._thread.start()
+
+    def update(self, partial_text: str):
+        """Новая частичная расшифровка (вызывается из потока распознавания)"""
+        partial_text = partial_text.strip()
+        if not partial_text:
+            return
+        with self._cond:
+            if self._closed:
+                return
+            if self._basis is not None and _text_change(self._basis, partial_text) <= self.max_change:
+                return
+            self._pending = partial_text
+            self._basis = partial_text
+            self._draft = None
+            self._generation += 1
+            self._cond.notify_all()
+        logging.info(f"Черновик вопроса: новая основа ({len(partial_text.split())} слов)")
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                basis, generation = self._pending, self._generation
+                self._pending = None
+                self._busy = True
+
+            def stale():
+                return self._closed or self._generation != generation
+
+            draft = None
+            try:
+                draft = _generate_question(self.vacancy, self.history, self.asked_questions, basis, should_stop=stale)
+            except GenerationCancelled:
+                logging.info("Черновик вопроса отменён: расшифровка изменилась")
+            except Exception as e:
+                logging.error(f"Ошибка генерации черновика вопроса: {e}")
+            with self._cond:
+                self._busy = False
+                if generation == self._generation:
+                    self._draft = draft
+                self._cond.notify_all()
+
+    def take(self, final_text: str, wait: float = 10.0):
+        """
+        Черновик для итогового ответа или None, если его нет или он построен по сильно отличающемуся тексту.
+        Если подходящий черновик ещё генерируется, ждёт его не дольше wait секунд.
+        """
+        final_text = final_text.strip()
+        deadline = time.monotonic() + wait
+        with self._cond:
+            try:
+                if self._basis is None or _text_change(self._basis, final_text) > self.max_change:
+                    return None
+                while (self._busy or self._pending is not None) and self._draft is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+                return self._draft
+            finally:
+                self._closed = True
+                self._generation += 1
+                self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            self._closed = True
+            self._generation += 1
+            self._cond.notify_all()
+
+def conduct_interview(vacancy: dict, log_callback, recognizer, max_q=3, pipelined=True, streaming=True,
+                      fast=False, recordings=None, trailing_silence=ANSWER_TRAILING_SILENCE,
+                      stop_phrase_pause=STOP_PHRASE_PAUSE):
     """
     Основной цикл интервью.
     log_callback — функция для вывода лога в GUI.
     recognizer — объект распознавания речи.
     max_q — количество вопросов (фиксировано 3).
+    pipelined — черновик следующего вопроса генерируется, пока кандидат ещё отвечает.
+    streaming — без готового черновика вопрос озвучивается по мере генерации токенов.
+    fast — следующий вопрос выбирается из офлайн-банка (question_bank.py); LLaMA — только если
+    в банке нет вопроса, достаточно близкого к ответу.
+    recordings — список, куда для каждого ответа добавляется (аудио int16, частота) или None.
+    trailing_silence — секунды тишины, после которых ответ считается законченным;
+    stop_phrase_pause — пауза после стоп-фразы, завершающая ответ.
     """
     answers = []
     history = []
@@ -106,29 +530,69 @@ def conduct_interview(vacancy: dict, log_callback, recognizer, max_q=3):
     # Первый вопрос — фиксированный из vacancies.json или сгенерированный
     q = questions[0] if questions else ai_generate_question(vacancy, history, asked_questions)
     asked_questions.append(q)
+    previous_answer = ""
 
     for i in range(max_q):
+        drafter = None
+        recording = None
         try:
-            # Выводим и озвучиваем вопрос
-            log_callback(f"Вопрос {i + 1}: {q}")
-            try:
-                speak(q)
-            except Exception as e:
-                log_callback(f"Ошибка озвучивания: {e}")
-                logging.error(f"Ошибка озвучивания вопроса {i + 1}: {e}")
+            spoken = threading.Event()  # конец воспроизведения вопроса: по нему начинается запись ответа
+            if q is None:
+                # Вопрос генерируется и озвучивается потоково, слова дописываются в GUI по мере готовности
+                log_callback(f"Вопрос {i + 1}:")
+                try:
+                    recognizer.prepare()
+                except Exception as e:
+                    logging.error(f"Не удалось открыть микрофон заранее: {e}")
+                try:
+                    q = stream_question(vacancy, history, asked_questions, previous_answer,
+                                        on_word=lambda word: log_callback(f"[APPEND] {word}"),
+                                        on_replace=lambda text: log_callback(f"Вопрос {i + 1}: {text}"))
+                    spoken.set()
+                except Exception as e:
+                    log_callback(f"Ошибка озвучивания: {e}")
+                    logging.error(f"Ошибка потоковой генерации вопроса {i + 1}: {e}")
+                    q = _fallback_question(vacancy, asked_questions)
+                    log_callback(f"Вопрос {i + 1}: {q}")
+                    try:
+                        spoken = speak_async(q).done
+                    except Exception as e:
+                        logging.error(f"Ошибка озвучивания вопроса {i + 1}: {e}")
+                        spoken.set()
+                history.append(f"HR: {q}")
+                history.append(f"Кандидат: {previous_answer}")
+            else:
+                # Выводим вопрос и ставим его в очередь озвучивания; микрофон открывается, пока он звучит
+                log_callback(f"Вопрос {i + 1}: {q}")
+                try:
+                    spoken = speak_async(q).done
+                except Exception as e:
+                    log_callback(f"Ошибка озвучивания: {e}")
+                    logging.error(f"Ошибка озвучивания вопроса {i + 1}: {e}")
+                    spoken.set()
 
             # Активируем кнопку "Остановить запись"
             log_callback("[ENABLE_STOP]")
 
-            # Слушаем ответ
+            # Слушаем ответ; черновик следующего вопроса строится по частичной расшифровке
             answer_text = ""
             duration = 0
+            drafter = QuestionDrafter(vacancy, history, asked_questions) if pipelined and not fast and i < max_q - 1 else None
             try:
-                resp = recognizer.listen_and_transcribe(timeout=40, chunk_duration=5)
+                resp = recognizer.listen_and_transcribe(timeout=40, chunk_duration=5,
+                                                        on_partial=drafter.update if drafter else None,
+                                                        stop_phrases=STOP_PHRASES, after=spoken,
+                                                        trailing_silence=trailing_silence,
+                                                        stop_phrase_pause=stop_phrase_pause)
                 answer_text = resp.get("text", "").strip()
                 duration = resp.get("duration", 0)
+                if resp.get("audio") is not None and len(resp["audio"]):
+                    recording = (resp["audio"], resp.get("sample_rate", 16000))
                 if resp.get("stopped_manually", False):
                     log_callback("Запись остановлена пользователем, переходим к следующему вопросу.")
+                elif resp.get("end_reason") == "stop_phrase":
+                    log_callback("Кандидат завершил ответ, переходим к следующему вопросу.")
+                    logging.info(f"Обнаружена стоп-фраза, запись вопроса {i + 1} завершена досрочно")
                 if answer_text:
                     log_callback(f"Ответ кандидата: {answer_text} (длительность: {duration:.1f}s)")
                 else:
@@ -140,29 +604,41 @@ def conduct_interview(vacancy: dict, log_callback, recognizer, max_q=3):
             # Деактивируем кнопку "Остановить запись"
             log_callback("[DISABLE_STOP]")
 
-            # Проверяем ключевые фразы для остановки записи (аналог кнопки)
-            low = answer_text.lower()
-            stop_phrases = ["всё, больше ничего", "закончил", "ничего больше", "все вопросы ответил", "всё", "все", "спасибо", "на этом все"]
-            if any(phrase in low for phrase in stop_phrases):
-                logging.info(f"Обнаружена фраза '{low}', переходим к следующему вопросу для вопроса {i + 1}")
-
             # Сохраняем результат
             answers.append({"question": q, "answer": answer_text, "duration": duration})
+            if recordings is not None:
+                recordings.append(recording)
             logging.info(f"Сохранен ответ для вопроса {i + 1}: {answer_text}")
 
-            # Генерация следующего вопроса на основе ответа
+            # Генерация следующего вопроса на основе ответа (готовый черновик, если он подходит)
             if i < max_q - 1:
-                q = ai_generate_question(vacancy, history, asked_questions, answer_text)
-                history.append(f"HR: {q}")
-                history.append(f"Кандидат: {answer_text}")
+                draft = drafter.take(answer_text) if drafter else None
+                banked = bank_question(vacancy, asked_questions, answer_text) if fast else None
+                if banked:
+                    q = banked
+                elif draft and draft not in asked_questions:
+                    asked_questions.append(draft)
+                    logging.info(f"Использован черновик вопроса: {draft}")
+                    q = draft
+                elif streaming:
+                    q = None  # сгенерируется потоково в начале следующей итерации
+                else:
+                    q = ai_generate_question(vacancy, history, asked_questions, answer_text)
+                previous_answer = answer_text
+                if q is not None:
+                    history.append(f"HR: {q}")
+                    history.append(f"Кандидат: {answer_text}")
 
-            time.sleep(1)
         except Exception as e:
+            if drafter:
+                drafter.cancel()
             log_callback(f"Критическая ошибка в цикле интервью: {e}")
             logging.error(f"Критическая ошибка в цикле интервью для вопроса {i + 1}: {e}")
             answers.append({"question": q, "answer": "", "duration": 0})
+            if recordings is not None:
+                recordings.extend([None] * (len(answers) - len(recordings)))
             continue
 
     log_callback("Интервью завершено.")
     logging.info(f"Интервью завершено, собрано {len(answers)} ответов")
-    return answers
\ No newline at end of file
+    return answers
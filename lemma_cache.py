@@ -0,0 +1,147 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+LEMMA_DB_PATH = BASE_DIR / "cache" / "lemmas.db"
+MAX_DB_ROWS = 200000  # предел постоянного кэша; при превышении вытесняются давно не использованные записи
+
+
+class LemmaCache:
+    """
+    Двухуровневый кэш лемматизации: ограниченный LRU в памяти и постоянное хранилище SQLite,
+    которое переживает перезапуск и разделяется между процессами (режим WAL).
+    lemmatize_batch(list_of_texts) -> list_of_lemma_lists вызывается только для промахов.
+    version — версия лемматизатора: входит в ключ, записи других версий не используются и вытесняются.
+    """
+
+    def __init__(self, lemmatize_batch, db_path: Path = LEMMA_DB_PATH, max_size: int = 4096,
+                 version: str = "", max_db_rows: int = MAX_DB_ROWS):
+        self.lemmatize_batch = lemmatize_batch
+        self.db_path = Path(db_path)
+        self.max_size = max_size
+        self.version = version
+        self.max_db_rows = max_db_rows
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"lru_hits": 0, "db_hits": 0, "misses": 0, "tagger_seconds": 0.0}
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.version}\0{text}".encode("utf-8")).hexdigest()
+
+    def _db(self):
+        if self._conn is None:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                # Таблица прежнего формата (ключ без версии, без времени доступа) больше не читается
+                self._conn.execute("DROP TABLE IF EXISTS lemmas")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS lemma_entries (key TEXT PRIMARY KEY, lemmas TEXT, last_access REAL)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lemma_entries_access ON lemma_entries (last_access)")
+                self._conn.commit()
+            except Exception as e:
+                logging.error(f"Ошибка открытия кэша лемм {self.db_path}: {e}")
+                self._conn = None
+        return self._conn
+
+    def _remember(self, key: str, lemmas: list):
+        self._lru[key] = lemmas
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def normalize_many(self, texts: list) -> list:
+        """Леммы для списка текстов; промахи лемматизируются одним пакетом"""
+        prepared = [text.lower().strip() for text in texts]
+        keys = [self._key(text) for text in prepared]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+                    self.stats["lru_hits"] += 1
+
+            pending = list(dict.fromkeys(key for key in keys if key not in found))
+            conn = self._db() if pending else None
+            if conn is not None:
+                try:
+                    now = time.time()
+                    for start in range(0, len(pending), 500):
+                        batch = pending[start:start + 500]
+                        placeholders = ','.join('?' * len(batch))
+                        rows = conn.execute(
+                            f"SELECT key, lemmas FROM lemma_entries WHERE key IN ({placeholders})", batch
+                        ).fetchall()
+                        for key, lemmas in rows:
+                            found[key] = json.loads(lemmas)
+                            self._remember(key, found[key])
+                            self.stats["db_hits"] += 1
+                        if rows:
+                            conn.execute(f"UPDATE lemma_entries SET last_access = ? WHERE key IN ({placeholders})",
+                                         [now, *batch])
+                    conn.commit()
+                except Exception as e:
+                    logging.error(f"Ошибка чтения кэша лемм: {e}")
+
+        misses = {}
+        for key, text in zip(keys, prepared):
+            if key not in found and key not in misses:
+                misses[key] = text
+        if misses:
+            start = time.perf_counter()
+            results = self.lemmatize_batch(list(misses.values()))
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stats["misses"] += len(misses)
+                self.stats["tagger_seconds"] += elapsed
+                rows = []
+                for key, lemmas in zip(misses, results):
+                    found[key] = lemmas
+                    # Ошибка лемматизации (None) не кэшируется
+                    if lemmas is not None:
+                        self._remember(key, lemmas)
+                        rows.append((key, json.dumps(lemmas, ensure_ascii=False), time.time()))
+                conn = self._db()
+                if conn is not None and rows:
+                    try:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO lemma_entries (key, lemmas, last_access) VALUES (?, ?, ?)", rows)
+                        conn.commit()
+                        self._evict(conn)
+                    except Exception as e:
+                        logging.error(f"Ошибка записи кэша лемм: {e}")
+        return [list(found[key] or []) for key in keys]
+
+    def _evict(self, conn):
+        """Ограничение постоянного кэша: при превышении предела удаляются давно не использованные записи"""
+        count = conn.execute("SELECT COUNT(*) FROM lemma_entries").fetchone()[0]
+        if count <= self.max_db_rows:
+            return
+        # Запас в 10%, чтобы не вытеснять на каждой записи
+        excess = count - int(self.max_db_rows * 0.9)
+        conn.execute("""
+        DELETE FROM lemma_entries WHERE key IN (SELECT key FROM lemma_entries ORDER BY last_access LIMIT ?)
+        """, (excess,))
+        conn.commit()
+        logging.info(f"Кэш лемм: вытеснено {excess} записей")
+
+    def normalize(self, text: str) -> list:
+        return self.normalize_many([text])[0]
+
+    def hit_rate(self) -> dict:
+        """Счётчики попаданий и доля запросов, обслуженных без морф-теггера"""
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["lru_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["lru_hits"] + stats["db_hits"]) / total, 3) if total else 0.0
+        stats["lru_size"] = len(self._lru)
+        return stats
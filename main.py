@@ -1,28 +1,41 @@
 import sys
 import json
 import logging
+import threading
 from pathlib import Path
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit,
     QPushButton, QFileDialog, QComboBox, QTextEdit, QMessageBox
 )
 from PySide6.QtCore import QThread, Signal
+from PySide6.QtGui import QTextCursor
 from resume_parser import extract_text
-from vacancy_parser import extract_vacancy
+from vacancy_parser import extract_vacancy, catalog
 from analyzer import analyze_resume_vs_vacancy, analyze_interview
 from interview_helper import conduct_interview
 from report_generator import generate_report
-from db_helper import save_candidate
-from tts_helper import speak
+from db_helper import save_candidate, resume_vector_index, backfill_search_index
+from tts_helper import speak, prerender_vacancy_questions, cancel_speech
 from stt_helper import SpeechRecognizer
 import pyaudio
+import model_registry
 
 logging.basicConfig(filename='main.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 BASE_DIR = Path(__file__).parent
 FILES_DIR = BASE_DIR / "files"
-VACANCIES_JSON = BASE_DIR / "vacancies.json"
+SPEECH_MODEL = "whisper_small"  # имя модели SpeechRecognizer(model_size="small") в реестре
+# Модели, которые прогреваются в фоне сразу после открытия окна
+WARM_UP_MODELS = ["natasha", "sentiment", "sbert", "llama", SPEECH_MODEL]
+
+
+def log_startup_timings():
+    """Дождаться прогрева моделей и записать разбивку времени загрузки по моделям"""
+    model_registry.wait_all()
+    memory = model_registry.memory_report()
+    for name, info in model_registry.timings().items():
+        logging.info(f"Модель {name}: {info['status']}, {info['seconds']} с, {memory[name]['mb']} МБ")
 
 class InterviewThread(QThread):
     update_log = Signal(str)
@@ -35,15 +48,18 @@ class InterviewThread(QThread):
 
     def run(self):
         try:
-            answers = conduct_interview(self.vacancy, self.update_log.emit, self.recognizer)
+            recordings = []
+            answers = conduct_interview(self.vacancy, self.update_log.emit, self.recognizer, recordings=recordings)
             logging.info(f"Interview completed: {answers}")
-            self.finished.emit({"answers": answers})
+            self.finished.emit({"answers": answers, "recordings": recordings})
         except Exception as e:
             self.update_log.emit(f"Критическая ошибка в интервью: {str(e)}")
             logging.error(f"InterviewThread error: {str(e)}")
             self.finished.emit({"answers": []})
 
 class HRWindow(QWidget):
+    speech_model_failed = Signal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AI HR Assistant")
@@ -64,6 +80,7 @@ class HRWindow(QWidget):
         layout.addWidget(QLabel("Выберите вакансию:"))
         self.vacancy_combo = QComboBox()
         self.load_vacancies()
+        self.vacancy_combo.currentIndexChanged.connect(lambda _: self.prerender_selected_vacancy())
         layout.addWidget(self.vacancy_combo)
 
         # Кнопка старта
@@ -75,6 +92,11 @@ class HRWindow(QWidget):
         self.stop_btn.setEnabled(False)
         layout.addWidget(self.stop_btn)
 
+        # Кнопка прерывания озвучивания вопроса
+        self.cancel_speech_btn = QPushButton("Прервать озвучивание")
+        self.cancel_speech_btn.setEnabled(False)
+        layout.addWidget(self.cancel_speech_btn)
+
         # Лог/результат
         self.result_box = QTextEdit()
         self.result_box.setReadOnly(True)
@@ -104,24 +126,50 @@ class HRWindow(QWidget):
             QMessageBox.warning(self, "Предупреждение", f"Микрофон недоступен: {e}. Интервью может не работать корректно.")
 
         # События
+        self.speech_model_failed.connect(self.on_speech_model_failed)
         self.resume_btn.clicked.connect(self.select_resume)
         self.start_btn.clicked.connect(self.start_process)
         self.stop_btn.clicked.connect(self.on_stop_clicked)
+        self.cancel_speech_btn.clicked.connect(self.on_cancel_speech_clicked)
+
+    def watch_speech_model(self):
+        """Дождаться фоновой загрузки Whisper в отдельном потоке; ошибка передаётся в GUI сигналом"""
+        def wait():
+            if self.recognizer and model_registry.get(SPEECH_MODEL) is None:
+                self.speech_model_failed.emit(str(model_registry.get_handle(SPEECH_MODEL).error))
+        threading.Thread(target=wait, daemon=True).start()
+
+    def on_speech_model_failed(self, error: str):
+        """Модель Whisper не загрузилась: как при старте без faster_whisper — сообщение и недоступная кнопка"""
+        logging.error(f"Ошибка инициализации SpeechRecognizer: {error}")
+        self.recognizer = None
+        self.start_btn.setEnabled(False)
+        QMessageBox.critical(self, "Ошибка", f"Не удалось инициализировать распознаватель речи: {error}. Проверьте установку faster_whisper.")
 
     def load_vacancies(self):
-        if not VACANCIES_JSON.exists():
-            QMessageBox.critical(self, "Ошибка", "vacancies.json не найден!")
-            logging.error("vacancies.json не найден")
+        if not catalog.source.exists():
+            QMessageBox.critical(self, "Ошибка", f"{catalog.source.name} не найден!")
+            logging.error(f"{catalog.source} не найден")
             return
         try:
-            with open(VACANCIES_JSON, 'r', encoding='utf-8') as f:
-                vacancies = json.load(f)
+            vacancies = catalog.all()
             for vac in vacancies:
                 self.vacancy_combo.addItem(vac['title'], vac['id'])
+            self.prerender_selected_vacancy()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки вакансий: {e}")
             logging.error(f"Ошибка загрузки vacancies.json: {e}")
 
+    def prerender_selected_vacancy(self):
+        """Фиксированные вопросы выбранной вакансии синтезируются в кэш TTS в фоне и потом только воспроизводятся"""
+        vac_id = self.vacancy_combo.currentData()
+        if vac_id is None:
+            return
+        try:
+            prerender_vacancy_questions([extract_vacancy(vac_id)], ["Интервью завершено."])
+        except Exception as e:
+            logging.error(f"Ошибка предварительного синтеза вопросов {vac_id}: {e}")
+
     def select_resume(self):
         file, _ = QFileDialog.getOpenFileName(
             self, "Выбрать резюме", str(FILES_DIR), "Документы (*.docx *.rtf *.pdf)"
@@ -142,11 +190,20 @@ class HRWindow(QWidget):
             self.result_box.append(f"Ошибка при остановке записи: {e}")
             logging.error(f"Ошибка в on_stop_clicked: {e}")
 
+    def on_cancel_speech_clicked(self):
+        """Прервать озвучивание: запись ответа начнётся сразу"""
+        try:
+            if cancel_speech():
+                logging.info("Озвучивание прервано пользователем через GUI")
+        except Exception as e:
+            logging.error(f"Ошибка в on_cancel_speech_clicked: {e}")
+
     def handle_update_log(self, msg: str):
         """
         Перехватываем спец-сообщения от conduct_interview:
           - "[ENABLE_STOP]" -> включить кнопку остановки
           - "[DISABLE_STOP]" -> выключить кнопку
+          - "[APPEND] слово" -> дописать слово потокового вопроса в конец текущей строки
         Остальные сообщения отображаем, кроме отладочных.
         """
         try:
@@ -155,6 +212,9 @@ class HRWindow(QWidget):
                 self.result_box.append("Нажмите 'Остановить запись', когда закончите отвечать...")
             elif msg == "[DISABLE_STOP]":
                 self.stop_btn.setEnabled(False)
+            elif msg.startswith("[APPEND] "):
+                self.result_box.moveCursor(QTextCursor.End)
+                self.result_box.insertPlainText(" " + msg[len("[APPEND] "):])
             elif not msg.startswith("Interview answers:"):
                 self.result_box.append(msg)
             else:
@@ -185,6 +245,7 @@ class HRWindow(QWidget):
             self.result_box.append(f"Анализ резюме: {resume_report['score']}% соответствия.")
             self.result_box.append("Начало интервью...")
             self.start_btn.setEnabled(False)
+            self.cancel_speech_btn.setEnabled(True)
 
             self.interview_thread = InterviewThread(vacancy, self.recognizer)
             self.interview_thread.update_log.connect(self.handle_update_log)
@@ -196,6 +257,7 @@ class HRWindow(QWidget):
             QMessageBox.critical(self, "Ошибка", str(e))
             logging.error(f"Ошибка в start_process: {e}")
             self.start_btn.setEnabled(True)
+            self.cancel_speech_btn.setEnabled(False)
 
     def finish_process(self, data, fio, resume_text, vacancy, resume_report):
         try:
@@ -207,7 +269,8 @@ class HRWindow(QWidget):
                 resume_report['matched'] + interview_report['matched'],
                 resume_report['missing'] + interview_report['missing'],
                 interview_report.get('strong_points', []),
-                interview_report.get('gaps', [])
+                interview_report.get('gaps', []),
+                resume_report.get('evidence', {})
             )
 
             self.result_box.append(f"Общий скоринг: {total_score}%")
@@ -219,12 +282,14 @@ class HRWindow(QWidget):
                 'vacancy_id': vacancy['id'],
                 'interview_json': json.dumps(answers, ensure_ascii=False),
                 'score': total_score,
-                'report_json': json.dumps(report, ensure_ascii=False)
+                'report_json': json.dumps(report, ensure_ascii=False),
+                'answer_audio': data.get('recordings')
             }
             save_candidate(candidate_data)
             self.result_box.append("Данные сохранены в БД.")
             speak("Интервью завершено.")
             self.start_btn.setEnabled(True)
+            self.cancel_speech_btn.setEnabled(False)
         except Exception as e:
             self.result_box.append(f"Ошибка в обработке результатов: {e}")
             logging.error(f"Ошибка в finish_process: {e}")
@@ -235,7 +300,12 @@ if __name__ == "__main__":
         app = QApplication(sys.argv)
         win = HRWindow()
         win.show()
+        model_registry.warm_up(WARM_UP_MODELS)
+        win.watch_speech_model()
+        threading.Thread(target=log_startup_timings, daemon=True).start()
+        threading.Thread(target=resume_vector_index, daemon=True).start()
+        threading.Thread(target=backfill_search_index, daemon=True).start()
         sys.exit(app.exec())
     except Exception as e:
         logging.error(f"Критическая ошибка приложения: {e}")
-        print(f"Критическая ошибка: {e}")
\ No newline at end of file
+        print(f"Критическая ошибка: {e}")
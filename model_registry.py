@@ -0,0 +1,266 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logging.basicConfig(filename='model_registry.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# Бюджет памяти на модели (МБ); 0 — без ограничения
+MEMORY_BUDGET_MB = int(os.environ.get("AI_HR_MODEL_BUDGET_MB", "0"))
+
+
+def _rss_bytes():
+    """Резидентная память процесса (psutil, если установлен, иначе /proc)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def _module_bytes(obj):
+    """Размер весов torch-модели (параметры и буферы) или None, если объект не похож на модуль"""
+    obj = getattr(obj, "model", obj)  # pipeline transformers хранит модуль в .model
+    if not callable(getattr(obj, "parameters", None)):
+        return None
+    total = sum(p.numel() * p.element_size() for p in obj.parameters())
+    if callable(getattr(obj, "buffers", None)):
+        total += sum(b.numel() * b.element_size() for b in obj.buffers())
+    return total
+
+
+class LazyModel:
+    """
+    Ленивая ссылка на модель: загрузка выполняется при первом обращении или в фоне (warm_up).
+    get() блокируется только до готовности этой модели; при ошибке загрузки возвращает None,
+    по истечении timeout поднимает TimeoutError. Модель, занятая через use(), бюджетом памяти не выгружается.
+    key — (модель, устройство, тип вычислений): одинаковые ключи разделяют один экземпляр.
+    """
+
+    def __init__(self, name: str, loader, key: tuple = None, pinned: bool = False):
+        self.name = name
+        self.loader = loader
+        self.key = key or (name,)
+        self.pinned = pinned
+        self.model = None
+        self.error = None
+        self.load_seconds = None
+        self.resident_bytes = None
+        self.last_used = 0.0
+        self._started = False
+        self._users = 0
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        start = time.perf_counter()
+        rss_before = _rss_bytes()
+        try:
+            self.model = self.loader()
+            size = _module_bytes(self.model)
+            if size is None and rss_before is not None:
+                # Оценка по приросту RSS; при параллельной загрузке приблизительная
+                rss_after = _rss_bytes()
+                size = max(0, rss_after - rss_before) if rss_after is not None else None
+            self.resident_bytes = size
+            logging.info(f"Модель '{self.name}' загружена")
+        except Exception as e:
+            self.error = e
+            logging.error(f"Ошибка загрузки модели '{self.name}': {e}")
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self.last_used = time.monotonic()
+            self._ready.set()
+        if self.model is not None:
+            _enforce_budget(exclude=self)
+
+    def unload(self, only_idle: bool = False) -> bool:
+        """Выгрузить модель; следующее обращение загрузит её заново. only_idle — не трогать занятую модель"""
+        with self._lock:
+            if not self._ready.is_set() or (only_idle and self._users):
+                return False
+            self.model = None
+            self.error = None
+            self.resident_bytes = None
+            self._started = False
+            self._ready = threading.Event()
+        logging.info(f"Модель '{self.name}' выгружена")
+        return True
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            return True
+
+    def start(self):
+        """Запустить загрузку в фоновом потоке (если она ещё не начата)"""
+        if self._claim():
+            threading.Thread(target=self._load, name=f"load-{self.name}", daemon=True).start()
+
+    def get(self, timeout: float = None):
+        """Модель; при необходимости загружает её в текущем потоке или ждёт фоновой загрузки"""
+        while True:
+            # Событие берётся под блокировкой: unload() заменяет его новым, которое никто не установит
+            with self._lock:
+                ready = self._ready
+                claimed = not self._started
+                self._started = True
+            if claimed:
+                self._load()
+            if not ready.wait(timeout):
+                raise TimeoutError(f"Модель '{self.name}' не загружена за {timeout} с")
+            with self._lock:
+                if self._ready is ready:
+                    self.last_used = time.monotonic()
+                    return self.model
+            # Модель выгружена между ожиданием и чтением — загружаем заново
+
+    @contextmanager
+    def use(self, timeout: float = None):
+        """Модель на время блока: пока блок выполняется, бюджет памяти её не выгружает"""
+        with self._lock:
+            self._users += 1
+        try:
+            yield self.get(timeout)
+        finally:
+            with self._lock:
+                self._users -= 1
+
+    @property
+    def loaded(self) -> bool:
+        return self._ready.is_set() and self.model is not None
+
+    def status(self) -> str:
+        if not self._started:
+            return "not_started"
+        if not self._ready.is_set():
+            return "loading"
+        return "failed" if self.error else "ready"
+
+
+_models = {}
+_by_key = {}
+_registry_lock = threading.Lock()
+
+
+def register(name: str, loader, key: tuple = None, pinned: bool = False) -> LazyModel:
+    """
+    Зарегистрировать модель. Модель с тем же key (модель, устройство, тип вычислений)
+    уже зарегистрированная под другим именем, переиспользуется: имя становится её псевдонимом.
+    """
+    with _registry_lock:
+        if key is not None and key in _by_key:
+            handle = _by_key[key]
+        elif name in _models:
+            handle = _models[name]
+        else:
+            handle = LazyModel(name, loader, key, pinned)
+            _by_key[handle.key] = handle
+        handle.pinned = handle.pinned or pinned
+        _models.setdefault(name, handle)
+        return handle
+
+
+def _unique_handles() -> list:
+    with _registry_lock:
+        return list(_by_key.values())
+
+
+def _enforce_budget(exclude: LazyModel = None):
+    """Выгрузка давно не использовавшихся незакреплённых моделей при превышении бюджета памяти"""
+    if not MEMORY_BUDGET_MB:
+        return
+    budget = MEMORY_BUDGET_MB * 1024 * 1024
+    loaded = [h for h in _unique_handles() if h.loaded]
+    total = sum(h.resident_bytes or 0 for h in loaded)
+    candidates = sorted((h for h in loaded if not h.pinned and h is not exclude), key=lambda h: h.last_used)
+    for handle in candidates:
+        if total <= budget:
+            break
+        size = handle.resident_bytes or 0
+        if handle.unload(only_idle=True):
+            total -= size
+            logging.info(f"Превышен бюджет памяти {MEMORY_BUDGET_MB} МБ, выгружена '{handle.name}'")
+    if total > budget:
+        logging.warning(f"Модели занимают {total / 2 ** 20:.0f} МБ при бюджете {MEMORY_BUDGET_MB} МБ")
+
+
+def set_memory_budget(megabytes: int):
+    global MEMORY_BUDGET_MB
+    MEMORY_BUDGET_MB = megabytes
+    _enforce_budget()
+
+
+def get_handle(name: str) -> LazyModel:
+    with _registry_lock:
+        if name not in _models:
+            raise KeyError(f"Модель '{name}' не зарегистрирована")
+        return _models[name]
+
+
+def override(name: str, loader) -> LazyModel:
+    """
+    Подменить загрузчик зарегистрированной модели (например, заглушкой в бенчмарках).
+    Уже загруженная модель выгружается; все модули, держащие ссылку на handle, получат новую.
+    """
+    handle = get_handle(name)
+    handle.unload()
+    handle.loader = loader
+    logging.info(f"Загрузчик модели '{name}' подменён")
+    return handle
+
+
+def get(name: str, timeout: float = None):
+    return get_handle(name).get(timeout)
+
+
+def warm_up(names: list = None):
+    """Параллельная фоновая загрузка моделей (по потоку на модель)"""
+    with _registry_lock:
+        handles = [_models[n] for n in names if n in _models] if names else list(_by_key.values())
+    for handle in dict.fromkeys(handles):
+        handle.start()
+    logging.info(f"Фоновая загрузка моделей: {[h.name for h in handles]}")
+
+
+def wait_all(timeout: float = None) -> bool:
+    """Дождаться окончания всех начатых загрузок"""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    for handle in _unique_handles():
+        if handle.status() == "not_started":
+            continue
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not handle._ready.wait(remaining):
+            return False
+    return True
+
+
+def timings() -> dict:
+    """Разбивка времени запуска по моделям: {name: {"status", "seconds"}}"""
+    return {
+        h.name: {"status": h.status(), "seconds": round(h.load_seconds, 2) if h.load_seconds is not None else None}
+        for h in _unique_handles()
+    }
+
+
+def memory_report() -> dict:
+    """Резидентная память по моделям: {name: {"key", "mb", "pinned", "status"}}"""
+    return {
+        h.name: {
+            "key": h.key,
+            "mb": round(h.resident_bytes / 2 ** 20, 1) if h.resident_bytes is not None else None,
+            "pinned": h.pinned,
+            "status": h.status(),
+        }
+        for h in _unique_handles()
+    }
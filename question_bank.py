@@ -0,0 +1,194 @@
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+import artifact_store
+
+logging.basicConfig(filename='question_bank.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = Path(__file__).parent
+BANK_DIR = BASE_DIR / "artifacts" / "question_bank"
+BANK_VERSION = 2
+QUESTIONS_PER_REQUIREMENT = 8
+MATCH_THRESHOLD = 0.4       # минимальная похожесть вопроса банка на ответ кандидата
+DUPLICATE_THRESHOLD = 0.85  # похожесть, начиная с которой вопрос считается уже заданным
+
+# Подсказки, разводящие генерации по одному требованию в разные стороны
+_ANGLES = [
+    "про практический опыт",
+    "про конкретный проект",
+    "про сложную ситуацию и её решение",
+    "про инструменты и технологии",
+    "про результаты и метрики",
+    "про ошибки и выводы из них",
+    "про работу в команде",
+    "про глубину понимания темы",
+]
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def bank_hash(vacancy: dict, per_requirement: int, model_name: str = "", llm_name: str = "") -> str:
+    """Хэш входов банка: вакансия (как она попадает в промпт), объём, модели генерации и эмбеддингов"""
+    payload = json.dumps({
+        "version": BANK_VERSION,
+        "model": model_name,
+        "llm": llm_name,
+        "per_requirement": per_requirement,
+        "title": vacancy.get("title", ""),
+        "requirements": vacancy.get("requirements", []),
+        "duties": vacancy.get("duties", []),
+        "questions": vacancy.get("questions", []),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def generate_questions(vacancy: dict, generate, per_requirement: int = QUESTIONS_PER_REQUIREMENT) -> list:
+    """
+    Кандидаты в банк: вопросы вакансии и по per_requirement уточняющих вопросов на каждое требование.
+    generate(requirement, angle, asked) -> текст вопроса или None. Возвращает [{"text", "requirement"}].
+    """
+    items = [{"text": q, "requirement": None} for q in vacancy.get("questions", [])]
+    seen = {item["text"] for item in items}
+    for requirement in vacancy.get("requirements", []):
+        asked = []
+        for attempt in range(per_requirement):
+            angle = _ANGLES[attempt % len(_ANGLES)]
+            try:
+                text = generate(requirement, angle, asked)
+            except Exception as e:
+                logging.error(f"Ошибка генерации вопроса банка ({requirement}): {e}")
+                continue
+            if text and text not in seen:
+                seen.add(text)
+                asked.append(text)
+                items.append({"text": text, "requirement": requirement})
+        logging.info(f"Банк вопросов {vacancy['id']}: требование '{requirement}', вопросов {len(asked)}")
+    return items
+
+
+def _drop_near_duplicates(items: list, embeddings: np.ndarray, threshold: float = DUPLICATE_THRESHOLD):
+    """Жадное удаление почти одинаковых формулировок (первая сохраняется)"""
+    keep = []
+    for i in range(len(items)):
+        if keep and float((embeddings[keep] @ embeddings[i]).max()) >= threshold:
+            continue
+        keep.append(i)
+    return [items[i] for i in keep], embeddings[keep]
+
+
+def build_bank(vacancy: dict, generate, encode, per_requirement: int = QUESTIONS_PER_REQUIREMENT,
+               model_name: str = "", llm_name: str = "") -> dict:
+    """Сгенерировать банк вопросов вакансии и сохранить его вместе с эмбеддингами"""
+    items = generate_questions(vacancy, generate, per_requirement)
+    embeddings = np.asarray(encode([item["text"] for item in items]), dtype=np.float32) if items else None
+    if embeddings is None or not len(embeddings):
+        embeddings = np.zeros((0, 0), dtype=np.float32)
+    else:
+        items, embeddings = _drop_near_duplicates(items, embeddings)
+
+    meta = {
+        "id": vacancy["id"],
+        "hash": bank_hash(vacancy, per_requirement, model_name, llm_name),
+        "model": model_name,
+        "llm": llm_name,
+        "per_requirement": per_requirement,
+        "questions": items,
+    }
+    with _lock:
+        _cache.pop(vacancy["id"], None)  # отображение прежней версии больше не используется
+    meta = artifact_store.write_artifact(BANK_DIR, vacancy["id"], meta, {"emb": embeddings})
+    logging.info(f"Банк вопросов {vacancy['id']} собран: {len(items)} вопросов")
+    return meta
+
+
+def compile_banks(vacancies: list, generate_for, encode, per_requirement: int = QUESTIONS_PER_REQUIREMENT,
+                  model_name: str = "", llm_name: str = "", force: bool = False) -> dict:
+    """Пересборка банков только для вакансий с изменившимся хэшем; generate_for(vacancy) -> generate"""
+    stats = {"built": 0, "skipped": 0}
+    for vac in vacancies:
+        meta = artifact_store.read_meta(BANK_DIR, vac["id"])
+        if not force and meta and meta.get("hash") == bank_hash(vac, per_requirement, model_name, llm_name):
+            stats["skipped"] += 1
+            continue
+        build_bank(vac, generate_for(vac), encode, per_requirement, model_name, llm_name)
+        stats["built"] += 1
+    logging.info(f"Компиляция банков вопросов: {stats}")
+    return stats
+
+
+def load_bank(vacancy: dict, model_name: str = ""):
+    """
+    Банк вопросов вакансии (эмбеддинги отображаются в память) или None, если банк не собран.
+    Банк на живом пути не генерируется: его собирает офлайн-задача (python question_bank.py).
+    """
+    vac_id = vacancy["id"]
+    with _lock:
+        meta = artifact_store.read_meta(BANK_DIR, vac_id)
+        if not meta or not meta["questions"] or "files" not in meta:
+            return None  # не собран или собран в прежнем формате (до BANK_VERSION 2)
+        cached = _cache.get(vac_id)
+        if cached and cached["hash"] == meta["hash"]:
+            return cached
+        expected = bank_hash(vacancy, meta["per_requirement"], model_name, meta.get("llm", ""))
+        if meta["hash"] != expected:
+            # Устаревший банк лучше, чем вызов LLM на каждый вопрос: используем, но предупреждаем
+            logging.warning(f"Банк вопросов {vac_id} собран для другой версии вакансии или модели, перегенерируйте его")
+        try:
+            emb = artifact_store.load_array(BANK_DIR, meta, "emb")
+        except FileNotFoundError:
+            logging.error(f"Банк вопросов {vac_id}: массив эмбеддингов не найден, перегенерируйте банк")
+            return None
+        bank = {
+            "hash": meta["hash"],
+            "model": meta.get("model", ""),
+            "questions": [item["text"] for item in meta["questions"]],
+            "requirements": [item["requirement"] for item in meta["questions"]],
+            "emb": emb,
+        }
+        _cache[vac_id] = bank
+        return bank
+
+
+def select_question(bank: dict, answer_emb: np.ndarray, asked_emb: np.ndarray = None,
+                    threshold: float = MATCH_THRESHOLD, duplicate_threshold: float = DUPLICATE_THRESHOLD):
+    """
+    Ближайший к ответу вопрос банка, не совпадающий по смыслу с уже заданными.
+    Возвращает (вопрос, похожесть) или None, если ни один вопрос не проходит порог.
+    """
+    emb = np.asarray(bank["emb"], dtype=np.float32)
+    if not len(emb) or answer_emb is None or emb.shape[1] != len(answer_emb):
+        return None
+    scores = emb @ np.asarray(answer_emb, dtype=np.float32)
+    if asked_emb is not None and len(asked_emb):
+        asked_sim = (emb @ np.asarray(asked_emb, dtype=np.float32).T).max(axis=1)
+        scores[asked_sim >= duplicate_threshold] = -1.0
+    best = int(scores.argmax())
+    if scores[best] < threshold:
+        return None
+    return bank["questions"][best], float(scores[best])
+
+
+if __name__ == "__main__":
+    import argparse
+    import analyzer
+    import interview_helper
+    from vacancy_parser import VacancyCatalog, VACANCIES_JSON
+
+    parser = argparse.ArgumentParser(description="Офлайн-генерация банка уточняющих вопросов для вакансий")
+    parser.add_argument("vacancy_ids", nargs="*", help="ID вакансий (по умолчанию все)")
+    parser.add_argument("--vacancies", default=str(VACANCIES_JSON), help="JSON, JSONL или каталог шардов")
+    parser.add_argument("--per-requirement", type=int, default=QUESTIONS_PER_REQUIREMENT)
+    parser.add_argument("--force", action="store_true", help="Пересобрать все банки")
+    args = parser.parse_args()
+
+    vacancies = VacancyCatalog(Path(args.vacancies)).all()
+    if args.vacancy_ids:
+        vacancies = [vac for vac in vacancies if vac["id"] in args.vacancy_ids]
+    result = compile_banks(vacancies, interview_helper.bank_generator, analyzer.encode_texts, args.per_requirement,
+                           analyzer.SBERT_MODEL_NAME, interview_helper.LLAMA_MODEL_PATH, force=args.force)
+    print(f"Собрано: {result['built']}, без изменений: {result['skipped']}")
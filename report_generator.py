@@ -1,9 +1,12 @@
-def generate_report(score: float, matched: list, missing: list, strong_points: list, gaps: list) -> str:
+def generate_report(score: float, matched: list, missing: list, strong_points: list, gaps: list, evidence: dict = None) -> str:
+    evidence = evidence or {}
     report = f"Процент соответствия: {score}%\n"
     report += "\nСильные стороны:\n" + "\n".join([f"- {p}" for p in strong_points])
     report += "\nПробелы:\n" + "\n".join([f"- {g}" for g in gaps])
-    report += "\nПодтверждено:\n" + "\n".join([f"- {m}" for m in matched])
+    report += "\nПодтверждено:\n" + "\n".join([
+        f"- {m} (резюме: «{evidence[m]['chunk'][:150]}»)" if m in evidence else f"- {m}" for m in matched
+    ])
     report += "\nОтсутствует:\n" + "\n".join([f"- {m}" for m in missing])
     recommendation = "На следующий этап" if score > 70 else "Отказ" if score < 50 else "Требуется уточнение"
     report += f"\nРекомендация: {recommendation}"
-    return report
\ No newline at end of file
+    return report
@@ -1,19 +1,162 @@
+import atexit
+import logging
+import zipfile
+import threading
+import multiprocessing
+import xml.etree.ElementTree as ET
 from pathlib import Path
-from docx import Document
+from concurrent.futures import ProcessPoolExecutor
 from striprtf.striprtf import rtf_to_text
 import PyPDF2
+from text_cache import TextCache, file_digest
 
-def extract_text(file_path: Path) -> str:
+# Увеличивать при любом изменении логики извлечения: старые записи кэша перестанут использоваться
+PARSER_VERSION = "3"
+PARALLEL_PDF_MIN_PAGES = 16  # начиная с этого числа страниц PDF разбирается в нескольких процессах
+PDF_PAGES_PER_TASK = 4
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_text_cache = TextCache()
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _shared_pdf_pool():
+    """
+    Общий пул процессов для больших PDF: создаётся один раз (в Windows запуск процессов дорог).
+    В процессе-обработчике (пакетный скрининг) возвращает None — вложенные пулы не создаются.
+    """
+    global _pdf_pool
+    if multiprocessing.parent_process() is not None:
+        return None
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor()
+            atexit.register(_pdf_pool.shutdown, cancel_futures=True)
+        return _pdf_pool
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> list:
+    """Текст диапазона страниц PDF (выполняется в процессе-обработчике); каждая страница разбирается один раз"""
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _iter_pdf(file_path: Path, max_pages: int = None, executor=None):
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        n_pages = len(reader.pages)
+        if max_pages is not None:
+            n_pages = min(n_pages, max_pages)
+        if n_pages >= PARALLEL_PDF_MIN_PAGES and executor is None:
+            executor = _shared_pdf_pool()
+        if n_pages < PARALLEL_PDF_MIN_PAGES or executor is None:
+            for i in range(n_pages):
+                yield reader.pages[i].extract_text() or ""
+            return
+
+    ranges = [(i, min(i + PDF_PAGES_PER_TASK, n_pages)) for i in range(0, n_pages, PDF_PAGES_PER_TASK)]
+    futures = [executor.submit(_extract_pdf_pages, str(file_path), start, stop) for start, stop in ranges]
+    try:
+        # Страницы отдаются по порядку, как только готов очередной диапазон
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _paragraph_text(paragraph) -> str:
+    """
+    Текст абзаца как Paragraph.text в python-docx 0.8.11: только прямые прогоны w:r абзаца
+    и их прямые w:t / w:tab / w:br / w:cr. Гиперссылки, исправления (w:ins) и надписи не входят —
+    иначе изменился бы текст резюме и, следовательно, скоринг.
+    """
+    parts = []
+    for run in paragraph:
+        if run.tag != _W_NS + "r":
+            continue
+        for el in run:
+            if el.tag == _W_NS + "t":
+                parts.append(el.text or "")
+            elif el.tag == _W_NS + "tab":
+                parts.append("\t")
+            elif el.tag in (_W_NS + "br", _W_NS + "cr"):
+                parts.append("\n")
+    return "".join(parts)
+
+
+def _iter_docx(file_path: Path):
+    """Абзацы верхнего уровня документа, читаемые из XML потоково (без построения полного DOM)"""
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+        depth = 0
+        for event, el in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            # document(1) -> body(2) -> p(3): как doc.paragraphs в python-docx
+            if depth == 2:
+                if el.tag == _W_NS + "p":
+                    yield _paragraph_text(el)
+                el.clear()
+
+
+def iter_text(file_path: Path, max_pages: int = None, max_chars: int = None, executor=None):
+    """
+    Потоковое извлечение текста: страницы PDF, абзацы DOCX, текст RTF.
+    max_pages / max_chars — бюджет раннего останова: разбор прекращается, как только он исчерпан.
+    executor — пул процессов для больших PDF (по умолчанию общий пул модуля, в процессах-обработчиках
+    страницы разбираются последовательно).
+    """
+    file_path = Path(file_path)
     suffix = file_path.suffix.lower()
     if suffix == ".docx":
-        doc = Document(file_path)
-        return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+        fragments = _iter_docx(file_path)
     elif suffix == ".rtf":
         raw_text = file_path.read_text(encoding="utf-8", errors="ignore")
-        return rtf_to_text(raw_text)
+        fragments = iter([rtf_to_text(raw_text)])
     elif suffix == ".pdf":
-        with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            return "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
+        fragments = _iter_pdf(file_path, max_pages, executor)
     else:
-        raise ValueError(f"Формат {suffix} не поддерживается")
\ No newline at end of file
+        raise ValueError(f"Формат {suffix} не поддерживается")
+
+    total = 0
+    for fragment in fragments:
+        if not fragment.strip() and suffix != ".rtf":
+            continue
+        if max_chars is not None and total + len(fragment) >= max_chars:
+            yield fragment[:max_chars - total]
+            if hasattr(fragments, "close"):
+                fragments.close()
+            return
+        total += len(fragment)
+        yield fragment
+
+
+def _parse(file_path: Path) -> str:
+    return "\n".join(iter_text(file_path))
+
+
+def extract_text(file_path: Path, use_cache: bool = True) -> str:
+    """Текст резюме; повторная подача того же файла берётся из кэша по SHA-256 без разбора"""
+    file_path = Path(file_path)
+    if not use_cache:
+        return _parse(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix not in {".docx", ".rtf", ".pdf"}:
+        raise ValueError(f"Формат {suffix} не поддерживается")
+    digest = file_digest(file_path)
+    text = _text_cache.get_text(digest, PARSER_VERSION)
+    if text is None:
+        text = _parse(file_path)
+        _text_cache.put_text(digest, PARSER_VERSION, text)
+    else:
+        logging.info(f"Текст {file_path.name} взят из кэша")
+    return text
+
+
+def clear_text_cache(all_versions: bool = False) -> int:
+    """Сбросить кэш извлечённого текста: записи старых версий парсера или целиком"""
+    return _text_cache.invalidate(None if all_versions else PARSER_VERSION)
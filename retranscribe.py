@@ -0,0 +1,171 @@
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from db_helper import candidates_with_audio, get_candidate, get_candidate_payload, update_interview
+
+logging.basicConfig(filename='retranscribe.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+WHISPER_RATE = 16000
+ANALYZE_BATCH_SIZE = 16  # интервью на один пакетный вызов analyze_interviews
+
+_model = None
+
+
+def _init_worker(model_size: str, device: str, compute_type: str, cpu_threads: int):
+    """Одна модель Whisper на процесс-обработчик"""
+    global _model
+    from faster_whisper import WhisperModel
+    _model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _to_float(pcm: np.ndarray, rate: int) -> np.ndarray:
+    audio = pcm.astype(np.float32) / 32768.0
+    if rate != WHISPER_RATE and len(audio):
+        # Архив пишется с частотой Whisper; линейная передискретизация — на случай чужих записей
+        positions = np.arange(int(len(audio) * WHISPER_RATE / rate)) * (rate / WHISPER_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+def _transcribe_candidate(candidate_id: int, beam_size: int, language: str) -> dict:
+    """Расшифровка архивного аудио всех ответов кандидата (выполняется в процессе-обработчике)"""
+    from db_helper import load_answer_audio
+    answers = []
+    for index, pcm, rate in load_answer_audio(candidate_id):
+        start = time.perf_counter()
+        segments, _ = _model.transcribe(_to_float(pcm, rate), language=language, beam_size=beam_size, vad_filter=True)
+        text = " ".join(seg.text for seg in segments).strip()
+        answers.append({
+            "question_index": index,
+            "text": text,
+            "audio_seconds": len(pcm) / rate,
+            "decode_seconds": time.perf_counter() - start,
+        })
+    return {"candidate_id": candidate_id, "answers": answers}
+
+
+def _merge_answers(candidate_id: int, transcripts: list) -> list:
+    """Ответы интервью из БД с заменой текста на новую расшифровку"""
+    answers = json.loads(get_candidate_payload(candidate_id, "interview_json") or "[]")
+    for item in transcripts:
+        if item["question_index"] < len(answers):
+            answer = answers[item["question_index"]]
+            answer["previous_answer"] = answer.get("answer", "")
+            answer["answer"] = item["text"]
+    return answers
+
+
+def _analyze(pending: list, out, update_db: bool) -> int:
+    """Повторный анализ пакета интервью и запись результатов"""
+    from analyzer import analyze_interviews
+    from vacancy_parser import extract_vacancy
+
+    interviews, records = [], []
+    for result in pending:
+        candidate = get_candidate(result["candidate_id"])
+        try:
+            vacancy = extract_vacancy(candidate["vacancy_id"])
+        except ValueError as e:
+            logging.error(f"Кандидат {candidate['id']}: {e}")
+            continue
+        answers = _merge_answers(candidate["id"], result["answers"])
+        interviews.append((answers, vacancy))
+        records.append((candidate, answers, result["answers"]))
+
+    for (candidate, answers, transcripts), report in zip(records, analyze_interviews(interviews)):
+        if update_db:
+            update_interview(candidate["id"], json.dumps(
+                [{k: v for k, v in ans.items() if k != "previous_answer"} for ans in answers], ensure_ascii=False))
+        audio = sum(t["audio_seconds"] for t in transcripts)
+        decode = sum(t["decode_seconds"] for t in transcripts)
+        out.write(json.dumps({
+            "candidate_id": candidate["id"],
+            "fio": candidate["fio"],
+            "vacancy_id": candidate["vacancy_id"],
+            "interview_score": report["score"],
+            "matched": report["matched"],
+            "missing": report["missing"],
+            "answers": answers,
+            "audio_seconds": round(audio, 2),
+            "rtf": round(decode / audio, 3) if audio else None,
+        }, ensure_ascii=False) + "\n")
+    out.flush()
+    return len(records)
+
+
+def retranscribe(output: Path, vacancy_id: str = None, model_size: str = "small", beam_size: int = 5,
+                 workers: int = None, device: str = "cpu", compute_type: str = "int8", cpu_threads: int = 2,
+                 language: str = "ru", limit: int = None, update_db: bool = False) -> dict:
+    """
+    Повторная расшифровка архивных интервью новой моделью Whisper и повторный analyze_interview.
+    Возвращает статистику: RTF (время декодирования / длительность аудио) и пропускную способность.
+    """
+    ids = candidates_with_audio(vacancy_id)[:limit]
+    logging.info(f"Повторная расшифровка: {len(ids)} кандидатов, модель {model_size}, beam {beam_size}")
+
+    start = time.perf_counter()
+    audio_seconds, decode_seconds, done, errors = 0.0, 0.0, 0, 0
+    pending = []
+    with open(output, 'w', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(model_size, device, compute_type, cpu_threads)) as pool:
+        futures = [pool.submit(_transcribe_candidate, cid, beam_size, language) for cid in ids]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Ошибка расшифровки кандидата: {e}")
+                errors += 1
+                continue
+            audio_seconds += sum(a["audio_seconds"] for a in result["answers"])
+            decode_seconds += sum(a["decode_seconds"] for a in result["answers"])
+            pending.append(result)
+            if len(pending) >= ANALYZE_BATCH_SIZE:
+                done += _analyze(pending, out, update_db)
+                pending = []
+            elapsed = time.perf_counter() - start
+            print(f"\r{done + len(pending)}/{len(ids)} интервью, {audio_seconds / elapsed:.1f} с аудио/с",
+                  end="", file=sys.stderr)
+        if pending:
+            done += _analyze(pending, out, update_db)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "candidates": len(ids),
+        "processed": done,
+        "errors": errors,
+        "audio_seconds": round(audio_seconds, 1),
+        "seconds": round(elapsed, 2),
+        "rtf": round(decode_seconds / audio_seconds, 3) if audio_seconds else None,
+        "audio_seconds_per_second": round(audio_seconds / elapsed, 2) if elapsed else 0.0,
+        "interviews_per_second": round(done / elapsed, 3) if elapsed else 0.0,
+    }
+    print(file=sys.stderr)
+    logging.info(f"Повторная расшифровка завершена: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Повторная расшифровка архивных интервью и переоценка ответов")
+    parser.add_argument("--vacancy", default=None, help="Только кандидаты этой вакансии")
+    parser.add_argument("--model", default="small", help="Размер или путь модели Whisper")
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--cpu-threads", type=int, default=2, help="Потоков на одну модель")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default="retranscribe.jsonl")
+    parser.add_argument("--update-db", action="store_true", help="Записать новые ответы в БД")
+    args = parser.parse_args()
+
+    stats = retranscribe(Path(args.output), args.vacancy, args.model, args.beam_size, args.workers, args.device,
+                         args.compute_type, args.cpu_threads, limit=args.limit, update_db=args.update_db)
+    print(f"Интервью: {stats['processed']} из {stats['candidates']}, ошибок: {stats['errors']}, "
+          f"RTF: {stats['rtf']}, {stats['audio_seconds_per_second']} с аудио/с, результаты: {args.output}")
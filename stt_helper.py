@@ -1,23 +1,226 @@
+import re
 import pyaudio
-import wave
 import time
 import logging
 import threading
-import io
-from pathlib import Path
+import numpy as np
 from faster_whisper import WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+import model_registry
 
 logging.basicConfig(filename='stt_helper.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+MAX_RECORD_SECONDS = 60  # ёмкость кольцевого буфера записи
+
+# Автоматическое определение конца ответа
+TRAILING_SILENCE = 3.0     # с тишины после речи, после которых ответ считается законченным (по умолчанию)
+MIN_SPEECH = 0.6           # с речи, без которых ответ не завершается по тишине
+ENERGY_THRESHOLD = 0.005   # RMS кадра (float32), ниже которого кадр считается тишиной без проверки VAD
+STOP_PHRASE_PAUSE = 1.0    # с паузы после стоп-фразы в конце расшифровки (по умолчанию)
+ENDPOINT_CHECK_INTERVAL = 0.25
+ECHO_TRIM = 0.3            # с начала записи после воспроизведения вопроса, отбрасываемые как эхо/хвост динамика
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер записи: заранее выделенный массив int16 на seconds секунд, память не растёт
+    с длиной ответа. Пишет колбэк pyaudio, читает один потребитель (расшифровщик) через window().
+    """
+
+    def __init__(self, seconds: float = 60.0, rate: int = 16000):
+        self.rate = rate
+        self.capacity = int(seconds * rate)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self._scratch = np.empty(self.capacity, dtype=np.float32)  # float32-окно для Whisper
+        self._lock = threading.Lock()
+        self.total = 0  # отсчётов записано с последнего reset()
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+
+    def write(self, data: bytes):
+        samples = np.frombuffer(data, dtype=np.int16)
+        n = len(samples)
+        with self._lock:
+            if n > self.capacity:
+                samples = samples[-self.capacity:]
+            pos = (self.total + n - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - pos)
+            self._data[pos:pos + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.total += n
+
+    def pcm(self) -> np.ndarray:
+        """Копия всех сохранённых отсчётов int16 в порядке записи (для архива ответов)"""
+        with self._lock:
+            n = min(self.total, self.capacity)
+            pos = self.total % self.capacity
+            if self.total <= self.capacity:
+                return self._data[:n].copy()
+            return np.concatenate([self._data[pos:], self._data[:pos]])
+
+    def window(self, start: int, out: np.ndarray = None):
+        """
+        Аудио от отсчёта start до конца записи как float32 в [-1, 1]: (фактический start, массив).
+        Если начало уже перезаписано, окно начинается с самого старого отсчёта в буфере.
+        Массив — представление внутреннего буфера (или out), действительное до следующего вызова.
+        """
+        scratch = self._scratch if out is None else out
+        with self._lock:
+            end = self.total
+            start = min(max(start, end - self.capacity, end - len(scratch), 0), end)
+            n = end - start
+            pos = start % self.capacity
+            first = min(n, self.capacity - pos)
+            out = scratch[:n]
+            np.multiply(self._data[pos:pos + first], np.float32(1 / 32768), out=out[:first], dtype=np.float32)
+            np.multiply(self._data[:n - first], np.float32(1 / 32768), out=out[first:], dtype=np.float32)
+        return start, out
+
+
+class Endpointer:
+    """
+    Определение конца ответа в реальном времени. Энергия кадров отсекает явную тишину дёшево;
+    если в хвосте записи есть звук, Silero VAD из faster-whisper решает, речь это или шум.
+    Ответ закончен, когда набрано min_speech секунд речи и после неё trailing_silence секунд тишины.
+    """
+
+    def __init__(self, rate: int = 16000, trailing_silence: float = TRAILING_SILENCE, min_speech: float = MIN_SPEECH,
+                 energy_threshold: float = ENERGY_THRESHOLD, window: float = 3.0):
+        self.rate = rate
+        self.trailing_silence = trailing_silence
+        self.min_speech = min_speech
+        self.energy_threshold = energy_threshold
+        self._out = np.empty(int(window * rate), dtype=np.float32)
+        self._frame = int(0.03 * rate)
+        self._vad_options = VadOptions(min_silence_duration_ms=200, speech_pad_ms=30)
+        self.reset()
+
+    def reset(self):
+        self.speech_seconds = 0.0
+        self.last_speech_end = None  # отсчёт конца последней речи
+        self.end = 0                 # отсчёт конца проверенного аудио
+
+    def silence(self) -> float:
+        """Длительность тишины после последней речи, с (0, если речи ещё не было)"""
+        if self.last_speech_end is None:
+            return 0.0
+        return (self.end - self.last_speech_end) / self.rate
+
+    def update(self, buffer: AudioRingBuffer) -> bool:
+        """Проверить новый хвост записи; True — ответ закончен"""
+        start, audio = buffer.window(buffer.total - len(self._out), out=self._out)
+        self.end = start + len(audio)
+        n = len(audio) // self._frame * self._frame
+        if n:
+            frames = audio[len(audio) - n:].reshape(-1, self._frame)
+            loud = np.sqrt((frames ** 2).mean(axis=1)).max() >= self.energy_threshold
+        else:
+            loud = False
+        if loud:
+            spoken_until = self.last_speech_end or 0
+            for ts in get_speech_timestamps(audio, self._vad_options):
+                seg_start, seg_end = start + ts["start"], start + ts["end"]
+                if seg_end > spoken_until:
+                    self.speech_seconds += (seg_end - max(seg_start, spoken_until)) / self.rate
+                    spoken_until = seg_end
+            if spoken_until:
+                self.last_speech_end = spoken_until
+        return self.speech_seconds >= self.min_speech and self.silence() >= self.trailing_silence
+
+
+def ends_with_phrase(text: str, phrases) -> str:
+    """Стоп-фраза, которой заканчивается текст (без учёта регистра и пунктуации), или None"""
+    words = re.findall(r"\w+", text.lower().replace("ё", "е"))
+    for phrase in phrases:
+        tail = re.findall(r"\w+", phrase.lower().replace("ё", "е"))
+        if tail and words[-len(tail):] == tail:
+            return phrase
+    return None
+
+
+class IncrementalTranscriber:
+    """
+    Инкрементальная расшифровка по перекрывающимся окнам. Каждое окно начинается за overlap секунд
+    до конца уже зафиксированного текста; сегменты, середина которых попала в зафиксированную часть,
+    отбрасываются (склейка по временным меткам). Сегменты, закончившиеся раньше чем за stable_margin
+    секунд до конца аудио, фиксируются и больше не перераспознаются; остальные — предварительные.
+    """
+
+    def __init__(self, get_model, rate: int = 16000, overlap: float = 1.0, stable_margin: float = 1.0,
+                 language: str = "ru"):
+        self.get_model = get_model
+        self.rate = rate
+        self.overlap = overlap
+        self.stable_margin = stable_margin
+        self.language = language
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.committed = []         # зафиксированные фрагменты текста
+            self.committed_until = 0.0  # конец зафиксированной части, с от начала записи
+            self.tentative = []         # предварительный хвост последнего окна
+            self.end_sample = 0         # отсчёт, до которого распознана запись
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.committed + self.tentative).strip()
+
+    def step(self, buffer: AudioRingBuffer, final: bool = False) -> str:
+        """
+        Распознать окно буфера от зафиксированной части до конца записи.
+        final=True — запись закончена, фиксируется всё. Возвращает текущую расшифровку.
+        """
+        with self._lock:
+            start_sample, window = buffer.window(int(max(0.0, self.committed_until - self.overlap) * self.rate))
+            start = start_sample / self.rate
+            end = (start_sample + len(window)) / self.rate
+            self.end_sample = start_sample + len(window)
+            if len(window) < self.rate * 0.3:
+                if final:
+                    self.committed += self.tentative
+                    self.tentative = []
+                return self.text
+
+            prompt = " ".join(self.committed)[-200:] or None
+            segments, _ = self.get_model().transcribe(window, language=self.language, vad_filter=True,
+                                                      initial_prompt=prompt)
+            tentative, heard = [], False
+            for seg in segments:
+                seg_start, seg_end = start + seg.start, start + seg.end
+                if (seg_start + seg_end) / 2 <= self.committed_until:
+                    continue  # уже распознан в предыдущем окне (зона перекрытия)
+                text = seg.text.strip()
+                if not text:
+                    continue
+                heard = True
+                if not tentative and (final or seg_end <= end - self.stable_margin):
+                    self.committed.append(text)
+                    self.committed_until = seg_end
+                else:
+                    tentative.append(text)
+            self.tentative = tentative
+            if not heard and not final:
+                # Тишина: не перераспознавать её в следующих окнах
+                self.committed_until = max(self.committed_until, end - self.stable_margin)
+            if final:
+                self.committed += self.tentative
+                self.tentative = []
+                self.committed_until = end
+            return self.text
+
+
 class SpeechRecognizer:
     def __init__(self, model_size="small", device="cpu"):
-        try:
-            self.model = WhisperModel(model_size, device=device, compute_type="int8")
-            logging.info(f"Whisper модель '{model_size}' успешно загружена")
-        except Exception as e:
-            logging.error(f"Ошибка загрузки модели Whisper: {e}")
-            raise ValueError(f"Не удалось загрузить модель Whisper: {e}")
+        # Модель регистрируется лениво: окно не ждёт загрузки, блокируется только первая транскрибация
+        self._model_handle = model_registry.register(
+            f"whisper_{model_size}",
+            lambda: WhisperModel(model_size, device=device, compute_type="int8"),
+            key=(f"whisper-{model_size}", device, "int8")
+        )
 
         self.CHUNK = 1024
         self.FORMAT = pyaudio.paInt16
@@ -25,78 +228,128 @@ class SpeechRecognizer:
         self.RATE = 16000
         self.recording = False
         self.stopped_manually = False
-        self.frames = []
-        self.transcribed_text = []
+        self.buffer = AudioRingBuffer(MAX_RECORD_SECONDS, rate=self.RATE)
+        self.transcriber = IncrementalTranscriber(lambda: self.model, rate=self.RATE)
+        self._transcribe_thread = None
         self._lock = threading.Lock()
         self.stream = None
         self.pyaudio_instance = None
         self._transcription_active = False  # Флаг для отслеживания активных транскрибаций
+        self._on_partial = None  # Колбэк с текущей частичной расшифровкой
+        self.endpointer = Endpointer(rate=self.RATE)
+        self._armed = False      # микрофон открыт заранее, отсчёты пока отбрасываются
+        self._skip_samples = 0   # сколько отсчётов отбросить в начале записи (эхо)
+        self._stop_phrases = ()
+        self._stop_phrase_pause = STOP_PHRASE_PAUSE
+        self._stop_phrase_at = None  # (фраза, отсчёт конца расшифровки, в которой она найдена)
 
-    def _transcribe_chunk(self, audio_bytes):
-        """Фоновая транскрибация аудио с таймаутом"""
+    @property
+    def model(self):
+        model = self._model_handle.get()
+        if model is None:
+            raise ValueError(f"Не удалось загрузить модель Whisper: {self._model_handle.error}")
+        return model
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        """Колбэк pyaudio (поток PortAudio): отсчёты сразу копируются в кольцевой буфер"""
+        if not self.recording:
+            return None, (pyaudio.paContinue if self._armed else pyaudio.paComplete)
+        if self._skip_samples:
+            skip = min(self._skip_samples, len(in_data) // 2)
+            self._skip_samples -= skip
+            in_data = in_data[2 * skip:]
+        if in_data:
+            self.buffer.write(in_data)
+        return None, pyaudio.paContinue
+
+    def _transcribe_partial(self):
+        """Фоновая расшифровка очередного окна; фиксирует устойчивые сегменты"""
         try:
-            # Проверяем, активна ли запись
             if not self.recording:
                 logging.info("Транскрибация отменена: запись остановлена")
                 return
+            before = self.transcriber.text
+            partial = self.transcriber.step(self.buffer)
+            if partial and partial != before and self.recording:
+                logging.info(f"Промежуточный результат: {partial}")
+                self._notify_partial(partial)
+            phrase = ends_with_phrase(partial, self._stop_phrases) if self._stop_phrases else None
+            self._stop_phrase_at = (phrase, self.transcriber.end_sample) if phrase else None
+        except Exception as e:
+            logging.error(f"Ошибка транскрибации окна: {e}")
+        finally:
+            self._transcription_active = False
 
-            # Ограничиваем время выполнения транскрибации
-            start_time = time.time()
-            timeout = 5  # Таймаут 5 сек
-
-            wav_io = io.BytesIO()
-            with wave.open(wav_io, "wb") as wf:
-                wf.setnchannels(self.CHANNELS)
-                wf.setsampwidth(2)
-                wf.setframerate(self.RATE)
-                wf.writeframes(audio_bytes)
-
-            wav_io.seek(0)
-            if time.time() - start_time > timeout:
-                logging.warning("Транскрибация куска превысила таймаут")
-                return
+    def _notify_partial(self, partial: str):
+        callback = self._on_partial
+        if callback is None:
+            return
+        try:
+            callback(partial)
+        except Exception as e:
+            logging.error(f"Ошибка в обработчике частичной расшифровки: {e}")
 
-            segments, _ = self.model.transcribe(wav_io, vad_filter=True, language="ru")
-            text = " ".join([seg.text for seg in segments]).strip()
+    def _reset_state(self):
+        self.buffer.reset()
+        self.transcriber.reset()
+        self.endpointer.reset()
+        self._stop_phrase_at = None
+        self.stopped_manually = False
+        self._transcription_active = False
 
-            if text and self.recording:  # Проверяем, что запись все еще активна
-                with self._lock:
-                    self.transcribed_text.append(text)
-                logging.info(f"Промежуточный результат: {text}")
+    def _open_stream(self):
+        """Открыть входной поток в режиме колбэка (вызывается под self._lock)"""
+        try:
+            self.pyaudio_instance = pyaudio.PyAudio()
+            self.stream = self.pyaudio_instance.open(
+                format=self.FORMAT,
+                channels=self.CHANNELS,
+                rate=self.RATE,
+                input=True,
+                frames_per_buffer=self.CHUNK,
+                stream_callback=self._on_audio
+            )
         except Exception as e:
-            logging.error(f"Ошибка транскрибации куска: {e}")
-        finally:
-            self._transcription_active = False  # Сбрасываем флаг
+            logging.error(f"Ошибка открытия микрофона: {e}")
+            self.recording = False
+            self._armed = False
+            self.stream = None
+            self.pyaudio_instance = None
+            raise
+
+    def prepare(self):
+        """
+        Открыть микрофон заранее (например, пока звучит вопрос): устройство прогревается,
+        но отсчёты отбрасываются до start_recording().
+        """
+        with self._lock:
+            if self.stream is not None:
+                return
+            self._reset_state()
+            self.recording = False
+            self._armed = True
+            self._open_stream()
+            logging.info("Микрофон открыт заранее")
 
-    def start_recording(self):
-        """Запуск записи"""
+    def start_recording(self, skip_seconds: float = 0.0):
+        """Запуск записи (мгновенный, если микрофон открыт через prepare()); skip_seconds — отбросить начало"""
         with self._lock:
-            self.frames = []
-            self.transcribed_text = []
+            prepared = self.stream is not None and self._armed
+            if not prepared:
+                self._reset_state()
+            self.buffer.reset()
+            self._skip_samples = int(skip_seconds * self.RATE)
             self.recording = True
-            self.stopped_manually = False
-            self._transcription_active = False
-            try:
-                self.pyaudio_instance = pyaudio.PyAudio()
-                self.stream = self.pyaudio_instance.open(
-                    format=self.FORMAT,
-                    channels=self.CHANNELS,
-                    rate=self.RATE,
-                    input=True,
-                    frames_per_buffer=self.CHUNK
-                )
-                logging.info("Микрофон открыт, запись начата")
-            except Exception as e:
-                logging.error(f"Ошибка запуска записи: {e}")
-                self.recording = False
-                self.stream = None
-                self.pyaudio_instance = None
-                raise
+            if not prepared:
+                self._open_stream()
+            self._armed = False
+            logging.info("Запись начата" + (" (микрофон открыт заранее)" if prepared else ""))
 
     def stop_recording(self):
         """Остановка записи"""
         with self._lock:
             self.recording = False
+            self._armed = False
             self.stopped_manually = True
             try:
                 if self.stream is not None:
@@ -114,62 +367,124 @@ class SpeechRecognizer:
             finally:
                 self._transcription_active = False  # Сбрасываем флаг для всех транскрибаций
 
-    def listen_and_transcribe(self, timeout=30, chunk_duration=5):
-        """Потоковая запись и транскрибация"""
+    def _stop_phrase_confirmed(self) -> bool:
+        """Стоп-фраза в конце частичной расшифровки, после которой кандидат замолчал"""
+        if self._stop_phrase_at is None:
+            return False
+        _, heard_at = self._stop_phrase_at
+        last_speech = self.endpointer.last_speech_end
+        # После расшифрованного фрагмента речи не было, и пауза уже достаточная
+        return (last_speech is None or last_speech <= heard_at + int(0.2 * self.RATE)) \
+            and self.endpointer.silence() >= self._stop_phrase_pause
+
+    def listen_and_transcribe(self, timeout=30, chunk_duration=5, on_partial=None, endpointing=True, stop_phrases=None,
+                              after=None, trailing_silence=TRAILING_SILENCE, stop_phrase_pause=STOP_PHRASE_PAUSE):
+        """
+        Потоковая запись и транскрибация; on_partial(text) вызывается при каждом обновлении частичной расшифровки.
+        endpointing — завершать запись автоматически по тишине после речи (Endpointer);
+        trailing_silence — секунды тишины после речи, после которых ответ считается законченным.
+        stop_phrases — фразы, которыми кандидат завершает ответ, ищутся в конце частичной расшифровки;
+        ответ завершается, если после стоп-фразы stop_phrase_pause секунд тишины.
+        after — событие конца воспроизведения вопроса (threading.Event или объект с .done): микрофон
+        открывается сразу, запись начинается в момент окончания звука, первые ECHO_TRIM с отбрасываются.
+        В результате end_reason: "manual", "silence", "stop_phrase" или "timeout".
+        """
+        self._on_partial = on_partial
+        self._stop_phrases = tuple(stop_phrases or ())
+        self._stop_phrase_pause = stop_phrase_pause
+        self.endpointer.trailing_silence = trailing_silence
+        start_time = time.time()
+        end_reason = "timeout"
         try:
-            self.start_recording()
+            skip, cancelled = 0.0, False
+            if after is not None:
+                done = getattr(after, "done", after)
+                self.stopped_manually = False
+                try:
+                    self.prepare()
+                except Exception as e:
+                    logging.error(f"Не удалось открыть микрофон заранее: {e}")
+                while not done.wait(0.02):
+                    if self.stopped_manually:
+                        cancelled = True  # запись остановлена, пока ещё звучал вопрос
+                        break
+                skip = ECHO_TRIM
+            if cancelled:
+                self.stop_recording()
+                return {"text": "", "duration": 0.0, "stopped_manually": True, "end_reason": "manual",
+                        "audio": None, "sample_rate": self.RATE}
+            self.start_recording(skip)
             start_time = time.time()
-            chunk_frames = []
-            chunk_start = start_time
+            window_start = 0
+            chunk_samples = int(chunk_duration * self.RATE)
+            next_check = start_time + ENDPOINT_CHECK_INTERVAL
 
+            # Аудио пишет колбэк pyaudio; здесь только запускаются окна расшифровки и проверка конца ответа
             while self.recording and (time.time() - start_time) < timeout:
+                time.sleep(0.05)
                 try:
-                    with self._lock:
-                        if self.stream is None or not self.recording:
-                            logging.info("Чтение аудио прервано: поток закрыт или запись остановлена")
-                            break
-                    data = self.stream.read(self.CHUNK, exception_on_overflow=False)
-                    chunk_frames.append(data)
-                    self.frames.append(data)
-
-                    if (time.time() - chunk_start) >= chunk_duration and not self._transcription_active:
-                        self._transcription_active = True
-                        audio_bytes = b"".join(chunk_frames)
-                        threading.Thread(target=self._transcribe_chunk, args=(audio_bytes,), daemon=True).start()
-                        chunk_frames = []
-                        chunk_start = time.time()
+                    active = self.stream is not None and self.stream.is_active()
                 except Exception as e:
-                    logging.error(f"Ошибка чтения аудио: {e}")
+                    logging.error(f"Ошибка состояния аудиопотока: {e}")
+                    active = False
+                if not active:
+                    logging.info("Запись прервана: поток закрыт или остановлен")
                     break
+                if endpointing and time.time() >= next_check:
+                    next_check = time.time() + ENDPOINT_CHECK_INTERVAL
+                    try:
+                        if self.endpointer.update(self.buffer):
+                            end_reason = "silence"
+                            break
+                    except Exception as e:
+                        logging.error(f"Ошибка определения конца ответа: {e}")
+                        endpointing = False
+                if self._stop_phrase_confirmed():
+                    end_reason = "stop_phrase"
+                    break
+                # Окно расшифровки — по длительности или раньше, на паузе (чтобы вовремя увидеть стоп-фразу)
+                pending = self.buffer.total - window_start
+                paused = endpointing and self.endpointer.silence() >= stop_phrase_pause and pending >= self.RATE
+                if (pending >= chunk_samples or paused) and not self._transcription_active:
+                    self._transcription_active = True
+                    self._transcribe_thread = threading.Thread(target=self._transcribe_partial, daemon=True)
+                    self._transcribe_thread.start()
+                    window_start = self.buffer.total
 
             was_stopped_manually = self.stopped_manually
+            if was_stopped_manually:
+                end_reason = "manual"
             self.stop_recording()
+            if end_reason in ("silence", "stop_phrase"):
+                logging.info(f"Конец ответа определён автоматически ({end_reason}) через {time.time() - start_time:.1f} с")
 
-            final_text = ""
-            if self.frames:
-                try:
-                    wav_path = Path("final_audio.wav")
-                    with wave.open(str(wav_path), "wb") as wf:
-                        wf.setnchannels(self.CHANNELS)
-                        wf.setsampwidth(2)
-                        wf.setframerate(self.RATE)
-                        wf.writeframes(b"".join(self.frames))
-
-                    segments, _ = self.model.transcribe(str(wav_path), vad_filter=True, language="ru")
-                    final_text = " ".join([seg.text for seg in segments]).strip()
-                except Exception as e:
-                    logging.error(f"Ошибка финальной транскрибации: {e}")
+            # Зафиксированная часть уже распознана: дождаться текущего окна и дораспознать только хвост
+            if self._transcribe_thread is not None:
+                self._transcribe_thread.join()
+                self._transcribe_thread = None
+            final_started = time.time()
+            try:
+                self.transcriber.step(self.buffer, final=True)
+            except Exception as e:
+                logging.error(f"Ошибка финальной транскрибации: {e}")
+            logging.info(f"Финальная расшифровка готова через {time.time() - final_started:.2f} с после остановки")
 
             return {
-                "text": final_text if final_text else " ".join(self.transcribed_text),
+                "text": self.transcriber.text,
                 "duration": time.time() - start_time,
-                "stopped_manually": was_stopped_manually
+                "stopped_manually": was_stopped_manually,
+                "end_reason": end_reason,
+                "audio": self.buffer.pcm(),
+                "sample_rate": self.RATE
             }
         except Exception as e:
             logging.error(f"Критическая ошибка в listen_and_transcribe: {e}")
             self.stop_recording()
             return {
-                "text": " ".join(self.transcribed_text),
+                "text": self.transcriber.text,
                 "duration": time.time() - start_time,
-                "stopped_manually": self.stopped_manually
-            }
\ No newline at end of file
+                "stopped_manually": self.stopped_manually,
+                "end_reason": "error"
+            }
+        finally:
+            self._on_partial = None
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+for _module in ("torch", "natasha", "transformers", "sentence_transformers"):
+    pytest.importorskip(_module)
+
+import analyzer
+import model_registry
+from benchmarks.stubs import StubSentenceTransformer, StubTokenizer
+
+
+class FixedSentiment:
+    """Sentiment-пайплайн с заданными оценками окон (по тексту окна)"""
+
+    def __init__(self, scores: dict):
+        self.tokenizer = StubTokenizer()
+        self.scores = scores
+        self.calls = []
+
+    def __call__(self, texts, top_k=1, **kwargs):
+        self.calls.append(list(texts))
+        return [[{"label": label, "score": score} for label, score in self.scores[text]] for text in texts]
+
+
+@pytest.fixture
+def stub_model():
+    """Подменить модель заглушкой на время теста и вернуть исходный загрузчик после"""
+    saved = {}
+
+    def install(name: str, model):
+        handle = model_registry.get_handle(name)
+        saved.setdefault(name, handle.loader)
+        model_registry.override(name, lambda: model)
+        return model
+
+    yield install
+    for name, loader in saved.items():
+        model_registry.override(name, loader)
+
+
+def test_match_requirements_many_takes_best_chunk_of_each_text(stub_model):
+    sbert = stub_model("sbert", StubSentenceTransformer())
+    requirements = ["администрирование Linux серверов", "разработка на Python"]
+    texts = [
+        "Работал бухгалтером.\nАдминистрирование Linux серверов и сетей.\nПисал скрипты на Python.",
+        "Разработка на Python и Django.",
+        "",
+    ]
+    results = analyzer.match_requirements_many(requirements, texts, threshold=0.45)
+
+    assert [len(r) for r in results] == [2, 2, 2]
+    for text, text_results in zip(texts[:2], results[:2]):
+        chunks = analyzer.split_into_chunks(text)
+        chunk_emb = sbert.encode(chunks, normalize_embeddings=True)
+        req_emb = sbert.encode(requirements, normalize_embeddings=True)
+        similarity = req_emb @ chunk_emb.T
+        for res, row in zip(text_results, similarity):
+            assert res["chunk"] == chunks[int(row.argmax())]
+            assert res["similarity"] == round(float(row.max()), 3)
+            assert res["matched"] == (row.max() >= 0.45)
+    assert results[0][0]["chunk"] == "Администрирование Linux серверов и сетей."
+    assert results[2] == [{"requirement": req, "matched": False, "similarity": 0.0, "chunk": ""}
+                          for req in requirements]
+
+
+def test_resume_report_keeps_evidence_only_for_semantic_matches():
+    vacancy = {"title": "Инженер", "requirements": ["Linux", "Python", "Cisco"]}
+    features = {"requirements": vacancy["requirements"], "req_lemmas": [{"linux"}, {"python"}, {"cisco"}]}
+    semantic = [
+        {"requirement": "Linux", "matched": True, "similarity": 0.71, "chunk": "Настраивал Linux"},
+        {"requirement": "Python", "matched": False, "similarity": 0.3, "chunk": "Писал на python"},
+        {"requirement": "Cisco", "matched": False, "similarity": 0.1, "chunk": ""},
+    ]
+    report = analyzer._resume_report("писал на python", vacancy, features, {"python"}, semantic)
+
+    assert report["matched"] == ["Linux", "Python"]
+    assert report["missing"] == ["Cisco"]
+    assert report["score"] == 66.7
+    assert report["evidence"] == {"Linux": {"chunk": "Настраивал Linux", "similarity": 0.71}}
+
+
+def test_sentiment_windows_overlap_and_cover_long_texts(stub_model, monkeypatch):
+    stub_model("sentiment", FixedSentiment({}))
+    monkeypatch.setattr(analyzer, "SENTIMENT_WINDOW_TOKENS", 4)
+    monkeypatch.setattr(analyzer, "SENTIMENT_WINDOW_STRIDE", 3)
+    long_text = " ".join(f"w{i}" for i in range(10))
+    windows = analyzer._sentiment_windows(["коротко и ясно", long_text, ""])
+
+    assert windows == [
+        (0, "коротко и ясно", 3),
+        (1, "w0 w1 w2 w3", 4),
+        (1, "w3 w4 w5 w6", 4),
+        (1, "w6 w7 w8 w9", 4),
+        (2, "", 1),
+    ]
+
+
+def test_score_sentiments_short_text_matches_single_pipeline_call(stub_model):
+    model = stub_model("sentiment", FixedSentiment({
+        "всё отлично": [("POSITIVE", 0.8), ("NEUTRAL", 0.15), ("NEGATIVE", 0.05)],
+    }))
+    assert analyzer.score_sentiments(["всё отлично"]) == [{"label": "POSITIVE", "score": 0.8}]
+    assert model.calls == [["всё отлично"]]
+    assert analyzer.score_sentiments([]) == []
+
+
+def test_score_sentiments_weights_windows_by_tokens(stub_model, monkeypatch):
+    monkeypatch.setattr(analyzer, "SENTIMENT_WINDOW_TOKENS", 4)
+    monkeypatch.setattr(analyzer, "SENTIMENT_WINDOW_STRIDE", 4)
+    stub_model("sentiment", FixedSentiment({
+        "a b c d": [("POSITIVE", 0.9), ("NEGATIVE", 0.1)],
+        "e f": [("POSITIVE", 0.0), ("NEGATIVE", 1.0)],
+    }))
+    [result] = analyzer.score_sentiments(["a b c d e f"])
+
+    # POSITIVE: (0.9 * 4 + 0.0 * 2) / 6 = 0.6; NEGATIVE: (0.1 * 4 + 1.0 * 2) / 6 = 0.4
+    assert result["label"] == "POSITIVE"
+    assert np.isclose(result["score"], 0.6)
@@ -0,0 +1,44 @@
+import numpy as np
+import artifact_store
+import vacancy_features
+
+
+def _lemmatize(text: str) -> list:
+    return text.lower().split()
+
+
+def _encode(texts: list) -> np.ndarray:
+    return np.array([[len(t), t.count(" ")] for t in texts], dtype=np.float32)
+
+
+def test_artifact_name_is_safe_for_paths():
+    assert artifact_store.artifact_name("vac_1") == "vac_1"
+    for item_id in ("../etc/passwd", "a/b", "CON", "x.y", ""):
+        name = artifact_store.artifact_name(item_id)
+        assert name.startswith("id-") and "/" not in name and "." not in name
+
+
+def test_rebuild_keeps_mapped_arrays_and_replaces_meta(tmp_path, monkeypatch):
+    monkeypatch.setattr(vacancy_features, "ARTIFACTS_DIR", tmp_path)
+    vacancy = {"id": "v/1", "requirements": ["Python", "SQL запросы"], "questions": ["Почему мы?"]}
+    first = vacancy_features.load_vacancy_features(vacancy, _lemmatize, _encode)
+    assert first["req_emb"].shape == (2, 2)
+
+    changed = dict(vacancy, requirements=["Linux"])
+    second = vacancy_features.load_vacancy_features(changed, _lemmatize, _encode)
+    assert second["req_emb"].shape == (1, 2)
+    assert np.array_equal(first["req_emb"], [[6, 0], [11, 1]])  # старое отображение по-прежнему читается
+    assert not list(tmp_path.glob("*.tmp"))
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+
+
+def test_lemmatizer_version_change_rebuilds_lemmas(tmp_path, monkeypatch):
+    monkeypatch.setattr(vacancy_features, "ARTIFACTS_DIR", tmp_path)
+    monkeypatch.setattr(vacancy_features, "_cache", {})
+    vacancy = {"id": "v2", "requirements": ["Python SQL"], "questions": []}
+    first = vacancy_features.load_vacancy_features(vacancy, _lemmatize, _encode, lemmatizer_version="1")
+    assert first["req_lemmas"] == [{"python", "sql"}]
+
+    second = vacancy_features.load_vacancy_features(vacancy, lambda text: ["python"], _encode,
+                                                    lemmatizer_version="2")
+    assert second["req_lemmas"] == [{"python"}]
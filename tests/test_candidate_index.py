@@ -0,0 +1,26 @@
+import numpy as np
+from candidate_index import CandidateIndex
+
+
+def _unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_reindexed_candidate_keeps_best_similarity(tmp_path):
+    index = CandidateIndex(tmp_path / "idx")
+    index.add_many([(1, np.stack([_unit(1, 0), _unit(0, 1)]))])
+    index.add_many([(2, np.stack([_unit(0, 1)]))])
+    # Повторная индексация кандидата 1 (из vector_index_pending) — второй сегмент с меньшей похожестью
+    index.add_many([(1, np.stack([_unit(1, 1)]))])
+    candidate_ids, best = index.best_similarities(np.stack([_unit(1, 0)]))
+    assert candidate_ids.tolist() == [1, 2]
+    assert np.allclose(best[0], [1.0, 0.0], atol=1e-3)
+
+
+def test_nprobe_skips_candidates_without_probed_chunks(tmp_path):
+    index = CandidateIndex(tmp_path / "idx")
+    index.add_many([(1, np.stack([_unit(1, 0)])), (2, np.stack([_unit(0, 1)]))])
+    index.build_clusters(n_clusters=2, sample=2)
+    ranked = index.rank(np.stack([_unit(1, 0)]), nprobe=1)
+    assert [item["candidate_id"] for item in ranked] == [1]
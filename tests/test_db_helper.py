@@ -0,0 +1,148 @@
+import re
+import sqlite3
+import pytest
+import db_helper
+
+# Примеры запросов из документации _fts_query и краевые случаи с отброшенными операндами
+QUERIES = [
+    "Python AND Cisco",
+    "(SQL OR Python) NOT 1С",
+    '"фразы в кавычках"',
+    "1С NOT Python",
+    "(1С OR 2019) AND Python",
+    "C# OR (Python AND (Cisco",
+    "Python) OR",
+]
+
+
+def _lemmatize(text: str) -> str:
+    """Правило отбора лемм analyzer._lemmatize_batch без Natasha: только буквенные слова и белый список"""
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(w for w in words if w.isalpha() or w in {"sql", "python", "cisco"})
+
+
+@pytest.fixture
+def fts(monkeypatch):
+    monkeypatch.setattr(db_helper, "_lemmatize", _lemmatize)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE VIRTUAL TABLE candidates_fts USING fts5(resume, answers, content='')")
+    conn.execute("INSERT INTO candidates_fts (rowid, resume, answers) VALUES (1, 'python cisco', '')")
+    conn.execute("INSERT INTO candidates_fts (rowid, resume, answers) VALUES (2, 'sql', 'фразы в кавычках')")
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_fts_query_is_valid_fts5(fts, query):
+    fts_query = db_helper._fts_query(query)
+    if fts_query:
+        fts.execute("SELECT rowid FROM candidates_fts WHERE candidates_fts MATCH ?", (fts_query,)).fetchall()
+
+
+def test_fts_query_drops_operator_of_dropped_operand(fts):
+    fts_query = db_helper._fts_query("(SQL OR Python) NOT 1С")
+    assert "NOT" not in fts_query
+    rows = fts.execute("SELECT rowid FROM candidates_fts WHERE candidates_fts MATCH ?", (fts_query,)).fetchall()
+    assert sorted(rowid for rowid, in rows) == [1, 2]
+
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    def fail(conn):
+        raise RuntimeError("сбой миграции")
+
+    migrations = list(db_helper.MIGRATIONS)
+    version, statements = migrations[2]
+    monkeypatch.setattr(db_helper, "MIGRATIONS", migrations[:2] + [(version, statements[:2] + [fail])])
+    conn = sqlite3.connect(tmp_path / "hr.db")
+    with pytest.raises(RuntimeError):
+        db_helper._migrate(conn)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(candidates)")]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert "resume_blob" not in columns
+
+    monkeypatch.setattr(db_helper, "MIGRATIONS", migrations)
+    db_helper._migrate(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == migrations[-1][0]
+    conn.close()
+
+
+def test_failed_vector_index_update_is_retried_on_next_start(tmp_path, monkeypatch):
+    import candidate_index
+    monkeypatch.setattr(db_helper, "DB_PATH", tmp_path / "hr.db")
+    monkeypatch.setattr(db_helper, "_local", db_helper.threading.local())
+    monkeypatch.setattr(db_helper, "_lemmatize", _lemmatize)
+    indexed = []
+
+    def fail(items):
+        raise RuntimeError("SBERT недоступен")
+
+    monkeypatch.setattr(candidate_index, "add_candidates", fail)
+    candidate_id = db_helper.save_candidate({"fio": "Иванов", "vacancy_id": "v1", "score": 50.0,
+                                             "resume_text": "Python и Cisco"})
+    db_helper._vector_queue.join()
+    conn = db_helper.get_connection()
+    assert conn.execute("SELECT candidate_id FROM vector_index_pending").fetchall() == [(candidate_id,)]
+
+    monkeypatch.setattr(candidate_index, "add_candidates", lambda items: indexed.extend(items))
+    assert db_helper.resume_vector_index() == 1
+    db_helper._vector_queue.join()
+    assert indexed == [(candidate_id, "Python и Cisco", None)]
+    assert conn.execute("SELECT candidate_id FROM vector_index_pending").fetchall() == []
+    db_helper.close_connection()
+
+
+def test_save_candidates_skips_already_saved_file(tmp_path, monkeypatch):
+    import candidate_index
+    monkeypatch.setattr(db_helper, "DB_PATH", tmp_path / "hr.db")
+    monkeypatch.setattr(db_helper, "_local", db_helper.threading.local())
+    monkeypatch.setattr(db_helper, "_lemmatize", _lemmatize)
+    indexed = []
+    monkeypatch.setattr(candidate_index, "add_candidates", lambda items: indexed.extend(items))
+    record = {"fio": "Петров", "vacancy_id": "v1", "score": 70.0, "resume_text": "SQL", "source_digest": "abc"}
+
+    assert db_helper.save_candidates([record]) == 1
+    # Повторный запуск после сбоя между записью в БД и в JSONL
+    assert db_helper.save_candidates([record, dict(record, vacancy_id="v2")]) == 1
+    conn = db_helper.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0] == 2
+    assert len(indexed) == 2
+    db_helper.close_connection()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    import candidate_index
+    monkeypatch.setattr(db_helper, "DB_PATH", tmp_path / "hr.db")
+    monkeypatch.setattr(db_helper, "_local", db_helper.threading.local())
+    monkeypatch.setattr(db_helper, "_migrated", set())
+    monkeypatch.setattr(db_helper, "_lemmatize", _lemmatize)
+    monkeypatch.setattr(candidate_index, "add_candidates", lambda items: None)
+    yield db_helper.get_connection()
+    db_helper._vector_queue.join()
+    db_helper.close_connection()
+
+
+def test_update_interview_removes_originally_indexed_terms(db, monkeypatch):
+    answers = '[{"answer": "настраивал cisco"}]'
+    candidate_id = db_helper.save_candidate({"fio": "Сидоров", "vacancy_id": "v1", "score": 60.0,
+                                             "resume_text": "SQL", "interview_json": answers})
+    # Лемматизатор изменился после индексации: удаление должно использовать сохранённые леммы
+    monkeypatch.setattr(db_helper, "_lemmatize", lambda text: _lemmatize(text).replace("cisco", "циско"))
+    db_helper.update_interview(candidate_id, '[{"answer": "писал на python"}]')
+    monkeypatch.setattr(db_helper, "_lemmatize", _lemmatize)
+    assert db_helper.search_candidates("Cisco") == []
+    assert [r["id"] for r in db_helper.search_candidates("Python")] == [candidate_id]
+    assert [r["id"] for r in db_helper.search_candidates("SQL")] == [candidate_id]
+
+
+def test_backfill_indexes_candidates_saved_before_search_index(db):
+    candidate_id = db_helper.save_candidate({"fio": "Орлов", "vacancy_id": "v1", "score": 40.0,
+                                             "resume_text": "Python"})
+    with db:
+        # Состояние после миграции 8: кандидат есть, в индексе поиска его нет
+        db.execute("INSERT INTO candidates_fts (candidates_fts) VALUES ('delete-all')")
+        db.execute("DELETE FROM candidate_lemmas")
+    assert db_helper.search_candidates("Python") == []
+    assert db_helper.backfill_search_index() == 1
+    assert db_helper.backfill_search_index() == 0
+    assert [r["id"] for r in db_helper.search_candidates("Python")] == [candidate_id]
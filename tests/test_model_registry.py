@@ -0,0 +1,45 @@
+import threading
+import pytest
+import model_registry
+
+
+def test_get_after_unload_reloads_instead_of_returning_none():
+    loads = []
+    handle = model_registry.LazyModel("test-reload", lambda: loads.append(1) or object())
+    first = handle.get()
+    assert handle.unload()
+    second = handle.get()
+    assert first is not None and second is not None and len(loads) == 2
+
+
+def test_get_timeout_raises():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return object()
+
+    handle = model_registry.LazyModel("test-timeout", slow)
+    handle.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        handle.get(timeout=0.01)
+    release.set()
+    assert handle.get() is not None
+
+
+def test_budget_does_not_evict_model_in_use(monkeypatch):
+    busy = model_registry.LazyModel("test-busy", object)
+    idle = model_registry.LazyModel("test-idle", object)
+    for handle in (busy, idle):
+        handle.get()
+        handle.resident_bytes = 2 ** 20
+    monkeypatch.setattr(model_registry, "MEMORY_BUDGET_MB", 1)
+    monkeypatch.setattr(model_registry, "_unique_handles", lambda: [busy, idle])
+    with busy.use() as model:
+        busy.last_used = 0.0  # самая давняя — первая кандидатка на выгрузку
+        model_registry._enforce_budget()
+        assert busy.loaded and busy.model is model
+    assert not idle.loaded
@@ -0,0 +1,38 @@
+import json
+import os
+import vacancy_parser
+
+
+def _write_shard(path, vacancies, mtime_ns):
+    path.write_text(json.dumps(vacancies, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_only_changed_shard_is_reread(tmp_path, monkeypatch):
+    _write_shard(tmp_path / "a.json", [{"id": "a1", "title": "Аналитик"}], 10**18)
+    _write_shard(tmp_path / "b.json", [{"id": "b1", "title": "Бэкенд"}], 10**18)
+    catalog = vacancy_parser.VacancyCatalog(tmp_path, check_interval=0)
+    assert sorted(catalog.ids()) == ["a1", "b1"]
+
+    read = []
+    original = vacancy_parser.VacancyCatalog._read_file
+    monkeypatch.setattr(vacancy_parser.VacancyCatalog, "_read_file",
+                        staticmethod(lambda path: read.append(path.name) or original(path)))
+    _write_shard(tmp_path / "b.json", [{"id": "b2", "title": "Бэкенд"}], 2 * 10**18)
+    assert sorted(catalog.ids()) == ["a1", "b2"]
+    assert read == ["b.json"]
+
+
+def test_signature_check_is_throttled(tmp_path, monkeypatch):
+    source = tmp_path / "vacancies.json"
+    _write_shard(source, [{"id": "v1", "title": "Тестировщик"}], 10**18)
+    clock = [100.0]
+    monkeypatch.setattr(vacancy_parser.time, "monotonic", lambda: clock[0])
+    catalog = vacancy_parser.VacancyCatalog(source, check_interval=1.0)
+    assert catalog.ids() == ["v1"]
+
+    _write_shard(source, [{"id": "v2", "title": "Тестировщик"}], 2 * 10**18)
+    clock[0] += 0.5
+    assert catalog.ids() == ["v1"]
+    clock[0] += 0.6
+    assert catalog.ids() == ["v2"]
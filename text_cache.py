@@ -0,0 +1,112 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+TEXT_CACHE_PATH = BASE_DIR / "cache" / "extracted_text.db"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(file_path: Path) -> str:
+    """SHA-256 содержимого файла"""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class TextCache:
+    """
+    Кэш извлечённого текста резюме в SQLite, ключ — SHA-256 файла и версия парсера.
+    Вытеснение по суммарному размеру (LRU).
+    """
+
+    def __init__(self, db_path: Path = TEXT_CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def _db(self):
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extracted (
+                digest TEXT,
+                parser_version TEXT,
+                text TEXT,
+                size INTEGER,
+                last_access REAL,
+                PRIMARY KEY (digest, parser_version)
+            )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extracted_access ON extracted (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get_text(self, digest: str, parser_version: str):
+        with self._lock:
+            try:
+                conn = self._db()
+                row = conn.execute(
+                    "SELECT text FROM extracted WHERE digest = ? AND parser_version = ?", (digest, parser_version)
+                ).fetchone()
+                if row is None:
+                    self.stats["misses"] += 1
+                    return None
+                conn.execute("UPDATE extracted SET last_access = ? WHERE digest = ? AND parser_version = ?",
+                             (time.time(), digest, parser_version))
+                conn.commit()
+                self.stats["hits"] += 1
+                return row[0]
+            except Exception as e:
+                logging.error(f"Ошибка чтения кэша текста: {e}")
+                return None
+
+    def put_text(self, digest: str, parser_version: str, text: str):
+        with self._lock:
+            try:
+                conn = self._db()
+                conn.execute("""
+                INSERT OR REPLACE INTO extracted (digest, parser_version, text, size, last_access)
+                VALUES (?, ?, ?, ?, ?)
+                """, (digest, parser_version, text, len(text.encode("utf-8")), time.time()))
+                conn.commit()
+                self._evict(conn)
+            except Exception as e:
+                logging.error(f"Ошибка записи кэша текста: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT IFNULL(SUM(size), 0) FROM extracted").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT digest, parser_version, size FROM extracted ORDER BY last_access").fetchall()
+        victims = []
+        for digest, version, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((digest, version))
+            total -= size or 0
+        conn.executemany("DELETE FROM extracted WHERE digest = ? AND parser_version = ?", victims)
+        conn.commit()
+        self.stats["evicted"] += len(victims)
+        logging.info(f"Кэш текста: вытеснено {len(victims)} записей")
+
+    def invalidate(self, keep_parser_version: str = None) -> int:
+        """Удалить записи других версий парсера (или все записи, если версия не указана)"""
+        with self._lock:
+            conn = self._db()
+            if keep_parser_version is None:
+                cur = conn.execute("DELETE FROM extracted")
+            else:
+                cur = conn.execute("DELETE FROM extracted WHERE parser_version != ?", (keep_parser_version,))
+            conn.commit()
+            logging.info(f"Кэш текста: удалено {cur.rowcount} записей")
+            return cur.rowcount
@@ -1,4 +1,7 @@
-# stt_helper.py
+# tts_helper.py
+import os
+import queue
+import hashlib
 import threading
 import wave
 import time
@@ -7,9 +10,14 @@ import pyttsx3
 
 import pyaudio
 from faster_whisper import WhisperModel
+import model_registry
 
-ASR_MODEL = "base"  # или "tiny" / "small"
-_WHISPER = WhisperModel(ASR_MODEL, device="cpu", compute_type="int8")
+ASR_MODEL = "small"  # та же модель, что у SpeechRecognizer: экземпляр общий через model_registry
+# Модель загружается только при первом вызове transcribe_last
+_WHISPER = model_registry.register(
+    f"whisper_{ASR_MODEL}", lambda: WhisperModel(ASR_MODEL, device="cpu", compute_type="int8"),
+    key=(f"whisper-{ASR_MODEL}", "cpu", "int8")
+)
 
 _record_thread = None
 _stop_event = None
@@ -108,27 +116,315 @@ def transcribe_last(vad_filter: bool = True, language: str = "ru") -> dict:
     wait_recording_finish(timeout=10.0)
     if not _last_file.exists():
         return {"text": "", "duration": 0.0}
+    whisper = _WHISPER.get()
+    if whisper is None:
+        return {"text": "", "duration": _last_duration}
     try:
-        segments, _ = _WHISPER.transcribe(str(_last_file), vad_filter=vad_filter, language=language)
+        segments, _ = whisper.transcribe(str(_last_file), vad_filter=vad_filter, language=language)
     except Exception as e:
         print("VAD/transcribe error (fallback):", e)
-        segments, _ = _WHISPER.transcribe(str(_last_file), vad_filter=False, language=language)
+        segments, _ = whisper.transcribe(str(_last_file), vad_filter=False, language=language)
 
     text = " ".join([seg.text for seg in segments]).strip()
     return {"text": text, "duration": _last_duration}
 
 
+# Кэш синтезированных фраз: WAV-файлы по хэшу (текст, голос, скорость), вытеснение давно не звучавших
+TTS_CACHE_DIR = Path(__file__).parent / "cache" / "tts"
+TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+_PLAY_CHUNK = 2048
+
+TTS_RATE = 160
+
 _engine = None
 
 def get_engine():
     global _engine
     if _engine is None:
         _engine = pyttsx3.init()
-        _engine.setProperty('rate', 160)
+        _engine.setProperty('rate', TTS_RATE)
 
     return _engine
 
+
+class TtsCache:
+    """WAV-файлы синтезированных фраз на диске; время доступа — mtime файла (LRU при вытеснении)"""
+
+    def __init__(self, cache_dir: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(text: str, voice: str, rate: int) -> str:
+        return hashlib.sha256(f"{voice}|{rate}|{text.strip()}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def temp_path(self, key: str) -> Path:
+        """Файл для записи синтеза: в отдельном подкаталоге, чтобы вытеснение не видело недописанные WAV"""
+        return self.cache_dir / ".partial" / f"{key}.wav"
+
+    def lookup(self, key: str):
+        """Путь к готовому WAV или None; попадание обновляет время доступа"""
+        path = self.path(key)
+        if not path.exists():
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def evict(self):
+        """Удалить давно не использовавшиеся файлы сверх max_bytes (только готовые WAV кэша)"""
+        files = []
+        for p in self.cache_dir.glob("*.wav"):
+            try:
+                stat = p.stat()
+            except OSError:
+                continue  # файл уже удалён другим потоком/процессом
+            files.append((stat.st_mtime, stat.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError as e:
+                print("Ошибка очистки кэша TTS:", e)
+
+
+tts_cache = TtsCache()
+
+
+class SpeechItem:
+    """Фраза в очереди синтеза: started — звук пошёл, done — воспроизведение закончено"""
+
+    def __init__(self, text: str, render_only: bool = False):
+        self.text = text
+        self.render_only = render_only  # только записать в кэш, не воспроизводить
+        self.cancelled = False
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done.wait(timeout)
+
+
+class SpeechWorker:
+    """
+    Поток воспроизведения: движок pyttsx3 используется только из него, фразы идут очередью.
+    Фоновый рендер в кэш — отдельный поток со своим движком: начатый рендер не задерживает живую фразу.
+    Новый рендер не начинается, пока в очереди или в воспроизведении есть живые фразы.
+    Отмена (cancel) только помечает фразы; движок останавливает сам поток воспроизведения.
+    """
+
+    def __init__(self, cache: TtsCache = tts_cache):
+        self._queue = queue.Queue()
+        self._render_queue = queue.Queue()
+        self._thread = None
+        self._render_thread = None
+        self._current = None
+        self._start_lock = threading.Lock()
+        self._live = []                 # ожидающие и звучащие фразы (для отмены)
+        self._live_lock = threading.Lock()
+        self._idle = threading.Event()  # живых фраз нет: можно рендерить
+        self._idle.set()
+        self.cache = cache
+        self._pyaudio = None
+        self._engine = None
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+                self._thread.start()
+
+    def _ensure_render_started(self):
+        with self._start_lock:
+            if self._render_thread is None or not self._render_thread.is_alive():
+                self._render_thread = threading.Thread(target=self._run_render, name="tts-render", daemon=True)
+                self._render_thread.start()
+
+    def _on_started(self, name=None):
+        item = self._current
+        if item is not None and not item.started.is_set():
+            item.started_at = time.perf_counter()
+            item.started.set()
+
+    def _on_word(self, name=None, location=None, length=None):
+        """Колбэк движка (в потоке воспроизведения): остановка отменённой фразы"""
+        item = self._current
+        if item is not None and item.cancelled and self._engine is not None:
+            self._engine.stop()
+
+    def _cache_key(self, engine, text: str) -> str:
+        return self.cache.key(text, str(engine.getProperty('voice')), int(engine.getProperty('rate')))
+
+    def _render(self, engine, text: str):
+        """Синтезировать фразу в WAV кэша (запись во временный файл, затем переименование)"""
+        key = self._cache_key(engine, text)
+        if self.cache.lookup(key) is not None:
+            return
+        path = self.cache.path(key)
+        tmp = self.cache.temp_path(key)
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        engine.save_to_file(text, str(tmp))
+        engine.runAndWait()
+        if tmp.exists() and tmp.stat().st_size > 44:
+            tmp.replace(path)
+            self.cache.evict()
+
+    def _play(self, path: Path, item: SpeechItem):
+        """Воспроизвести WAV из кэша; started — с первым записанным в устройство блоком"""
+        if self._pyaudio is None:
+            self._pyaudio = pyaudio.PyAudio()
+        with wave.open(str(path), "rb") as wf:
+            stream = self._pyaudio.open(format=self._pyaudio.get_format_from_width(wf.getsampwidth()),
+                                        channels=wf.getnchannels(), rate=wf.getframerate(), output=True)
+            try:
+                data = wf.readframes(_PLAY_CHUNK)
+                while data and not item.cancelled:
+                    stream.write(data)
+                    self._on_started()
+                    data = wf.readframes(_PLAY_CHUNK)
+            finally:
+                stream.stop_stream()
+                stream.close()
+
+    def _finish_live(self, item: SpeechItem):
+        with self._live_lock:
+            if item in self._live:
+                self._live.remove(item)
+            if not self._live:
+                self._idle.set()
+
+    def _run(self):
+        try:
+            engine = get_engine()
+            engine.connect('started-utterance', self._on_started)
+            engine.connect('started-word', self._on_word)
+        except Exception as e:
+            print("Ошибка инициализации синтеза речи:", e)
+            engine = None
+        self._engine = engine
+        while True:
+            item = self._queue.get()
+            self._current = item
+            try:
+                if engine is None:
+                    raise RuntimeError("движок синтеза речи недоступен")
+                if item.cancelled:
+                    continue
+                cached = self.cache.lookup(self._cache_key(engine, item.text))
+                if cached is not None:
+                    try:
+                        self._play(cached, item)
+                        continue
+                    except Exception as e:
+                        print("Ошибка воспроизведения из кэша, синтез заново:", e)
+                engine.say(item.text)
+                engine.runAndWait()
+            except Exception as e:
+                print("Ошибка синтеза речи:", e)
+            finally:
+                self._on_started()  # драйверы без события started-utterance
+                self._current = None
+                item.done.set()
+                self._finish_live(item)
+
+    def _run_render(self):
+        try:
+            # Отдельный экземпляр движка (pyttsx3.init вернул бы общий), настроенный так же, как get_engine
+            engine = pyttsx3.Engine()
+            engine.setProperty('rate', TTS_RATE)
+        except Exception as e:
+            print("Ошибка инициализации фонового синтеза речи:", e)
+            engine = None
+        while True:
+            item = self._render_queue.get()
+            try:
+                if engine is None:
+                    raise RuntimeError("движок фонового синтеза речи недоступен")
+                self._idle.wait()
+                self._render(engine, item.text)
+            except Exception as e:
+                print("Ошибка фонового синтеза речи:", e)
+            finally:
+                item.done.set()
+
+    def say(self, text: str) -> SpeechItem:
+        """Поставить фразу в очередь, не дожидаясь воспроизведения"""
+        self._ensure_started()
+        item = SpeechItem(text)
+        with self._live_lock:
+            self._live.append(item)
+            self._idle.clear()
+        self._queue.put(item)
+        return item
+
+    def cancel(self) -> int:
+        """
+        Прервать текущую фразу и снять ожидающие (фоновый рендер в кэш не затрагивается).
+        Фразы только помечаются: ожидающие поток пропустит, звучащую остановит сам (колбэк started-word
+        или цикл воспроизведения из кэша). Возвращает число отменённых фраз; done выставляется сразу.
+        """
+        with self._live_lock:
+            items = [item for item in self._live if not item.done.is_set() and not item.cancelled]
+            for item in items:
+                item.cancelled = True
+        for item in items:
+            if item is not self._current:
+                item.done.set()
+        return len(items)
+
+    def render(self, text: str) -> SpeechItem:
+        """Поставить фразу в фоновый рендер в кэш (выполняется, когда нет живых фраз)"""
+        self._ensure_render_started()
+        item = SpeechItem(text, render_only=True)
+        self._render_queue.put(item)
+        return item
+
+
+speech_worker = SpeechWorker()
+
+
+def speak_async(text: str) -> SpeechItem:
+    return speech_worker.say(text)
+
+
 def speak(text: str):
-    engine = get_engine()
-    engine.say(text)
-    engine.runAndWait()
\ No newline at end of file
+    speech_worker.say(text).wait()
+
+
+def cancel_speech() -> int:
+    """Прервать озвучивание (кнопка в GUI)"""
+    return speech_worker.cancel()
+
+
+def prerender(texts) -> list:
+    """Заранее синтезировать фразы в кэш TTS (повторы и уже готовые пропускаются)"""
+    return [speech_worker.render(text) for text in dict.fromkeys(t for t in texts if t and t.strip())]
+
+
+def prerender_vacancy_questions(vacancies: list, extra: list = ()) -> list:
+    """Рендер фиксированных вопросов вакансий (первые и фоллбэк-вопросы интервью)"""
+    return prerender([q for vac in vacancies for q in vac.get("questions", [])] + list(extra))
+
+
+if __name__ == "__main__":
+    import argparse
+    from vacancy_parser import VacancyCatalog, VACANCIES_JSON
+
+    parser = argparse.ArgumentParser(description="Предварительный синтез вопросов вакансий в кэш TTS")
+    parser.add_argument("--vacancies", default=str(VACANCIES_JSON), help="JSON, JSONL или каталог шардов")
+    args = parser.parse_args()
+
+    items = prerender_vacancy_questions(VacancyCatalog(Path(args.vacancies)).all())
+    for item in items:
+        item.wait()
+    print(f"Фраз в кэше TTS: {len(items)} ({TTS_CACHE_DIR})")
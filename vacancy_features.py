@@ -0,0 +1,133 @@
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+import artifact_store
+
+logging.basicConfig(filename='vacancy_features.log', level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = Path(__file__).parent
+VACANCIES_JSON = BASE_DIR / "vacancies.json"
+ARTIFACTS_DIR = BASE_DIR / "artifacts" / "vacancies"
+ARTIFACT_VERSION = 2
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def vacancy_hash(vacancy: dict, model_name: str = "", lemmatizer_version: str = "") -> str:
+    """Хэш содержимого вакансии (требования, вопросы), модели эмбеддингов и версии лемматизатора"""
+    payload = json.dumps({
+        "version": ARTIFACT_VERSION,
+        "model": model_name,
+        "lemmatizer": lemmatizer_version,
+        "requirements": vacancy.get("requirements", []),
+        "questions": vacancy.get("questions", []),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _encode_or_empty(encode, texts: list) -> np.ndarray:
+    if not texts or encode is None:
+        return np.zeros((len(texts), 0), dtype=np.float32)
+    return np.asarray(encode(texts), dtype=np.float32)
+
+
+def build_vacancy_artifact(vacancy: dict, lemmatize, encode, model_name: str = "",
+                           lemmatizer_version: str = "") -> dict:
+    """
+    Компиляция артефакта вакансии: леммы требований, эмбеддинги требований и вопросов, хэш.
+    lemmatize(text) -> list, encode(list_of_texts) -> нормализованные эмбеддинги (N x D).
+    lemmatizer_version входит в хэш: после смены правила лемматизации леммы требований пересобираются.
+    """
+    requirements = vacancy.get("requirements", [])
+    questions = vacancy.get("questions", [])
+    arrays = {
+        "req_emb": _encode_or_empty(encode, requirements),
+        "q_emb": _encode_or_empty(encode, questions),
+    }
+    meta = {
+        "id": vacancy["id"],
+        "hash": vacancy_hash(vacancy, model_name, lemmatizer_version),
+        "model": model_name,
+        "requirements": requirements,
+        "req_lemmas": [sorted(set(lemmatize(req))) for req in requirements],
+        "questions": questions,
+    }
+    meta = artifact_store.write_artifact(ARTIFACTS_DIR, vacancy["id"], meta, arrays)
+    logging.info(f"Артефакт вакансии {vacancy['id']} собран")
+    return meta
+
+
+def compile_vacancies(vacancies: list, lemmatize, encode, model_name: str = "", force: bool = False,
+                      lemmatizer_version: str = "") -> dict:
+    """Пересборка артефактов только для вакансий с изменившимся хэшем"""
+    stats = {"built": 0, "skipped": 0}
+    for vac in vacancies:
+        meta = artifact_store.read_meta(ARTIFACTS_DIR, vac["id"])
+        if not force and meta and meta.get("hash") == vacancy_hash(vac, model_name, lemmatizer_version):
+            stats["skipped"] += 1
+            continue
+        build_vacancy_artifact(vac, lemmatize, encode, model_name, lemmatizer_version)
+        stats["built"] += 1
+    logging.info(f"Компиляция вакансий: {stats}")
+    return stats
+
+
+def load_vacancy_features(vacancy: dict, lemmatize, encode, model_name: str = "",
+                          lemmatizer_version: str = "") -> dict:
+    """
+    Признаки вакансии из артефакта (эмбеддинги отображаются в память через mmap).
+    Если артефакт отсутствует или устарел, он пересобирается для одной этой вакансии.
+    """
+    vac_id = vacancy["id"]
+    expected = vacancy_hash(vacancy, model_name, lemmatizer_version)
+    with _lock:
+        cached = _cache.get(vac_id)
+        if cached and cached["hash"] == expected:
+            return cached
+
+        # Отображения прежней версии освобождаются до пересборки (в Windows они блокируют файлы)
+        _cache.pop(vac_id, None)
+        meta = artifact_store.read_meta(ARTIFACTS_DIR, vac_id)
+        if not meta or meta.get("hash") != expected:
+            meta = build_vacancy_artifact(vacancy, lemmatize, encode, model_name, lemmatizer_version)
+        try:
+            req_emb = artifact_store.load_array(ARTIFACTS_DIR, meta, "req_emb")
+            q_emb = artifact_store.load_array(ARTIFACTS_DIR, meta, "q_emb")
+        except FileNotFoundError:
+            # Массивы удалены параллельной сборкой другой версии — собираем заново
+            meta = build_vacancy_artifact(vacancy, lemmatize, encode, model_name, lemmatizer_version)
+            req_emb = artifact_store.load_array(ARTIFACTS_DIR, meta, "req_emb")
+            q_emb = artifact_store.load_array(ARTIFACTS_DIR, meta, "q_emb")
+
+        features = {
+            "hash": meta["hash"],
+            "requirements": meta["requirements"],
+            "req_lemmas": [set(lemmas) for lemmas in meta["req_lemmas"]],
+            "questions": meta["questions"],
+            "req_emb": req_emb,
+            "q_emb": q_emb,
+        }
+        _cache[vac_id] = features
+        return features
+
+
+if __name__ == "__main__":
+    import argparse
+    import analyzer
+    from vacancy_parser import VacancyCatalog
+
+    parser = argparse.ArgumentParser(description="Компиляция артефактов вакансий")
+    parser.add_argument("--vacancies", default=str(VACANCIES_JSON), help="JSON, JSONL или каталог шардов")
+    parser.add_argument("--force", action="store_true", help="Пересобрать все артефакты")
+    args = parser.parse_args()
+
+    vacancies = VacancyCatalog(Path(args.vacancies)).all()
+    result = compile_vacancies(vacancies, analyzer.normalize_text, analyzer.encode_texts,
+                               analyzer.SBERT_MODEL_NAME, force=args.force,
+                               lemmatizer_version=analyzer.LEMMATIZER_VERSION)
+    print(f"Собрано: {result['built']}, без изменений: {result['skipped']}")
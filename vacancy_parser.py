@@ -1,13 +1,134 @@
 import json
+import logging
+import threading
+import time
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent
 VACANCIES_JSON = BASE_DIR / "vacancies.json"
 
+_LIST_FIELDS = ("requirements", "duties", "questions")
+SIGNATURE_CHECK_INTERVAL = 1.0  # не чаще раза в секунду проверяем mtime/размер файлов каталога
+
+
+def validate_vacancy(vac) -> list:
+    """Список ошибок схемы вакансии (пустой, если вакансия корректна)"""
+    if not isinstance(vac, dict):
+        return ["вакансия должна быть объектом"]
+    errors = []
+    for field in ("id", "title"):
+        if not isinstance(vac.get(field), str) or not vac.get(field):
+            errors.append(f"поле '{field}' должно быть непустой строкой")
+    for field in _LIST_FIELDS:
+        value = vac.get(field, [])
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            errors.append(f"поле '{field}' должно быть списком строк")
+    return errors
+
+
+class VacancyCatalog:
+    """
+    Каталог вакансий с индексом по id. Источник — JSON-массив, JSONL (вакансия на строку)
+    или каталог с шардами *.json / *.jsonl. Перечитывается при изменении mtime/размера файлов:
+    проверка выполняется не чаще check_interval секунд, заново разбираются только изменённые шарды.
+    """
+
+    def __init__(self, source: Path = VACANCIES_JSON, check_interval: float = SIGNATURE_CHECK_INTERVAL):
+        self.source = Path(source)
+        self.check_interval = check_interval
+        self._index = {}
+        self._shards = {}  # путь -> ((mtime_ns, размер), вакансии шарда)
+        self._signature = None
+        self._failed_signature = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _files(self) -> list:
+        if self.source.is_dir():
+            return sorted(p for p in self.source.iterdir() if p.suffix in (".json", ".jsonl"))
+        return [self.source]
+
+    def _current_signature(self) -> tuple:
+        signature = []
+        for path in self._files():
+            stat = path.stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    @staticmethod
+    def _read_file(path: Path) -> list:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.suffix == ".jsonl":
+                return [json.loads(line) for line in f if line.strip()]
+            data = json.load(f)
+        return data if isinstance(data, list) else [data]
+
+    def _read_shard(self, path: Path) -> list:
+        vacancies = self._read_file(path)
+        for pos, vac in enumerate(vacancies, 1):
+            errors = validate_vacancy(vac)
+            if errors:
+                raise ValueError(f"{path.name}, вакансия {pos}: {'; '.join(errors)}")
+        return vacancies
+
+    def _load(self, signature: tuple):
+        shards, index, reread = {}, {}, 0
+        for path, mtime_ns, size in signature:
+            cached = self._shards.get(path)
+            if cached is not None and cached[0] == (mtime_ns, size):
+                vacancies = cached[1]
+            else:
+                vacancies = self._read_shard(Path(path))
+                reread += 1
+            shards[path] = ((mtime_ns, size), vacancies)
+            for vac in vacancies:
+                if vac["id"] in index:
+                    raise ValueError(f"{Path(path).name}: повторяющийся ID вакансии {vac['id']}")
+                index[vac["id"]] = vac
+        self._shards = shards
+        self._index = index
+        self._signature = signature
+        logging.info(f"Каталог вакансий загружен из {self.source}: {len(index)} вакансий, "
+                     f"перечитано файлов: {reread} из {len(signature)}")
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._signature is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            if not self.source.exists():
+                raise FileNotFoundError(f"{self.source} не найден")
+            signature = self._current_signature()
+            if signature in (self._signature, self._failed_signature):
+                return
+            try:
+                self._load(signature)
+            except Exception as e:
+                # При ошибке в обновлённом файле продолжаем работать с последней корректной версией
+                if self._signature is None:
+                    raise
+                self._failed_signature = signature
+                logging.error(f"Ошибка перезагрузки каталога вакансий, используется предыдущая версия: {e}")
+
+    def get(self, vac_id: str) -> dict:
+        self._refresh()
+        try:
+            return self._index[vac_id]
+        except KeyError:
+            raise ValueError(f"Вакансия с ID {vac_id} не найдена")
+
+    def all(self) -> list:
+        self._refresh()
+        return list(self._index.values())
+
+    def ids(self) -> list:
+        self._refresh()
+        return list(self._index)
+
+
+catalog = VacancyCatalog()
+
+
 def extract_vacancy(vac_id: str) -> dict:
-    with open(VACANCIES_JSON, 'r', encoding='utf-8') as f:
-        vacancies = json.load(f)
-    for vac in vacancies:
-        if vac['id'] == vac_id:
-            return vac
-    raise ValueError(f"Вакансия с ID {vac_id} не найдена")
\ No newline at end of file
+    return catalog.get(vac_id)